@@ -0,0 +1,103 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from capture_obs_frame import isDebugEnabled
+from config_loader import getConfigManager
+from metrics import getMetricsRegistry
+
+_routes: dict[str, object] = {}  # ruta → handler(request) registrados por los módulos
+_server = None  # instancia global única del servidor HTTP
+
+
+def registerRoute(path: str, handler):
+    # Registra un handler para una ruta GET; recibe el BaseHTTPRequestHandler y escribe la respuesta.
+    _routes[path] = handler
+
+
+def sendText(request: BaseHTTPRequestHandler, status: int, body: str, content_type: str = "text/plain; charset=utf-8"):
+    # Escribe una respuesta de texto completa con Content-Length.
+    payload = body.encode("utf-8")
+    request.send_response(status)
+    request.send_header("Content-Type", content_type)
+    request.send_header("Content-Length", str(len(payload)))
+    request.end_headers()
+    request.wfile.write(payload)
+
+
+def handleMetrics(request: BaseHTTPRequestHandler):
+    sendText(request, 200, getMetricsRegistry().renderPrometheus(), "text/plain; version=0.0.4; charset=utf-8")
+
+
+def handleHealth(request: BaseHTTPRequestHandler):
+    sendText(request, 200, "ok\n")
+
+
+class AppRequestHandler(BaseHTTPRequestHandler):
+    # Despacha las peticiones GET a los handlers registrados.
+    # HTTP/1.1 para poder responder con Transfer-Encoding chunked (audio en streaming).
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        handler = _routes.get(path)
+        if handler is None:
+            sendText(self, 404, "not found\n")
+            return
+
+        try:
+            handler(self)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        if isDebugEnabled():
+            print(f"[http] {self.address_string()} {format % args}")
+
+
+def getAppPort() -> int | None:
+    # Lee APP_PORT del entorno; None si no está definido o está vacío.
+    value = getConfigManager().getEnv("APP_PORT")
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"APP_PORT debe ser entero, recibido: {value}")
+
+
+def startAppServer(port: int | None = None, host: str = "0.0.0.0"):
+    # Arranca (una sola vez) el servidor HTTP de la app en un hilo de fondo.
+    global _server
+    if _server is not None:
+        return _server
+
+    port = port if port is not None else getAppPort()
+    if port is None:
+        print("[i] APP_PORT no definido: no se expone el servidor HTTP de la app")
+        return None
+
+    _server = ThreadingHTTPServer((host, port), AppRequestHandler)
+    _server.daemon_threads = True
+
+    thread = threading.Thread(target=_server.serve_forever, name="app-server", daemon=True)
+    thread.start()
+
+    print(f"[i] Servidor HTTP de la app escuchando en {host}:{port} (rutas: {', '.join(sorted(_routes))})")
+    return _server
+
+
+def isAppServerRunning() -> bool:
+    return _server is not None
+
+
+def stopAppServer():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+registerRoute("/metrics", handleMetrics)
+registerRoute("/health", handleHealth)
@@ -0,0 +1,69 @@
+import hashlib
+import re
+import unicodedata
+
+import diskcache
+
+from capture_obs_frame import isDebugEnabled
+from metrics import TTS_CACHE_TOTAL
+
+
+def normalizeTtsText(text: str) -> str:
+    # Normaliza el texto para que variaciones triviales (espacios, composición unicode) compartan audio.
+    normalized = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+def buildAudioCacheKey(text: str, voice_id: str, audio_format: str) -> str:
+    # Clave de contenido: hash de (texto normalizado, voz, formato).
+    material = "\0".join((normalizeTtsText(text), voice_id, audio_format))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    # Caché en disco de audios TTS con expulsión LRU por tamaño y expiración por antigüedad.
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: float | None):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds if max_age_seconds and max_age_seconds > 0 else None
+        self._cache = diskcache.Cache(
+            directory,
+            size_limit=max_bytes,
+            eviction_policy="least-recently-used",
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str, voice_id: str, audio_format: str) -> bytes | None:
+        # Devuelve el audio cacheado o None; actualiza el orden LRU en cada acierto.
+        key = buildAudioCacheKey(text, voice_id, audio_format)
+        audio = self._cache.get(key)
+        if audio is None:
+            self.misses += 1
+            TTS_CACHE_TOTAL.inc(result="miss")
+            return None
+
+        self.hits += 1
+        TTS_CACHE_TOTAL.inc(result="hit")
+        if isDebugEnabled():
+            print(f"[i] Audio TTS servido desde caché ({len(audio)} bytes, {self.hitRateSummary()})")
+        return audio
+
+    def put(self, text: str, voice_id: str, audio_format: str, audio: bytes):
+        key = buildAudioCacheKey(text, voice_id, audio_format)
+        self._cache.set(key, audio, expire=self.max_age_seconds)
+
+    def contains(self, text: str, voice_id: str, audio_format: str) -> bool:
+        return buildAudioCacheKey(text, voice_id, audio_format) in self._cache
+
+    def hitRateSummary(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"aciertos {self.hits}/{total} ({rate:.0f}%)"
+
+    def volume(self) -> int:
+        # Bytes ocupados en disco por la caché.
+        return self._cache.volume()
+
+    def close(self):
+        self._cache.close()
@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from capture_obs_frame import isDebugEnabled
+from config_loader import getConfig, getCurrentStream
+from metrics import AUDIO_SPOOL_BYTES, AUDIO_SPOOL_EVICTIONS_TOTAL, TTS_FILE_WRITE_SECONDS
+
+MANIFEST_FILE = "manifest.json"
+TEMP_SUBDIR = ".tmp"  # los audios se escriben aquí y se mueven con rename al directorio que mira el reproductor
+UNSAVED_SPOOL_FILES = 20  # con tts.save_audio: false solo se conservan los últimos audios, lo justo para reproducirlos
+
+_audio_spools = {}  # spool por directorio de audio (uno por stream en modo multi-stream)
+_spools_lock = threading.Lock()
+
+# tts_<secuencia>_<reacción>_<segmento>.<formato>; los nombres por fecha de versiones anteriores no coinciden
+SPOOL_FILE_PATTERN = re.compile(r"^tts_(\d{8})_\d{8}_\d{6}_\d{3}_\d{2}\.")
+
+
+@dataclass(slots=True)
+class SpoolEntry:
+    # Un audio ya completo en el spool; file es relativo al directorio de audio.
+    sequence: int
+    file: str
+    reaction_id: str
+    segment_index: int
+    created_at: float
+    size: int
+
+
+class AudioSpool:
+    # Directorio de audios para el reproductor por archivos: cada audio se escribe con un nombre temporal
+    # y se publica con un rename atómico (el reproductor nunca ve un archivo a medias), lleva un número de
+    # secuencia creciente en el nombre y en manifest.json, y se expulsan los más viejos al superar los límites.
+
+    def __init__(self, audio_dir: str, max_files: int = 200, max_bytes: int | None = None,
+                 stream_label: str = "default"):
+        self.audio_dir = audio_dir
+        self.stream_label = stream_label
+        self.max_files = max_files
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+
+        self._temp_dir = os.path.join(audio_dir, TEMP_SUBDIR)
+        self._manifest_path = os.path.join(audio_dir, MANIFEST_FILE)
+        self._entries: list[SpoolEntry] = []
+        self._total_bytes = 0
+        self._last_sequence = 0
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.evicted = 0
+
+        os.makedirs(self._temp_dir, exist_ok=True)
+        self._recover()
+
+    def _recover(self):
+        # Retoma el spool tras un reinicio: la secuencia sigue desde el manifest, los temporales a medias se
+        # borran y los audios que no están en el manifest (versiones anteriores) se expulsan primero.
+        for name in os.listdir(self._temp_dir):
+            try:
+                os.remove(os.path.join(self._temp_dir, name))
+            except OSError:
+                pass
+
+        listed: dict[str, SpoolEntry] = {}
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            self._last_sequence = int(manifest.get("last_sequence", 0))
+            for record in manifest.get("entries", []):
+                entry = SpoolEntry(**record)
+                listed[entry.file] = entry
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, KeyError) as error:
+            print(f"[!] Manifest de audio dañado ({self._manifest_path}): {error}; se reconstruye")
+
+        orphans: list[SpoolEntry] = []
+        for name in sorted(os.listdir(self.audio_dir)):
+            path = os.path.join(self.audio_dir, name)
+            if name == MANIFEST_FILE or not name.startswith("tts_") or not os.path.isfile(path):
+                continue
+            size = os.path.getsize(path)
+            entry = listed.get(name)
+            if entry is None:
+                match = SPOOL_FILE_PATTERN.match(name)
+                sequence = int(match.group(1)) if match else 0
+                self._last_sequence = max(self._last_sequence, sequence)
+                orphans.append(SpoolEntry(sequence, name, "", 0, os.path.getmtime(path), size))
+            else:
+                entry.size = size
+
+        kept = sorted((entry for entry in listed.values() if os.path.exists(os.path.join(self.audio_dir, entry.file))),
+                      key=lambda entry: entry.sequence)
+        self._entries = sorted(orphans, key=lambda entry: (entry.sequence, entry.created_at)) + kept
+        self._total_bytes = sum(entry.size for entry in self._entries)
+
+        with self._lock:
+            self._evict()
+            self._writeManifest()
+
+    def write(self, audio: bytes, audio_format: str, reaction_id: str, segment_index: int = 0) -> str:
+        # Publica un audio completo en el spool y devuelve su ruta final.
+        with self._lock:
+            self._last_sequence += 1
+            sequence = self._last_sequence
+            name = f"tts_{sequence:08d}_{reaction_id}_{segment_index:02d}.{audio_format}"
+            temp_path = os.path.join(self._temp_dir, name)
+            final_path = os.path.join(self.audio_dir, name)
+
+            with TTS_FILE_WRITE_SECONDS.time():
+                with open(temp_path, "wb") as file:
+                    file.write(audio)
+                os.replace(temp_path, final_path)
+
+            self._entries.append(SpoolEntry(sequence, name, reaction_id, segment_index, time.time(), len(audio)))
+            self._total_bytes += len(audio)
+            self.written += 1
+
+            self._evict()
+            self._writeManifest()
+            return final_path
+
+    def _evict(self):
+        # Borra los audios más viejos hasta respetar la cantidad y el tamaño máximos (siempre queda el último).
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_files
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            entry = self._entries.pop(0)
+            self._total_bytes -= entry.size
+            try:
+                os.remove(os.path.join(self.audio_dir, entry.file))
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                # en Windows el reproductor puede tenerlo abierto; se reintenta en la próxima expulsión
+                print(f"[!] No se pudo borrar el audio {entry.file}: {error}")
+                self._entries.insert(0, entry)
+                self._total_bytes += entry.size
+                break
+            self.evicted += 1
+            AUDIO_SPOOL_EVICTIONS_TOTAL.inc()
+            if isDebugEnabled():
+                print(f"\t- Audio expulsado del spool: {entry.file}")
+
+        AUDIO_SPOOL_BYTES.set(self._total_bytes, stream=self.stream_label)
+
+    def _writeManifest(self):
+        # El manifest también se reemplaza con rename: el reproductor lo lee siempre completo.
+        manifest = {
+            "last_sequence": self._last_sequence,
+            "entries": [asdict(entry) for entry in self._entries],
+        }
+        temp_path = os.path.join(self._temp_dir, MANIFEST_FILE)
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self._manifest_path)
+
+
+def getAudioSpool(audio_dir: str) -> AudioSpool:
+    # Devuelve el spool de ese directorio (uno por directorio) con los límites de config.tts.
+    with _spools_lock:
+        spool = _audio_spools.get(audio_dir)
+        if spool is not None:
+            return spool
+
+        tts_config = getConfig().tts
+        max_files = tts_config.spool_max_files
+        if not tts_config.save_audio:
+            max_files = min(max_files, UNSAVED_SPOOL_FILES)
+        spool = AudioSpool(audio_dir, max_files, int(tts_config.spool_max_mb * 1024 * 1024),
+                           getCurrentStream() or "default")
+        _audio_spools[audio_dir] = spool
+        return spool
@@ -0,0 +1,230 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from app_server import registerRoute, sendText
+from config_loader import getConfig, getConfigManager, getCurrentStream
+from metrics import AUDIO_FIRST_CHUNK_SECONDS
+
+_audio_broadcasters = {}  # cola de audios por stream (clave None en modo de un solo stream)
+_broadcasters_lock = threading.Lock()
+
+CONTENT_TYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "opus": "audio/ogg",
+    "pcm": "application/octet-stream",
+}
+
+
+class AudioClip:
+    # Un audio (reacción completa o segmento) que se va llenando por fragmentos mientras Fish Audio lo genera.
+
+    def __init__(self, sequence: int, reaction_id: str, segment_index: int, audio_format: str, text: str):
+        self.sequence = sequence
+        self.reaction_id = reaction_id
+        self.segment_index = segment_index
+        self.audio_format = audio_format
+        self.text = text
+        self.created_at = time.time()
+
+        self.done = False
+        self.failed = False
+        self._chunks: list[bytes] = []
+        self._cond = threading.Condition()
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        with self._cond:
+            if not self._chunks:
+                AUDIO_FIRST_CHUNK_SECONDS.observe(time.time() - self.created_at)
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, failed: bool = False):
+        with self._cond:
+            self.done = True
+            self.failed = failed
+            self._cond.notify_all()
+
+    def waitChunks(self, offset: int, timeout: float) -> tuple[list[bytes], bool]:
+        # Devuelve los fragmentos desde offset (esperando si todavía no hay) y si el audio ya terminó.
+        with self._cond:
+            if len(self._chunks) <= offset and not self.done:
+                self._cond.wait(timeout)
+            return self._chunks[offset:], self.done
+
+    def data(self) -> bytes:
+        # Audio completo recibido hasta ahora.
+        with self._cond:
+            return b"".join(self._chunks)
+
+    def describe(self) -> dict:
+        with self._cond:
+            size = sum(len(chunk) for chunk in self._chunks)
+        return {
+            "sequence": self.sequence,
+            "reaction_id": self.reaction_id,
+            "segment_index": self.segment_index,
+            "format": self.audio_format,
+            "created_at": self.created_at,
+            "bytes": size,
+            "done": self.done,
+            "failed": self.failed,
+            "text": self.text,
+        }
+
+
+class AudioBroadcaster:
+    # Cola de reproducción acotada: los audios reciben un número de secuencia creciente y el reproductor
+    # los pide en orden con /audio/next?after=<último>; los más viejos se descartan al llenarse la cola.
+
+    def __init__(self, queue_size: int = 8):
+        self._clips: deque[AudioClip] = deque(maxlen=max(1, queue_size))
+        self._sequence = itertools.count(1)
+        self._cond = threading.Condition()
+        self.last_sequence = 0
+
+    def openClip(self, reaction_id: str, segment_index: int, audio_format: str, text: str) -> AudioClip:
+        # Publica un audio nuevo (todavía vacío) para que el reproductor empiece a pedirlo ya.
+        with self._cond:
+            clip = AudioClip(next(self._sequence), reaction_id, segment_index, audio_format, text)
+            self._clips.append(clip)
+            self.last_sequence = clip.sequence
+            self._cond.notify_all()
+        return clip
+
+    def waitNext(self, after: int, timeout: float) -> AudioClip | None:
+        # Primer audio con secuencia > after (None si no llega ninguno en timeout segundos).
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for clip in self._clips:
+                    if clip.sequence > after:
+                        return clip
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def getClip(self, sequence: int) -> AudioClip | None:
+        with self._cond:
+            for clip in self._clips:
+                if clip.sequence == sequence:
+                    return clip
+        return None
+
+    def snapshot(self) -> list[dict]:
+        with self._cond:
+            clips = list(self._clips)
+        return [clip.describe() for clip in clips]
+
+
+def getAudioBroadcaster(stream_name: str | None = None, create: bool = True) -> AudioBroadcaster | None:
+    # Devuelve la cola de audios del stream indicado (por defecto, el del hilo actual).
+    key = stream_name if stream_name is not None else getCurrentStream()
+    with _broadcasters_lock:
+        broadcaster = _audio_broadcasters.get(key)
+        if broadcaster is None and create:
+            broadcaster = AudioBroadcaster(getConfig().tts.http_queue_size)
+            _audio_broadcasters[key] = broadcaster
+        return broadcaster
+
+
+def getQueryParams(request: BaseHTTPRequestHandler) -> dict:
+    return {key: values[-1] for key, values in parse_qs(urlparse(request.path).query).items()}
+
+
+def requestBroadcaster(request: BaseHTTPRequestHandler, params: dict) -> AudioBroadcaster | None:
+    # Cola del stream pedido con ?stream=<nombre> (sin parámetro: el stream único).
+    broadcaster = getAudioBroadcaster(params.get("stream"), create=False)
+    if broadcaster is None:
+        sendText(request, 404, "stream sin audios\n")
+    return broadcaster
+
+
+def handleAudioNext(request: BaseHTTPRequestHandler):
+    # Long-poll: devuelve en JSON el siguiente audio con secuencia > after, o 204 si no llega ninguno a tiempo.
+    # Sin after se espera el próximo audio nuevo (el reproductor no repite lo generado antes de conectarse).
+    params = getQueryParams(request)
+    stream_name = params.get("stream")
+    if stream_name is not None and stream_name not in getConfigManager().getStreamNames():
+        sendText(request, 404, "stream desconocido\n")
+        return
+    broadcaster = getAudioBroadcaster(stream_name)
+    try:
+        after = int(params["after"]) if "after" in params else broadcaster.last_sequence
+    except ValueError:
+        sendText(request, 400, "after debe ser entero\n")
+        return
+
+    clip = broadcaster.waitNext(after, getConfig().tts.http_wait_seconds)
+    if clip is None:
+        request.send_response(204)
+        request.send_header("Content-Length", "0")
+        request.end_headers()
+        return
+
+    info = clip.describe()
+    info["url"] = f"/audio/clip?seq={clip.sequence}" + (f"&stream={stream_name}" if stream_name else "")
+    sendText(request, 200, json.dumps(info, ensure_ascii=False), "application/json; charset=utf-8")
+
+
+def handleAudioClip(request: BaseHTTPRequestHandler):
+    # Sirve el audio ?seq=N con Transfer-Encoding chunked a medida que Fish Audio lo va entregando,
+    # así la reproducción empieza con los primeros bytes.
+    params = getQueryParams(request)
+    broadcaster = requestBroadcaster(request, params)
+    if broadcaster is None:
+        return
+    try:
+        clip = broadcaster.getClip(int(params.get("seq", "")))
+    except ValueError:
+        sendText(request, 400, "seq debe ser entero\n")
+        return
+    if clip is None:
+        sendText(request, 404, "audio fuera de la cola\n")
+        return
+
+    request.send_response(200)
+    request.send_header("Content-Type", CONTENT_TYPES.get(clip.audio_format, "application/octet-stream"))
+    request.send_header("Transfer-Encoding", "chunked")
+    request.send_header("Cache-Control", "no-store")
+    request.send_header("X-Audio-Sequence", str(clip.sequence))
+    request.send_header("X-Reaction-Id", clip.reaction_id)
+    request.send_header("X-Segment-Index", str(clip.segment_index))
+    request.end_headers()
+
+    offset = 0
+    wait_seconds = getConfig().tts.http_wait_seconds
+    while True:
+        chunks, done = clip.waitChunks(offset, wait_seconds)
+        for chunk in chunks:
+            request.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        request.wfile.flush()
+        offset += len(chunks)
+        if done and not chunks:
+            break
+        if not chunks and not done:
+            # la síntesis se colgó: se corta el audio en vez de dejar al reproductor esperando para siempre
+            break
+    request.wfile.write(b"0\r\n\r\n")
+
+
+def handleAudioQueue(request: BaseHTTPRequestHandler):
+    # Estado de la cola de reproducción (depuración).
+    broadcaster = requestBroadcaster(request, getQueryParams(request))
+    if broadcaster is None:
+        return
+    sendText(request, 200, json.dumps(broadcaster.snapshot(), ensure_ascii=False, indent=2),
+             "application/json; charset=utf-8")
+
+
+registerRoute("/audio/next", handleAudioNext)
+registerRoute("/audio/clip", handleAudioClip)
+registerRoute("/audio/queue", handleAudioQueue)
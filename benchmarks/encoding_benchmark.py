@@ -0,0 +1,188 @@
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from capture_obs_frame import CapturedFrame, computeCaptureSize, encodeImage
+
+DEFAULT_PROMPT = "Describe en una frase lo que ves en pantalla, como un streamer."
+
+
+def parseArgs():
+    # Argumentos de línea de comandos del benchmark de codificación.
+    parser = argparse.ArgumentParser(
+        description="Mide tamaño de payload y latencia del LLM para cada combinación de formato, calidad y resolución."
+    )
+    parser.add_argument("--image", help="Imagen de referencia (por ejemplo un frame guardado con app.save_frames)")
+    parser.add_argument("--from-obs", action="store_true", help="Tomar la imagen de referencia desde OBS")
+    parser.add_argument("--formats", default="png,jpg,webp", help="Formatos a probar, separados por coma")
+    parser.add_argument("--qualities", default="-1,85,70,50", help="Calidades a probar (-1 = por defecto)")
+    parser.add_argument("--long-edges", default="1280,896,672,448", help="Lados mayores a probar en píxeles")
+    parser.add_argument("--grayscale", action="store_true", help="Probar también cada combinación en escala de grises")
+    parser.add_argument("--runs", type=int, default=3, help="Llamadas al LLM por combinación")
+    parser.add_argument("--skip-llm", action="store_true", help="Solo medir bytes y tiempo de codificación")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="Prompt usado en las llamadas al LLM")
+    parser.add_argument("--output", help="Ruta del JSON de resultados (por defecto data/benchmarks/)")
+    return parser.parse_args()
+
+
+def loadReferenceImage(args) -> np.ndarray:
+    # Carga la imagen base desde disco o pidiéndole un screenshot a OBS en su tamaño configurado.
+    if args.image:
+        image = cv2.imread(args.image, cv2.IMREAD_COLOR)
+        if image is None:
+            raise FileNotFoundError(f"No se pudo leer la imagen: {args.image}")
+        return image
+
+    if args.from_obs:
+        from conn import createObsConnection
+        from capture_obs_frame import getObsCaptureConfig, grabScreenshotFromObs, resolveSourceName
+
+        ws, _ = createObsConnection()
+        try:
+            obs_config = getObsCaptureConfig()
+            source_name = resolveSourceName(ws, obs_config["capture_source_mode"], obs_config["capture_source_name"])
+            frame = grabScreenshotFromObs(ws, source_name, obs_config["capture_width"], obs_config["capture_height"])
+        finally:
+            ws.disconnect()
+        return cv2.imdecode(np.frombuffer(frame.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    raise ValueError("Debes indicar --image o --from-obs")
+
+
+def encodeVariant(image: np.ndarray, image_format: str, quality: int, long_edge: int, grayscale: bool) -> dict:
+    # Reproduce en proceso lo que OBS entregaría con esa configuración y mide el resultado.
+    height, width = image.shape[:2]
+    target_width, target_height = computeCaptureSize(width, height, long_edge)
+
+    start = time.perf_counter()
+    variant = image
+    if (target_width, target_height) != (width, height):
+        variant = cv2.resize(image, (target_width, target_height), interpolation=cv2.INTER_AREA)
+    if grayscale:
+        variant = cv2.cvtColor(variant, cv2.COLOR_BGR2GRAY)
+    data = encodeImage(variant, image_format, quality)
+    encode_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "format": image_format,
+        "quality": quality,
+        "long_edge": long_edge,
+        "grayscale": grayscale,
+        "width": target_width,
+        "height": target_height,
+        "bytes": len(data),
+        "base64_bytes": len(base64.b64encode(data)),
+        "encode_ms": round(encode_ms, 2),
+        "data": data,
+    }
+
+
+def measureLlm(client, variant: dict, prompt: str, runs: int) -> dict:
+    # Llama al LLM varias veces con la variante y resume los tiempos reportados por Ollama.
+    frame = CapturedFrame(
+        data=variant["data"],
+        image_format=variant["format"],
+        source_name="benchmark",
+        timestamp=time.time(),
+        width=variant["width"],
+        height=variant["height"],
+    )
+
+    samples: list[dict] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.generate(prompt, [frame], {"temperature": 0.7, "top_p": 0.9})
+        wall_ms = (time.perf_counter() - start) * 1000
+        timings = dict(client.last_timings or {})
+        timings["wall_ms"] = round(wall_ms, 1)
+        timings["response"] = response
+        samples.append(timings)
+
+    def median(key):
+        values = [sample[key] for sample in samples if sample.get(key) is not None]
+        return round(statistics.median(values), 1) if values else None
+
+    return {
+        "wall_ms_p50": median("wall_ms"),
+        "prompt_eval_ms_p50": median("prompt_eval_ms"),
+        "prompt_eval_count": samples[-1].get("prompt_eval_count"),
+        "eval_ms_p50": median("eval_ms"),
+        "sample_response": samples[-1].get("response", "")[:200],
+    }
+
+
+def printRow(result: dict):
+    llm = result.get("llm") or {}
+    print(
+        f"{result['format']:>5} q={result['quality']:>3} {result['width']:>5}x{result['height']:<5}"
+        f"{' gris' if result['grayscale'] else '     '} "
+        f"{result['bytes'] / 1024:>8.1f} KiB  b64 {result['base64_bytes'] / 1024:>8.1f} KiB  "
+        f"enc {result['encode_ms']:>6.1f} ms  "
+        f"prompt-eval {llm.get('prompt_eval_ms_p50', '-')!s:>7} ms  "
+        f"tokens {llm.get('prompt_eval_count', '-')!s:>5}  total {llm.get('wall_ms_p50', '-')!s:>7} ms"
+    )
+
+
+def main():
+    args = parseArgs()
+    image = loadReferenceImage(args)
+
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    qualities = [int(q) for q in args.qualities.split(",") if q.strip()]
+    long_edges = [int(edge) for edge in args.long_edges.split(",") if edge.strip()]
+    grayscale_options = [False, True] if args.grayscale else [False]
+
+    client = None
+    if not args.skip_llm:
+        from llm_client import getOllamaClient
+
+        client = getOllamaClient()
+        client.warmUp()
+
+    print(f"Imagen de referencia: {image.shape[1]}x{image.shape[0]}\n")
+
+    results: list[dict] = []
+    for image_format in formats:
+        # PNG no tiene calidad con pérdida: una sola pasada por tamaño
+        format_qualities = [-1] if image_format == "png" else qualities
+        for quality in format_qualities:
+            for long_edge in long_edges:
+                for grayscale in grayscale_options:
+                    variant = encodeVariant(image, image_format, quality, long_edge, grayscale)
+                    if client is not None:
+                        variant["llm"] = measureLlm(client, variant, args.prompt, args.runs)
+                    variant.pop("data")
+                    results.append(variant)
+                    printRow(variant)
+
+    output_path = args.output
+    if not output_path:
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join("data", "benchmarks", f"encoding_{timestamp}.json")
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "created_at": datetime.utcnow().isoformat() + "Z",
+                "reference_size": [image.shape[1], image.shape[0]],
+                "runs": args.runs,
+                "results": results,
+            },
+            file,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    print(f"\nResultados guardados en: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import base64
+import itertools
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+from websockets.sync.server import serve
+
+
+def generateCannedFrames(count: int, width: int = 1280, height: int = 720, image_format: str = "png") -> list[bytes]:
+    # Genera frames sintéticos con un degradado y un bloque que se mueve, para que cada frame sea distinto.
+    frames: list[bytes] = []
+    base = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+    for index in range(count):
+        image = cv2.cvtColor(base, cv2.COLOR_GRAY2BGR)
+        offset = int((index / max(count, 1)) * (width - 200))
+        cv2.rectangle(image, (offset, height // 3), (offset + 200, height // 3 + 200), (0, 0, 255), -1)
+        cv2.putText(image, f"frame {index}", (40, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        ok, buffer = cv2.imencode(f".{image_format}", image)
+        if not ok:
+            raise ValueError(f"No se pudo codificar el frame sintético como {image_format}")
+        frames.append(buffer.tobytes())
+    return frames
+
+
+def loadFramesFromDir(frames_dir: str) -> list[bytes]:
+    # Carga imágenes de un directorio (orden alfabético) para servirlas como capturas de OBS.
+    frames: list[bytes] = []
+    for name in sorted(os.listdir(frames_dir)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
+            with open(os.path.join(frames_dir, name), "rb") as file:
+                frames.append(file.read())
+    if not frames:
+        raise FileNotFoundError(f"No hay imágenes en: {frames_dir}")
+    return frames
+
+
+class FakeObsServer:
+    # Servidor obs-websocket v5 mínimo: handshake Hello/Identify y las peticiones que usa el pipeline.
+
+    def __init__(self, frames: list[bytes], host: str = "127.0.0.1", port: int = 0,
+                 scene_name: str = "Escena", latency_ms: float = 0.0):
+        self.frames = frames
+        self.scene_name = scene_name
+        self.latency_ms = latency_ms
+        self.request_counts: dict[str, int] = {}
+        self._connections: set = set()
+        self._frame_cycle = itertools.cycle(range(len(frames)))
+        self._lock = threading.Lock()
+
+        self._server = serve(self._handleConnection, host, port, max_size=None)
+        self.host = host
+        self.port = self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-obs", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def _handleConnection(self, websocket):
+        websocket.send(json.dumps({"op": 0, "d": {"obsWebSocketVersion": "5.5.0-fake", "rpcVersion": 1}}))
+
+        identify = json.loads(websocket.recv())
+        if identify.get("op") != 1:
+            websocket.close()
+            return
+        websocket.send(json.dumps({"op": 2, "d": {"negotiatedRpcVersion": 1}}))
+
+        with self._lock:
+            self._connections.add(websocket)
+        try:
+            for message in websocket:
+                data = json.loads(message)
+                if data.get("op") == 6:
+                    response = self.handleRequest(data["d"])
+                    websocket.send(json.dumps({"op": 7, "d": response}))
+                elif data.get("op") == 8:
+                    websocket.send(json.dumps({"op": 9, "d": self.handleBatch(data["d"])}))
+        finally:
+            with self._lock:
+                self._connections.discard(websocket)
+
+    def emitEvent(self, event_type: str, event_data: dict):
+        # Envía un evento (op 5) a todos los clientes conectados.
+        message = json.dumps({"op": 5, "d": {"eventType": event_type, "eventIntent": 4, "eventData": event_data}})
+        with self._lock:
+            connections = list(self._connections)
+        for websocket in connections:
+            websocket.send(message)
+
+    def switchScene(self, scene_name: str):
+        # Cambia la escena de programa y lo notifica como haría OBS.
+        self.scene_name = scene_name
+        self.emitEvent("CurrentProgramSceneChanged", {"sceneName": scene_name})
+
+    def handleBatch(self, batch: dict) -> dict:
+        # Responde un RequestBatch ejecutando cada petición en serie (una sola ida y vuelta de red).
+        with self._lock:
+            self.request_counts["RequestBatch"] = self.request_counts.get("RequestBatch", 0) + 1
+
+        results = []
+        for request in batch.get("requests", []):
+            result = self.handleRequest(request, simulate_latency=False)
+            results.append(result)
+            if batch.get("haltOnFailure") and not result["requestStatus"]["result"]:
+                break
+
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        return {"requestId": batch.get("requestId"), "results": results}
+
+    def handleRequest(self, request: dict, simulate_latency: bool = True) -> dict:
+        # Responde una petición individual con el formato RequestResponse de obs-websocket v5.
+        request_type = request.get("requestType")
+        request_data = request.get("requestData") or {}
+
+        with self._lock:
+            self.request_counts[request_type] = self.request_counts.get(request_type, 0) + 1
+
+        if simulate_latency and self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+        response_data = None
+        if request_type == "GetVersion":
+            response_data = {
+                "obsVersion": "30.0.0-fake",
+                "obsWebSocketVersion": "5.5.0-fake",
+                "rpcVersion": 1,
+                "platform": "fake",
+                "platformDescription": "benchmark",
+                "supportedImageFormats": ["png", "jpg", "webp"],
+            }
+        elif request_type == "GetCurrentProgramScene":
+            response_data = {"currentProgramSceneName": self.scene_name, "sceneName": self.scene_name}
+        elif request_type == "GetSourceScreenshot":
+            response_data = {"imageData": self.screenshot(request_data)}
+
+        if response_data is None:
+            return {
+                "requestType": request_type,
+                "requestId": request.get("requestId"),
+                "requestStatus": {"result": False, "code": 204, "comment": "Petición no soportada por el fake"},
+            }
+
+        return {
+            "requestType": request_type,
+            "requestId": request.get("requestId"),
+            "requestStatus": {"result": True, "code": 100},
+            "responseData": response_data,
+        }
+
+    def screenshot(self, request_data: dict) -> str:
+        # Devuelve el siguiente frame enlatado como data URI, re-codificado si piden otro formato o tamaño.
+        with self._lock:
+            data = self.frames[next(self._frame_cycle)]
+
+        image_format = request_data.get("imageFormat", "png")
+        width = request_data.get("imageWidth")
+        height = request_data.get("imageHeight")
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if width and height and (image.shape[1], image.shape[0]) != (width, height):
+            image = cv2.resize(image, (int(width), int(height)), interpolation=cv2.INTER_AREA)
+
+        params: list[int] = []
+        quality = request_data.get("imageCompressionQuality", -1)
+        if image_format == "jpg" and quality >= 0:
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif image_format == "webp" and quality >= 0:
+            params = [cv2.IMWRITE_WEBP_QUALITY, max(1, quality)]
+
+        ok, buffer = cv2.imencode(f".{image_format}", image, params)
+        if not ok:
+            raise ValueError(f"Formato no soportado por el fake: {image_format}")
+
+        mime = "jpeg" if image_format == "jpg" else image_format
+        return f"data:image/{mime};base64," + base64.b64encode(buffer.tobytes()).decode("utf-8")
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+from benchmarks.fakes import FakeObsServer, generateCannedFrames, loadFramesFromDir
+from run_report import compareWithBaseline, getGitCommit, peakRssMb, summarize
+from service_stubs import FakeFishClient, FakeOllamaServer
+
+STAGES = ("capture", "gate", "llm", "tts", "first_audio", "cycle")
+
+
+def parseArgs():
+    # Argumentos de línea de comandos del benchmark de extremo a extremo.
+    parser = argparse.ArgumentParser(
+        description="Ejecuta los componentes del pipeline contra OBS, Ollama y TTS simulados y reporta latencias."
+    )
+    parser.add_argument("--cycles", type=int, default=20, help="Intervenciones a ejecutar")
+    parser.add_argument("--frames-per-cycle", type=int, default=2, help="Frames por intervención")
+    parser.add_argument("--capture-interval", type=float, default=0.0, help="Segundos de captura por ciclo")
+    parser.add_argument("--frames-dir", help="Directorio con imágenes a servir como capturas (por defecto sintéticas)")
+    parser.add_argument("--config", default=os.getenv("APP_CONFIG_PATH", "config.yaml"), help="config.yaml base")
+    parser.add_argument("--background-capture", action="store_true", help="Tomar los frames del buffer de captura continua")
+    parser.add_argument("--stream", action="store_true", help="Usar llm.stream (TTS por frases)")
+    parser.add_argument("--preprocess-workers", type=int, default=0, help="Procesos del pool de preprocesado de frames (0 = en el hilo)")
+    parser.add_argument("--obs-latency-ms", type=float, default=5.0, help="Latencia simulada por petición a OBS")
+    parser.add_argument("--ollama-load-ms", type=float, default=0.0, help="Carga simulada del modelo (primera llamada)")
+    parser.add_argument("--ollama-prompt-ms", type=float, default=300.0, help="Prompt-eval simulado por imagen")
+    parser.add_argument("--ollama-tokens-per-second", type=float, default=40.0, help="Velocidad de generación simulada")
+    parser.add_argument("--tts-latency-ms", type=float, default=400.0, help="Latencia base simulada del TTS")
+    parser.add_argument("--tts-cache", action="store_true", help="Mantener la caché de audio TTS (la respuesta simulada siempre es la misma)")
+    parser.add_argument("--tts-ms-per-char", type=float, default=2.0, help="Costo simulado del TTS por carácter")
+    parser.add_argument("--output", help="Ruta del JSON de resultados (por defecto data/benchmarks/)")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Regresión tolerada en p95 (0.2 = 20%%)")
+    return parser.parse_args()
+
+
+def writeBenchmarkConfig(args, data_dir: str) -> str:
+    # Copia config.yaml con datos en un directorio temporal y los parámetros del benchmark aplicados.
+    with open(args.config, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+
+    config["app"]["data_dir"] = data_dir
+    config["app"]["frames_per_cycle"] = args.frames_per_cycle
+    config["app"]["capture_interval_seconds"] = args.capture_interval
+    config["app"]["debug"] = False
+    config["app"]["background_capture"] = bool(args.background_capture)
+    config["obs"]["preprocess_workers"] = args.preprocess_workers
+    config["llm"]["stream"] = bool(args.stream)
+    config["llm"]["warmup_on_start"] = False
+    config["tts"]["cache_enabled"] = bool(args.tts_cache)
+
+    config_path = os.path.join(data_dir, "benchmark_config.yaml")
+    with open(config_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+    return config_path
+
+
+def firstAudioDelay(fake_fish, cycle_start: float) -> float | None:
+    # Tiempo desde el inicio del ciclo hasta que terminó la primera síntesis (el reproductor ya puede empezar).
+    completed = [moment for moment in fake_fish.tts.completed_at if moment >= cycle_start]
+    return min(completed) - cycle_start if completed else None
+
+
+def runCycles(args, source, paths: dict, params: dict, fake_fish, capture_worker=None) -> dict[str, list[float]]:
+    # Ejecuta N intervenciones con los mismos componentes que usa runPipeline y mide cada etapa.
+    from frame_similarity import createSceneChangeGate
+    from llm_client import runLlm, runLlmStreaming
+    from pipeline import captureCycleFrames, sendToTts
+    from tts_client import SentenceSpeaker
+
+    samples: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    scene_gate = createSceneChangeGate()
+    prompt_base = params["prompt_base"].strip()
+
+    for cycle in range(args.cycles):
+        cycle_start = time.perf_counter()
+
+        start = time.perf_counter()
+        frames = captureCycleFrames(source, capture_worker, paths["frames_dir"], params["frames_per_cycle"],
+                                    params["capture_interval_seconds"])
+        samples["capture"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        frames = scene_gate.dedupeFrames(frames)
+        samples["gate"].append(time.perf_counter() - start)
+
+        if args.stream:
+            speaker = SentenceSpeaker(paths["audio_dir"])
+            start = time.perf_counter()
+            runLlmStreaming(prompt_base, frames, [], paths["llm_log_file"], speaker.speak)
+            samples["llm"].append(time.perf_counter() - start)
+
+            # tiempo extra que el TTS necesita después de que el LLM terminó
+            start = time.perf_counter()
+            speaker.finish()
+            samples["tts"].append(time.perf_counter() - start)
+        else:
+            start = time.perf_counter()
+            response = runLlm(prompt_base, frames, [], paths["llm_log_file"])
+            samples["llm"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            sendToTts(response, paths["audio_dir"])
+            samples["tts"].append(time.perf_counter() - start)
+
+        first_audio = firstAudioDelay(fake_fish, cycle_start)
+        if first_audio is not None:
+            samples["first_audio"].append(first_audio)
+
+        samples["cycle"].append(time.perf_counter() - cycle_start)
+        print(f"[bench] ciclo {cycle + 1}/{args.cycles}: {samples['cycle'][-1] * 1000:.0f} ms")
+
+    return samples
+
+
+def main():
+    args = parseArgs()
+
+    frames = loadFramesFromDir(args.frames_dir) if args.frames_dir else generateCannedFrames(8)
+    obs_server = FakeObsServer(frames, latency_ms=args.obs_latency_ms).start()
+    ollama_server = FakeOllamaServer(
+        load_ms=args.ollama_load_ms,
+        prompt_eval_ms_per_image=args.ollama_prompt_ms,
+        tokens_per_second=args.ollama_tokens_per_second,
+    ).start()
+
+    data_dir = tempfile.mkdtemp(prefix="avatar-bench-")
+    os.environ["APP_CONFIG_PATH"] = writeBenchmarkConfig(args, data_dir)
+    os.environ["OLLAMA_URL"] = ollama_server.url
+    os.environ.setdefault("FISH_API_KEY", "benchmark")
+
+    import tts_client
+    from paths_manager import getAppParams, getAppPaths
+
+    fake_fish = FakeFishClient(args.tts_latency_ms, args.tts_ms_per_char)
+    tts_client._fish_client = fake_fish
+
+    paths = getAppPaths()
+    params = getAppParams()
+
+    from conn import ObsClient, startSceneTracker
+
+    ws = ObsClient(obs_server.host, obs_server.port, "")
+    ws.connect()
+    startSceneTracker(ws)
+
+    from frame_buffer import startBackgroundCapture
+    from frame_preprocess import closeFramePreprocessPool, getFramePreprocessPool
+    from frame_source import ObsFrameSource
+
+    # el arranque de los procesos queda fuera de las mediciones, igual que en runPipeline
+    getFramePreprocessPool()
+    source = ObsFrameSource(ws)
+    capture_worker = startBackgroundCapture(source)
+
+    wall_start = time.perf_counter()
+    try:
+        samples = runCycles(args, source, paths, params, fake_fish, capture_worker)
+    finally:
+        if capture_worker is not None:
+            capture_worker.stop()
+        ws.disconnect()
+        closeFramePreprocessPool()
+        obs_server.stop()
+        ollama_server.stop()
+    wall_seconds = time.perf_counter() - wall_start
+
+    summary = summarize(samples)
+    result = {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "commit": getGitCommit(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "cycles": args.cycles,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_reactions_per_minute": round(args.cycles / wall_seconds * 60, 2) if wall_seconds > 0 else None,
+        "peak_rss_mb": peakRssMb(),
+        "obs_requests": obs_server.request_counts,
+        "tts_calls": fake_fish.tts.calls,
+        "tts_characters": fake_fish.tts.characters,
+        "stages": summary,
+    }
+
+    print("\nResultados:")
+    for stage, stats in summary.items():
+        print(f"\t- {stage:<12} p50 {stats['p50_ms']:>9.1f} ms   p95 {stats['p95_ms']:>9.1f} ms   p99 {stats['p99_ms']:>9.1f} ms")
+    print(f"\t- Throughput: {result['throughput_reactions_per_minute']} reacciones/min")
+    print(f"\t- RSS pico: {result['peak_rss_mb']} MB")
+    print(f"\t- Peticiones a OBS: {obs_server.request_counts}")
+
+    output_path = args.output
+    if not output_path:
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join("data", "benchmarks", f"pipeline_{timestamp}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en: {output_path}")
+
+    if args.baseline:
+        print(f"\nComparación con {args.baseline} (tolerancia {args.tolerance:.0%}):")
+        regressions = compareWithBaseline(summary, args.baseline, args.tolerance)
+        if regressions:
+            print(f"[!] Regresiones en: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,245 @@
 import os
 import time
 import base64
-from io import BytesIO
+from dataclasses import dataclass, field
 
-from PIL import Image
+import cv2
+import numpy as np
 from obswebsocket import requests
 
-from config_loader import getConfigManager
+from config_loader import getConfig, getCurrentStream
+from conn import ObsUnavailable, getSceneTracker
+from frame_preprocess import encodeImage, getFramePreprocessPool, readImageSize
+from metrics import FRAME_PREPROCESS_TOTAL, IMAGE_ENCODING_SECONDS, OBS_SCREENSHOT_SECONDS
+
+# qwen2.5-vl trabaja con parches de 14 px agrupados de a 2: lados múltiplos de 28 no desperdician tokens
+SIZE_MULTIPLE = 28
+
+_adaptive_controllers = {}  # controlador de resolución adaptativa de cada stream (None = modo de un solo stream)
+
+
+@dataclass
+class CapturedFrame:
+    # Frame capturado en memoria: bytes crudos de la imagen más metadatos de la captura.
+    data: bytes
+    image_format: str
+    source_name: str
+    timestamp: float
+    width: int
+    height: int
+    index: int = 0
+    path: str | None = None  # ruta en disco solo si se guardó como depuración
+    label: str | None = None  # nombre con el que se presenta la fuente al LLM (modo multi_source)
+    b64: str | None = field(default=None, repr=False)  # base64 original de OBS, evita re-codificar
+    dhash: int | None = field(default=None, repr=False)  # hash perceptual, se calcula bajo demanda
+    thumbnail: np.ndarray | None = field(default=None, repr=False)  # miniatura para elegir keyframes, bajo demanda
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.data)
+
+    def toBase64(self) -> str:
+        # Devuelve la imagen en base64 reutilizando la cadena de OBS cuando existe.
+        if self.b64 is None:
+            self.b64 = base64.b64encode(self.data).decode("utf-8")
+        return self.b64
+
+    def describe(self) -> dict:
+        # Metadatos serializables del frame (para logs), sin los bytes de la imagen.
+        return {
+            "index": self.index,
+            "source": self.source_name,
+            "label": self.label,
+            "timestamp": self.timestamp,
+            "format": self.image_format,
+            "width": self.width,
+            "height": self.height,
+            "bytes": self.size_bytes,
+            "path": self.path,
+        }
+
+
+class PendingFrame:
+    # Captura cuyo preprocesado corre en el pool de procesos; resolve() espera el resultado y arma el frame.
+
+    def __init__(self, future, img_base64: str, source_name: str, width: int, height: int, index: int,
+                 image_format: str, timestamp: float, label: str | None, encoding_config: dict):
+        self.future = future
+        self.img_base64 = img_base64
+        self.source_name = source_name
+        self.width = width
+        self.height = height
+        self.index = index
+        self.image_format = image_format
+        self.timestamp = timestamp
+        self.label = label
+        self.encoding_config = encoding_config
+
+    def resolve(self) -> CapturedFrame:
+        try:
+            result = self.future.result()
+        except Exception as error:
+            # un proceso del pool murió: este frame se procesa aquí y los siguientes también, si el pool quedó roto
+            print(f"\t[!] Falló el preprocesado en paralelo del frame {self.index} ({error}); se procesa en este hilo")
+            FRAME_PREPROCESS_TOTAL.inc(mode="fallback")
+            frame = frameFromBase64(self.img_base64, self.source_name, self.width, self.height, self.index,
+                                    self.image_format, self.timestamp, self.label)
+            return applyInProcessEncoding(frame, self.encoding_config)
+
+        IMAGE_ENCODING_SECONDS.observe(result["seconds"], step="pool")
+        if self.encoding_config["grayscale"] and not result["reencoded"]:
+            print(f"\t[!] No se pudo decodificar el frame {self.index} para pasarlo a escala de grises")
+
+        return CapturedFrame(
+            data=result["data"],
+            image_format=self.image_format,
+            source_name=self.source_name,
+            timestamp=self.timestamp,
+            width=result["width"],
+            height=result["height"],
+            index=self.index,
+            label=self.label,
+            b64=result["b64"] or self.img_base64,
+            dhash=result["dhash"],
+            thumbnail=result["thumbnail"],
+        )
 
 
 def isDebugEnabled():
     # Devuelve true si el modo debug está activo en config.app.debug.
-    app_config = getConfigManager().getSection("app")
-    return bool(app_config["debug"])
-
+    return getConfig().app.debug
 
-def getObsCaptureConfig():
-    # Lee la configuración de captura desde la sección obs de config.yaml.
-    config_manager = getConfigManager()
-    obs_config = config_manager.getSection("obs")
 
-    capture_source_mode = obs_config["capture_source_mode"]
-    capture_source_name = obs_config["capture_source_name"]
-    capture_width = obs_config["capture_width"]
-    capture_height = obs_config["capture_height"]
+def isFrameSavingEnabled():
+    # Devuelve true si los frames deben escribirse también en disco (config.app.save_frames).
+    return getConfig().app.save_frames
 
-    if capture_source_mode not in ("program_scene", "source"):
-        raise ValueError("obs.capture_source_mode debe ser 'program_scene' o 'source'")
 
-    if capture_source_mode == "source" and not capture_source_name:
-        raise ValueError("obs.capture_source_name debe definirse cuando capture_source_mode es 'source'")
+def getObsCaptureConfig():
+    # Configuración de captura de la sección obs (ya validada en el snapshot de config).
+    obs_config = getConfig().obs
+    return {
+        "capture_source_mode": obs_config.capture_source_mode,
+        "capture_source_name": obs_config.capture_source_name,
+        "capture_width": obs_config.capture_width,
+        "capture_height": obs_config.capture_height,
+        "capture_sources": obs_config.capture_sources,
+    }
 
-    try:
-        capture_width = int(capture_width)
-        capture_height = int(capture_height)
-    except ValueError:
-        raise ValueError("obs.capture_width y obs.capture_height deben ser enteros")
 
+def getFrameEncodingConfig() -> dict:
+    # Formato, calidad, tamaño y modo adaptativo de la sección obs (ya validados en el snapshot).
+    obs_config = getConfig().obs
     return {
-        "capture_source_mode": capture_source_mode,
-        "capture_source_name": capture_source_name,
-        "capture_width": capture_width,
-        "capture_height": capture_height,
+        "image_format": obs_config.image_format,
+        "image_quality": obs_config.image_quality,
+        "max_long_edge": obs_config.max_long_edge,
+        "grayscale": obs_config.grayscale,
+        "adaptive_resolution": obs_config.adaptive_resolution,
+        "adaptive_target_prompt_eval_ms": obs_config.adaptive_target_prompt_eval_ms,
+        "adaptive_min_long_edge": obs_config.adaptive_min_long_edge,
+        "adaptive_max_long_edge": obs_config.adaptive_max_long_edge,
     }
 
 
+def roundToMultiple(value: float, multiple: int = SIZE_MULTIPLE) -> int:
+    return max(multiple, int(round(value / multiple)) * multiple)
+
+
+def computeCaptureSize(width: int, height: int, long_edge: int) -> tuple[int, int]:
+    # Escala (width, height) para que el lado mayor mida long_edge, manteniendo la proporción.
+    if long_edge <= 0 or long_edge >= max(width, height):
+        return width, height
+
+    scale = long_edge / float(max(width, height))
+    return roundToMultiple(width * scale), roundToMultiple(height * scale)
+
+
+def applyInProcessEncoding(frame: CapturedFrame, encoding_config: dict) -> CapturedFrame:
+    # Transformaciones que OBS no ofrece (escala de grises): decodifica, convierte y re-codifica el frame.
+    if not encoding_config["grayscale"]:
+        return frame
+
+    with IMAGE_ENCODING_SECONDS.time(step="grayscale"):
+        gray = cv2.imdecode(np.frombuffer(frame.data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            print(f"\t[!] No se pudo decodificar el frame {frame.index} para pasarlo a escala de grises")
+            return frame
+
+        frame.data = encodeImage(gray, frame.image_format, encoding_config["image_quality"])
+    frame.b64 = None
+    frame.dhash = None
+    return frame
+
+
+class AdaptiveResolutionController:
+    # Ajusta el lado mayor de la captura según el prompt-eval medido en Ollama para acercarse a un objetivo.
+
+    def __init__(self, target_prompt_eval_ms: float, min_long_edge: int, max_long_edge: int, initial_long_edge: int):
+        self.target_prompt_eval_ms = target_prompt_eval_ms
+        self.min_long_edge = min_long_edge
+        self.max_long_edge = max_long_edge
+        self.long_edge = min(max(initial_long_edge, min_long_edge), max_long_edge)
+
+    def observe(self, prompt_eval_ms: float | None):
+        # Reduce la resolución si el prompt tarda más de lo deseado y la sube si sobra margen.
+        if prompt_eval_ms is None or prompt_eval_ms <= 0:
+            return
+
+        previous = self.long_edge
+        if prompt_eval_ms > self.target_prompt_eval_ms * 1.15:
+            self.long_edge = max(self.min_long_edge, roundToMultiple(self.long_edge * 0.85))
+        elif prompt_eval_ms < self.target_prompt_eval_ms * 0.7:
+            self.long_edge = min(self.max_long_edge, roundToMultiple(self.long_edge * 1.1))
+
+        if isDebugEnabled() and self.long_edge != previous:
+            print(f"[i] Resolución adaptativa: prompt-eval {prompt_eval_ms:.0f} ms "
+                  f"(objetivo {self.target_prompt_eval_ms:.0f} ms) → lado mayor {previous} → {self.long_edge} px")
+
+
+def getAdaptiveController(encoding_config: dict, width: int, height: int) -> AdaptiveResolutionController:
+    # Devuelve el controlador adaptativo del stream actual, creado con los límites de config.obs.
+    stream_name = getCurrentStream()
+    controller = _adaptive_controllers.get(stream_name)
+    if controller is None:
+        initial = encoding_config["max_long_edge"] or max(width, height)
+        controller = AdaptiveResolutionController(
+            target_prompt_eval_ms=encoding_config["adaptive_target_prompt_eval_ms"],
+            min_long_edge=encoding_config["adaptive_min_long_edge"],
+            max_long_edge=encoding_config["adaptive_max_long_edge"],
+            initial_long_edge=initial,
+        )
+        _adaptive_controllers[stream_name] = controller
+    return controller
+
+
+def resolveCaptureSize(encoding_config: dict, width: int, height: int) -> tuple[int, int]:
+    # Tamaño que se pide a OBS: fijo por max_long_edge o el que decida el modo adaptativo.
+    if encoding_config["adaptive_resolution"]:
+        long_edge = getAdaptiveController(encoding_config, width, height).long_edge
+    else:
+        long_edge = encoding_config["max_long_edge"]
+    return computeCaptureSize(width, height, long_edge)
+
+
+def reportPromptEvalTiming(timings: dict | None):
+    # Alimenta el modo adaptativo del stream actual con los tiempos de la última llamada al LLM.
+    controller = _adaptive_controllers.get(getCurrentStream())
+    if controller is None or not timings:
+        return
+    controller.observe(timings.get("prompt_eval_ms"))
+
+
 def resolveSourceName(ws, capture_source_mode: str, capture_source_name: str) -> str:
     # Determina el nombre del source o escena desde el cual capturar la imagen.
     if capture_source_mode == "program_scene":
-        current = ws.call(requests.GetCurrentProgramScene())
-        scene_name = current.datain["currentProgramSceneName"]
+        # con el seguidor de eventos activo la escena sale de la caché, sin ida y vuelta a OBS
+        tracker = getSceneTracker(ws)
+        if tracker is not None:
+            scene_name = tracker.getCurrentScene()
+        else:
+            current = ws.call(requests.GetCurrentProgramScene())
+            scene_name = current.datain["currentProgramSceneName"]
         if isDebugEnabled():
             print(f"\t- Escena actual de programa: {scene_name}")
         return scene_name
@@ -59,113 +249,323 @@ def resolveSourceName(ws, capture_source_mode: str, capture_source_name: str) ->
     return capture_source_name
 
 
-def saveScreenshotFromObs(ws, source_name: str, width: int, height: int, output_path: str):
-    # Pide un screenshot a OBS y lo guarda en output_path.
-    response = ws.call(
-        requests.GetSourceScreenshot(
-            sourceName=source_name,
-            imageFormat="png",
-            imageWidth=width,
-            imageHeight=height,
-        )
+def grabScreenshotFromObs(
+    ws,
+    source_name: str,
+    width: int,
+    height: int,
+    index: int = 0,
+    image_format: str = "png",
+    image_quality: int = -1,
+) -> CapturedFrame:
+    # Pide un screenshot a OBS (ya escalado y codificado por OBS) y lo devuelve como frame en memoria.
+    response, timestamp = requestScreenshot(ws, source_name, width, height, image_format, image_quality)
+    return frameFromScreenshot(response, source_name, width, height, index, image_format, timestamp)
+
+
+def requestScreenshot(ws, source_name: str, width: int, height: int, image_format: str, image_quality: int):
+    # Hace la petición GetSourceScreenshot; devuelve la respuesta y el instante de la captura.
+    timestamp = time.time()
+    with OBS_SCREENSHOT_SECONDS.time():
+        response = ws.call(buildScreenshotRequest(source_name, width, height, image_format, image_quality))
+    return response, timestamp
+
+
+def buildScreenshotRequest(source_name: str, width: int, height: int, image_format: str, image_quality: int):
+    return requests.GetSourceScreenshot(
+        sourceName=source_name,
+        imageFormat=image_format,
+        imageWidth=width,
+        imageHeight=height,
+        imageCompressionQuality=image_quality,
     )
 
+
+def frameFromScreenshot(
+    response,
+    source_name: str,
+    width: int,
+    height: int,
+    index: int,
+    image_format: str,
+    timestamp: float,
+    label: str | None = None,
+) -> CapturedFrame:
+    # Decodifica la respuesta de GetSourceScreenshot en un CapturedFrame.
+    return frameFromBase64(screenshotBase64(response), source_name, width, height, index, image_format, timestamp, label)
+
+
+def screenshotBase64(response) -> str:
+    # Base64 de la imagen de una respuesta de GetSourceScreenshot, sin el prefijo data URI.
     img_base64 = response.datain["imageData"]
     if img_base64.startswith("data:"):
         img_base64 = img_base64.split(",", 1)[1]
+    return img_base64
+
+
+def frameFromBase64(
+    img_base64: str,
+    source_name: str,
+    width: int,
+    height: int,
+    index: int,
+    image_format: str,
+    timestamp: float,
+    label: str | None = None,
+) -> CapturedFrame:
+    # Decodifica en este hilo el base64 de una captura en un CapturedFrame.
+    with IMAGE_ENCODING_SECONDS.time(step="decode"):
+        img_bytes = base64.b64decode(img_base64)
+    real_width, real_height = readImageSize(img_bytes, width, height)
+
+    return CapturedFrame(
+        data=img_bytes,
+        image_format=image_format,
+        source_name=source_name,
+        timestamp=timestamp,
+        width=real_width,
+        height=real_height,
+        index=index,
+        b64=img_base64,
+        label=label,
+    )
 
-    img_bytes = base64.b64decode(img_base64)
 
-    image = Image.open(BytesIO(img_bytes))
-    try:
-        image.save(output_path)
-    finally:
-        image.close()
+def requestSourcesBatch(ws, sources: list[tuple[str, str, int, int]], image_format: str, image_quality: int):
+    # Hace las peticiones del lote; devuelve pares (fuente, respuesta) de las que sí trajeron imagen y el instante.
+    request_list = [
+        buildScreenshotRequest(name, width, height, image_format, image_quality)
+        for name, _, width, height in sources
+    ]
 
+    timestamp = time.time()
+    with OBS_SCREENSHOT_SECONDS.time():
+        if hasattr(ws, "callBatch"):
+            responses = ws.callBatch(request_list)
+        else:
+            responses = [ws.call(request) for request in request_list]
+
+    captured = []
+    for source, response in zip(sources, responses):
+        if not response.status or "imageData" not in response.datain:
+            print(f"\t[!] OBS no devolvió captura para la fuente '{source[0]}': {response.datain}")
+            continue
+        captured.append((source, response))
+    return captured, timestamp
 
-def captureFrames(ws, frames_dir: str, frames_per_cycle: int, capture_interval_seconds: int) -> list[str]:
-    # Captura N frames desde OBS distribuidos a lo largo de un intervalo fijo.
-    if frames_per_cycle <= 0:
-        raise ValueError("frames_per_cycle debe ser mayor que 0")
 
-    # Limpia PNGs previos para no mezclar frames de ciclos distintos.
+def saveFrameToDisk(frame: CapturedFrame, output_path: str):
+    # Sink de depuración: escribe los bytes del frame tal cual en output_path.
+    with open(output_path, "wb") as file:
+        file.write(frame.data)
+    frame.path = output_path
+
+
+def clearSavedFrames(frames_dir: str):
+    # Limpia imágenes previas para no mezclar frames de ciclos distintos (solo si se guardan en disco).
     try:
         for fname in os.listdir(frames_dir):
-            if fname.lower().endswith(".png"):
+            if fname.lower().endswith((".png", ".jpg", ".webp")):
                 fpath = os.path.join(frames_dir, fname)
                 if os.path.isfile(fpath):
                     os.remove(fpath)
         if isDebugEnabled():
-            print(f"\n\t- Frames PNG previos eliminados en: {frames_dir}")
+            print(f"\n\t- Frames previos eliminados en: {frames_dir}")
     except Exception as error:
         print(f"\t[!] No se pudieron limpiar los frames previos: {error}")
 
-    if isDebugEnabled():
-        print(f"\nCapturando {frames_per_cycle} frames desde OBS en: {frames_dir}")
 
+def saveCapturedFrames(frames: list[CapturedFrame], frames_dir: str, timestamp: int):
+    # Escribe los frames del ciclo como frame_<timestamp>_<índice>[_<fuente>].<formato>.
+    positions: dict[int, int] = {}
+    for frame in frames:
+        position = positions.get(frame.index, 0)
+        positions[frame.index] = position + 1
+        # en multi_source varias fuentes comparten índice: se agrega su posición dentro del lote
+        suffix = f"_{position}" if frame.label is not None else ""
+        frame_name = f"frame_{timestamp}_{frame.index}{suffix}.{frame.image_format}"
+        try:
+            saveFrameToDisk(frame, os.path.join(frames_dir, frame_name))
+        except Exception as error:
+            print(f"\t[!] No se pudo guardar el frame en disco: {error}")
+
+
+def getCapturePlan() -> dict:
+    # Resuelve qué capturar y a qué tamaño según la config vigente (una fuente o varias en lote).
     obs_config = getObsCaptureConfig()
+    encoding_config = getFrameEncodingConfig()
+
+    capture_width, capture_height = resolveCaptureSize(
+        encoding_config, obs_config["capture_width"], obs_config["capture_height"]
+    )
+
+    # modo multi_source: (nombre, etiqueta, ancho, alto) por fuente, cada una escalada por separado
+    batch_sources: list[tuple[str, str, int, int]] = []
+    if obs_config["capture_source_mode"] == "multi_source":
+        for source in obs_config["capture_sources"]:
+            width, height = resolveCaptureSize(encoding_config, source.width, source.height)
+            batch_sources.append((source.name, source.label, width, height))
+
+    return {
+        "capture_source_mode": obs_config["capture_source_mode"],
+        "capture_source_name": obs_config["capture_source_name"],
+        "capture_width": capture_width,
+        "capture_height": capture_height,
+        "batch_sources": batch_sources,
+        "encoding": encoding_config,
+    }
+
+
+def preprocessScreenshot(response, source: tuple[str, str | None, int, int], index: int, timestamp: float,
+                         encoding_config: dict) -> CapturedFrame | PendingFrame:
+    # Manda la captura al pool de preprocesado (obs.preprocess_workers) o, si no hay, la procesa en este hilo.
+    return preprocessImage(screenshotBase64(response), source, index, timestamp, encoding_config)
+
+
+def preprocessImage(img_base64: str, source: tuple[str, str | None, int, int], index: int, timestamp: float,
+                    encoding_config: dict) -> CapturedFrame | PendingFrame:
+    # Igual que preprocessScreenshot a partir del base64 de la imagen (lo usan también las fuentes de replay).
+    name, label, width, height = source
+    image_format = encoding_config["image_format"]
+    pool = getFramePreprocessPool()
+    if pool is not None:
+        options = {
+            "image_format": image_format,
+            "image_quality": encoding_config["image_quality"],
+            "grayscale": encoding_config["grayscale"],
+            "thumbnail": getConfig().app.keyframe_selection,
+            "width": width,
+            "height": height,
+        }
+        future = pool.submit(img_base64, options)
+        if future is not None:
+            FRAME_PREPROCESS_TOTAL.inc(mode="pool")
+            return PendingFrame(future, img_base64, name, width, height, index, image_format, timestamp, label,
+                                encoding_config)
+
+    FRAME_PREPROCESS_TOTAL.inc(mode="inline")
+    frame = frameFromBase64(img_base64, name, width, height, index, image_format, timestamp, label)
+    return applyInProcessEncoding(frame, encoding_config)
+
+
+def submitCaptureStep(ws, plan: dict, index: int = 0) -> list[CapturedFrame | PendingFrame]:
+    # Una captura según el plan (un frame, o uno por fuente en modo multi_source). Solo espera a OBS:
+    # el preprocesado puede seguir en el pool mientras el llamador continúa con su ritmo de captura.
+    encoding_config = plan["encoding"]
+    image_format = encoding_config["image_format"]
+    image_quality = encoding_config["image_quality"]
+
+    if plan["batch_sources"]:
+        captured, timestamp = requestSourcesBatch(ws, plan["batch_sources"], image_format, image_quality)
+    else:
+        source_name = resolveSourceName(ws, plan["capture_source_mode"], plan["capture_source_name"])
+        source = (source_name, None, plan["capture_width"], plan["capture_height"])
+        response, timestamp = requestScreenshot(ws, source_name, source[2], source[3], image_format, image_quality)
+        captured = [(source, response)]
+
+    return [preprocessScreenshot(response, source, index, timestamp, encoding_config) for source, response in captured]
+
+
+def resolveFrames(items: list[CapturedFrame | PendingFrame]) -> list[CapturedFrame]:
+    # Espera los frames que siguen en el pool y devuelve todos ya listos, en el mismo orden.
+    return [item.resolve() if isinstance(item, PendingFrame) else item for item in items]
+
+
+def grabCaptureStep(source, plan: dict, index: int = 0) -> list[CapturedFrame]:
+    # Una captura del origen de frames (ver frame_source.py) según el plan, esperando a que sus frames estén listos.
+    return resolveFrames(source.submitStep(plan, index))
+
+
+def printCapturedFrames(frames: list[CapturedFrame]):
+    print("\t- Frames capturados:")
+    for frame in frames:
+        location = frame.path or "memoria"
+        print(f"\t\t-> {frame.label or frame.source_name} {frame.width}x{frame.height} ({frame.size_bytes} bytes, {location})")
+
+
+def captureFrames(source, frames_dir: str, frames_per_cycle: int, capture_interval_seconds: int) -> list[CapturedFrame]:
+    # Captura N frames del origen (OBS o una grabación, ver frame_source.py) distribuidos a lo largo de un intervalo fijo.
+    # El espaciado usa el reloj del origen: en un replay a máxima velocidad las esperas solo avanzan la grabación.
+    if frames_per_cycle <= 0:
+        raise ValueError("frames_per_cycle debe ser mayor que 0")
 
-    capture_source_mode = obs_config["capture_source_mode"]
-    capture_source_name = obs_config["capture_source_name"]
-    capture_width = obs_config["capture_width"]
-    capture_height = obs_config["capture_height"]
+    save_frames = isFrameSavingEnabled()
+    if save_frames:
+        clearSavedFrames(frames_dir)
+
+    if isDebugEnabled():
+        print(f"\nCapturando {frames_per_cycle} frames desde {source.name} (en memoria)")
+
+    plan = getCapturePlan()
+
+    if isDebugEnabled():
+        encoding_config = plan["encoding"]
+        print(f"\t- Captura solicitada: {plan['capture_width']}x{plan['capture_height']} "
+              f"{encoding_config['image_format']} (calidad {encoding_config['image_quality']})")
+        if plan["batch_sources"]:
+            described = ", ".join(f"{name} {width}x{height}" for name, _, width, height in plan["batch_sources"])
+            print(f"\t- Fuentes en lote: {described}")
 
     interval_per_frame = capture_interval_seconds / float(frames_per_cycle)
-    frame_paths: list[str] = []
+    pending: list[CapturedFrame | PendingFrame] = []
 
-    start_time = time.time()
-    timestamp = int(start_time * 1000)  # ms para distinguir ciclos muy seguidos
+    start_time = source.now()
+    timestamp = int(time.time() * 1000)  # ms para distinguir ciclos muy seguidos
 
     if isDebugEnabled():
         print(f"\t- Inicio de captura (timestamp): {start_time:.3f} ({timestamp})")
 
     for index in range(frames_per_cycle):
-        frame_start = time.time()
-
-        # Nombre con timestamp + índice dentro del ciclo
-        frame_name = f"frame_{timestamp}_{index}.png"
-        frame_path = os.path.join(frames_dir, frame_name)
+        frame_start = source.now()
 
         if isDebugEnabled():
-            print(f"\t- Capturando frame {index + 1}/{frames_per_cycle} -> {frame_name}")
-
-        source_name = resolveSourceName(ws, capture_source_mode, capture_source_name)
-        saveScreenshotFromObs(ws, source_name, capture_width, capture_height, frame_path)
-
-        frame_end = time.time()
+            print(f"\t- Capturando frame {index + 1}/{frames_per_cycle}")
+
+        # con el pool activo solo se espera a OBS: el espaciado entre frames no incluye el trabajo de CPU
+        try:
+            pending.extend(source.submitStep(plan, index))
+        except ObsUnavailable:
+            # OBS se cayó a mitad del ciclo: se reacciona con lo que ya se capturó (sin nada, el ciclo se omite)
+            if not pending:
+                raise
+            print(f"\t[!] OBS dejó de responder en el frame {index + 1}/{frames_per_cycle}; "
+                  f"se sigue con {len(pending)} capturas")
+            break
+
+        frame_end = source.now()
         frame_elapsed = frame_end - frame_start
         if isDebugEnabled():
             print(f"\t\t- Tiempo de captura del frame: {frame_elapsed:.3f} s")
 
-        frame_paths.append(frame_path)
-
         if index < frames_per_cycle - 1:
             target_time = start_time + (index + 1) * interval_per_frame
-            sleep_time = target_time - time.time()
+            sleep_time = target_time - source.now()
             if sleep_time > 0:
                 if isDebugEnabled():
                     print(f"\t\t- Esperando {sleep_time:.3f} s antes del siguiente frame...")
-                time.sleep(sleep_time)
+                source.sleep(sleep_time)
+
+    frames = resolveFrames(pending)
 
-    now = time.time()
+    if save_frames:
+        saveCapturedFrames(frames, frames_dir, timestamp)
+
+    now = source.now()
     elapsed_so_far = now - start_time
     remaining = capture_interval_seconds - elapsed_so_far
     if remaining > 0:
         if isDebugEnabled():
             print(f"\t- Esperando {remaining:.3f} s para completar el intervalo de captura...")
-        time.sleep(remaining)
+        source.sleep(remaining)
 
-    end_time = time.time()
+    end_time = source.now()
     total_elapsed = end_time - start_time
     diff = total_elapsed - capture_interval_seconds
 
     if isDebugEnabled():
-        print("\t- Frames capturados:")
-        for path in frame_paths:
-            print(f"\t\t-> {path}")
-
+        printCapturedFrames(frames)
         print(f"\t- Tiempo total real de captura: {total_elapsed:.3f} s")
         print(f"\t- Tiempo configurado en YAML: {capture_interval_seconds} s")
         print(f"\t- Diferencia: {diff:+.3f} s")
 
-    return frame_paths
+    return frames
@@ -1,7 +1,530 @@
+import copy
 import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field, fields
+
 import yaml
 
+SUPPORTED_IMAGE_FORMATS = ("png", "jpg", "webp")
+DEADLINE_POLICIES = ("skip", "filler", "short_prompt")
+REPETITION_POLICIES = ("regenerate", "skip")
+HISTORY_FSYNC_POLICIES = ("always", "interval", "never")
+AUDIO_DELIVERY_MODES = ("http", "file")
+
 _config_manager = None  # instancia global única de configuración
+_config_watcher = None  # hilo global que vigila cambios en config.yaml
+_stream_context = threading.local()  # stream activo en cada hilo (modo multi-stream)
+
+STREAM_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+@dataclass(frozen=True, slots=True)
+class AppSettings:
+    # Parámetros de config.app que se leen en caliente durante el ciclo.
+    debug: bool
+    save_frames: bool
+    frames_per_cycle: int
+    capture_interval_seconds: float
+    max_history_messages: int
+    history_enabled: bool
+    history_persist_file: bool
+    history_fsync: str
+    history_fsync_interval_seconds: float
+    history_compact_lines: int
+    llm_log_max_mb: float
+    llm_log_rotate_hours: float
+    llm_log_compress: bool
+    llm_log_backups: int
+    min_speak_cycles: int
+    max_speak_cycles: int
+    scene_gate_enabled: bool
+    scene_change_threshold: int
+    scene_gate_max_skips: int
+    scene_gate_defer_cycles: int
+    config_reload_seconds: float
+    background_capture: bool
+    background_capture_fps: float
+    frame_buffer_seconds: float
+    keyframe_selection: bool
+    keyframe_candidates: int
+    keyframe_motion_weight: float
+    keyframe_histogram_weight: float
+    keyframe_novelty_weight: float
+
+
+@dataclass(frozen=True, slots=True)
+class CaptureSourceSettings:
+    # Una fuente de OBS del modo multi_source, con su propia resolución.
+    name: str
+    label: str
+    width: int
+    height: int
+
+
+@dataclass(frozen=True, slots=True)
+class ObsSettings:
+    # Parámetros de captura y codificación de config.obs.
+    capture_source_mode: str
+    capture_source_name: str
+    capture_width: int
+    capture_height: int
+    capture_sources: tuple[CaptureSourceSettings, ...]
+    image_format: str
+    image_quality: int
+    max_long_edge: int
+    grayscale: bool
+    adaptive_resolution: bool
+    adaptive_target_prompt_eval_ms: float
+    adaptive_min_long_edge: int
+    adaptive_max_long_edge: int
+    dedupe_frames: bool
+    dedupe_hamming_threshold: int
+    react_on_scene_change: bool
+    scene_change_min_interval_seconds: float
+    preprocess_workers: int
+    preprocess_slot_mb: float
+    request_timeout_seconds: float
+    health_check_seconds: float
+    reconnect_initial_seconds: float
+    reconnect_max_seconds: float
+
+
+@dataclass(frozen=True, slots=True)
+class LlmSettings:
+    # Parámetros del modelo y del muestreo de config.llm.
+    model_name: str
+    prompt_base: str
+    temperature: float
+    top_p: float
+    stream: bool
+    stream_min_sentence_chars: int
+    keep_alive: str | int
+    warmup_on_start: bool
+    warmup_during_cooldown: bool
+    connect_timeout_seconds: float
+    read_timeout_seconds: float
+    max_retries: int
+    retry_backoff_seconds: float
+    reaction_deadline_seconds: float
+    deadline_policy: str
+    cancel_superseded: bool
+    short_prompt_timeout_seconds: float
+    short_prompt_max_tokens: int
+    repetition_check: bool
+    repetition_threshold: float
+    repetition_history: int
+    repetition_policy: str
+    repetition_max_regenerations: int
+    repetition_temperature_boost: float
+
+
+@dataclass(frozen=True, slots=True)
+class TtsSettings:
+    # Parámetros de voz y caché de config.tts.
+    voice_id: str
+    format: str
+    save_audio: bool
+    cache_enabled: bool
+    cache_max_mb: float
+    cache_max_age_hours: float
+    filler_phrases: tuple[str, ...]
+    delivery: str
+    http_queue_size: int
+    http_wait_seconds: float
+    spool_max_files: int
+    spool_max_mb: float
+
+
+@dataclass(frozen=True, slots=True)
+class InferenceSettings:
+    # Reparto de Ollama entre streams de config.inference (cada perfil puede tener su propia cuota).
+    max_concurrent: int
+    weight: float
+    max_wait_seconds: float
+    max_calls_per_minute: int
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    # Vista inmutable y validada de config.yaml; se reemplaza entera al recargar.
+    app: AppSettings
+    obs: ObsSettings
+    llm: LlmSettings
+    tts: TtsSettings
+    inference: InferenceSettings
+    raw: dict
+    version: int
+    loaded_at: float
+    streams: dict = field(default_factory=dict)  # nombre -> ConfigSnapshot del perfil (modo multi-stream)
+
+
+def requireMapping(config_data: dict, section_name: str) -> dict:
+    # Devuelve la sección como mapa o lanza error si falta o no es un mapa.
+    if section_name not in config_data:
+        raise KeyError(f"config.yaml no contiene la sección '{section_name}'")
+
+    section = config_data[section_name]
+    if not isinstance(section, dict):
+        raise TypeError(f"config.{section_name} debe ser un objeto tipo mapa")
+
+    return section
+
+
+def buildAppSettings(app_config: dict) -> AppSettings:
+    settings = AppSettings(
+        debug=bool(app_config["debug"]),
+        save_frames=bool(app_config.get("save_frames", False)),
+        frames_per_cycle=int(app_config["frames_per_cycle"]),
+        capture_interval_seconds=float(app_config["capture_interval_seconds"]),
+        max_history_messages=int(app_config["max_history_messages"]),
+        history_enabled=bool(app_config["history_enabled"]),
+        history_persist_file=bool(app_config["history_persist_file"]),
+        history_fsync=str(app_config.get("history_fsync", "interval")),
+        history_fsync_interval_seconds=float(app_config.get("history_fsync_interval_seconds", 5)),
+        history_compact_lines=int(app_config.get("history_compact_lines", 500)),
+        llm_log_max_mb=float(app_config.get("llm_log_max_mb", 20)),
+        llm_log_rotate_hours=float(app_config.get("llm_log_rotate_hours", 24)),
+        llm_log_compress=bool(app_config.get("llm_log_compress", True)),
+        llm_log_backups=int(app_config.get("llm_log_backups", 10)),
+        min_speak_cycles=int(app_config["min_speak_cycles"]),
+        max_speak_cycles=int(app_config["max_speak_cycles"]),
+        scene_gate_enabled=bool(app_config.get("scene_gate_enabled", False)),
+        scene_change_threshold=int(app_config.get("scene_change_threshold", 10)),
+        scene_gate_max_skips=int(app_config.get("scene_gate_max_skips", 3)),
+        scene_gate_defer_cycles=int(app_config.get("scene_gate_defer_cycles", 2)),
+        config_reload_seconds=float(app_config.get("config_reload_seconds", 2)),
+        background_capture=bool(app_config.get("background_capture", False)),
+        background_capture_fps=float(app_config.get("background_capture_fps", 2)),
+        frame_buffer_seconds=float(app_config.get("frame_buffer_seconds", 10)),
+        keyframe_selection=bool(app_config.get("keyframe_selection", False)),
+        keyframe_candidates=int(app_config.get("keyframe_candidates", 6)),
+        keyframe_motion_weight=float(app_config.get("keyframe_motion_weight", 1.0)),
+        keyframe_histogram_weight=float(app_config.get("keyframe_histogram_weight", 1.0)),
+        keyframe_novelty_weight=float(app_config.get("keyframe_novelty_weight", 1.0)),
+    )
+
+    if settings.frames_per_cycle < 1:
+        raise ValueError("app.frames_per_cycle debe ser >= 1")
+    if settings.background_capture_fps <= 0 or settings.frame_buffer_seconds <= 0:
+        raise ValueError("app.background_capture_fps y app.frame_buffer_seconds deben ser > 0")
+    if settings.keyframe_selection and settings.keyframe_candidates < settings.frames_per_cycle:
+        raise ValueError("app.keyframe_candidates debe ser >= app.frames_per_cycle")
+    if min(settings.keyframe_motion_weight, settings.keyframe_histogram_weight, settings.keyframe_novelty_weight) < 0:
+        raise ValueError("los pesos app.keyframe_*_weight deben ser >= 0")
+    if settings.history_fsync not in HISTORY_FSYNC_POLICIES:
+        raise ValueError(f"app.history_fsync debe ser uno de {HISTORY_FSYNC_POLICIES}")
+    if settings.history_compact_lines < 1:
+        raise ValueError("app.history_compact_lines debe ser >= 1")
+    if min(settings.llm_log_max_mb, settings.llm_log_rotate_hours, settings.llm_log_backups) < 0:
+        raise ValueError("app.llm_log_max_mb, app.llm_log_rotate_hours y app.llm_log_backups deben ser >= 0")
+    if settings.min_speak_cycles < 0 or settings.min_speak_cycles > settings.max_speak_cycles:
+        raise ValueError("app.min_speak_cycles debe ser >= 0 y <= app.max_speak_cycles")
+
+    return settings
+
+
+def buildCaptureSources(sources: list, default_width: int, default_height: int) -> tuple[CaptureSourceSettings, ...]:
+    # Valida la lista obs.capture_sources; ancho y alto por defecto son los de capture_width/height.
+    if not isinstance(sources, list):
+        raise TypeError("obs.capture_sources debe ser una lista")
+
+    result: list[CaptureSourceSettings] = []
+    for position, source in enumerate(sources):
+        if isinstance(source, str):
+            source = {"name": source}
+        if not isinstance(source, dict) or not source.get("name"):
+            raise ValueError(f"obs.capture_sources[{position}] debe tener 'name'")
+        try:
+            width = int(source.get("width", default_width))
+            height = int(source.get("height", default_height))
+        except ValueError:
+            raise ValueError(f"obs.capture_sources[{position}]: width y height deben ser enteros")
+        result.append(CaptureSourceSettings(
+            name=str(source["name"]),
+            label=str(source.get("label") or source["name"]),
+            width=width,
+            height=height,
+        ))
+    return tuple(result)
+
+
+def buildObsSettings(obs_config: dict) -> ObsSettings:
+    capture_source_mode = obs_config["capture_source_mode"]
+    capture_source_name = obs_config["capture_source_name"] or ""
+
+    if capture_source_mode not in ("program_scene", "source", "multi_source"):
+        raise ValueError("obs.capture_source_mode debe ser 'program_scene', 'source' o 'multi_source'")
+
+    if capture_source_mode == "source" and not capture_source_name:
+        raise ValueError("obs.capture_source_name debe definirse cuando capture_source_mode es 'source'")
+
+    try:
+        capture_width = int(obs_config["capture_width"])
+        capture_height = int(obs_config["capture_height"])
+    except ValueError:
+        raise ValueError("obs.capture_width y obs.capture_height deben ser enteros")
+
+    capture_sources = buildCaptureSources(obs_config.get("capture_sources") or [], capture_width, capture_height)
+    if capture_source_mode == "multi_source" and not capture_sources:
+        raise ValueError("obs.capture_sources debe tener al menos una fuente cuando capture_source_mode es 'multi_source'")
+
+    image_format = str(obs_config.get("image_format", "png")).lower()
+    if image_format == "jpeg":
+        image_format = "jpg"
+    if image_format not in SUPPORTED_IMAGE_FORMATS:
+        raise ValueError(f"obs.image_format debe ser uno de {SUPPORTED_IMAGE_FORMATS}")
+
+    image_quality = int(obs_config.get("image_quality", -1))
+    if image_quality != -1 and not 0 <= image_quality <= 100:
+        raise ValueError("obs.image_quality debe estar entre 0 y 100 (o -1 para el valor por defecto de OBS)")
+
+    preprocess_workers = int(obs_config.get("preprocess_workers", 0))
+    preprocess_slot_mb = float(obs_config.get("preprocess_slot_mb", 16))
+    if preprocess_workers < 0:
+        raise ValueError("obs.preprocess_workers debe ser >= 0 (0 = preprocesar en el hilo de captura)")
+    if preprocess_slot_mb <= 0:
+        raise ValueError("obs.preprocess_slot_mb debe ser > 0")
+
+    request_timeout_seconds = float(obs_config.get("request_timeout_seconds", 10))
+    health_check_seconds = float(obs_config.get("health_check_seconds", 5))
+    reconnect_initial_seconds = float(obs_config.get("reconnect_initial_seconds", 1))
+    reconnect_max_seconds = float(obs_config.get("reconnect_max_seconds", 30))
+    if request_timeout_seconds <= 0:
+        raise ValueError("obs.request_timeout_seconds debe ser > 0")
+    if health_check_seconds < 0:
+        raise ValueError("obs.health_check_seconds debe ser >= 0 (0 = sin comprobación periódica)")
+    if reconnect_initial_seconds <= 0:
+        raise ValueError("obs.reconnect_initial_seconds debe ser > 0")
+    if reconnect_max_seconds < reconnect_initial_seconds:
+        raise ValueError("obs.reconnect_max_seconds debe ser >= reconnect_initial_seconds")
+
+    return ObsSettings(
+        capture_source_mode=capture_source_mode,
+        capture_source_name=capture_source_name,
+        capture_width=capture_width,
+        capture_height=capture_height,
+        capture_sources=capture_sources,
+        image_format=image_format,
+        image_quality=image_quality,
+        max_long_edge=int(obs_config.get("max_long_edge", 0)),
+        grayscale=bool(obs_config.get("grayscale", False)),
+        adaptive_resolution=bool(obs_config.get("adaptive_resolution", False)),
+        adaptive_target_prompt_eval_ms=float(obs_config.get("adaptive_target_prompt_eval_ms", 1500)),
+        adaptive_min_long_edge=int(obs_config.get("adaptive_min_long_edge", 448)),
+        adaptive_max_long_edge=int(obs_config.get("adaptive_max_long_edge", 1280)),
+        dedupe_frames=bool(obs_config.get("dedupe_frames", True)),
+        dedupe_hamming_threshold=int(obs_config.get("dedupe_hamming_threshold", 4)),
+        react_on_scene_change=bool(obs_config.get("react_on_scene_change", True)),
+        scene_change_min_interval_seconds=float(obs_config.get("scene_change_min_interval_seconds", 15)),
+        preprocess_workers=preprocess_workers,
+        preprocess_slot_mb=preprocess_slot_mb,
+        request_timeout_seconds=request_timeout_seconds,
+        health_check_seconds=health_check_seconds,
+        reconnect_initial_seconds=reconnect_initial_seconds,
+        reconnect_max_seconds=reconnect_max_seconds,
+    )
+
+
+def buildLlmSettings(llm_config: dict) -> LlmSettings:
+    settings = LlmSettings(
+        model_name=llm_config["model_name"],
+        prompt_base=str(llm_config["prompt_base"]),
+        temperature=float(llm_config["temperature"]),
+        top_p=float(llm_config["top_p"]),
+        stream=bool(llm_config.get("stream", False)),
+        stream_min_sentence_chars=int(llm_config.get("stream_min_sentence_chars", 12)),
+        keep_alive=llm_config.get("keep_alive", "30m"),
+        warmup_on_start=bool(llm_config.get("warmup_on_start", True)),
+        warmup_during_cooldown=bool(llm_config.get("warmup_during_cooldown", False)),
+        connect_timeout_seconds=float(llm_config.get("connect_timeout_seconds", 5)),
+        read_timeout_seconds=float(llm_config.get("read_timeout_seconds", 120)),
+        max_retries=int(llm_config.get("max_retries", 2)),
+        retry_backoff_seconds=float(llm_config.get("retry_backoff_seconds", 1.0)),
+        reaction_deadline_seconds=float(llm_config.get("reaction_deadline_seconds", 30)),
+        deadline_policy=str(llm_config.get("deadline_policy", "skip")),
+        cancel_superseded=bool(llm_config.get("cancel_superseded", True)),
+        short_prompt_timeout_seconds=float(llm_config.get("short_prompt_timeout_seconds", 10)),
+        short_prompt_max_tokens=int(llm_config.get("short_prompt_max_tokens", 60)),
+        repetition_check=bool(llm_config.get("repetition_check", False)),
+        repetition_threshold=float(llm_config.get("repetition_threshold", 0.6)),
+        repetition_history=int(llm_config.get("repetition_history", 20)),
+        repetition_policy=str(llm_config.get("repetition_policy", "regenerate")),
+        repetition_max_regenerations=int(llm_config.get("repetition_max_regenerations", 1)),
+        repetition_temperature_boost=float(llm_config.get("repetition_temperature_boost", 0.3)),
+    )
+
+    if not settings.model_name:
+        raise ValueError("config.llm.model_name no está definido")
+    if not 0.0 <= settings.temperature <= 2.0:
+        raise ValueError("llm.temperature debe estar entre 0.0 y 2.0")
+    if not 0.0 < settings.top_p <= 1.0:
+        raise ValueError("llm.top_p debe estar entre 0.0 y 1.0")
+    if settings.deadline_policy not in DEADLINE_POLICIES:
+        raise ValueError(f"llm.deadline_policy debe ser uno de {DEADLINE_POLICIES}")
+    if settings.short_prompt_timeout_seconds <= 0 or settings.short_prompt_max_tokens < 1:
+        raise ValueError("llm.short_prompt_timeout_seconds debe ser > 0 y llm.short_prompt_max_tokens >= 1")
+    if not 0.0 < settings.repetition_threshold <= 1.0:
+        raise ValueError("llm.repetition_threshold debe estar entre 0.0 y 1.0")
+    if settings.repetition_history < 1 or settings.repetition_max_regenerations < 0:
+        raise ValueError("llm.repetition_history debe ser >= 1 y llm.repetition_max_regenerations >= 0")
+    if settings.repetition_policy not in REPETITION_POLICIES:
+        raise ValueError(f"llm.repetition_policy debe ser uno de {REPETITION_POLICIES}")
+
+    return settings
+
+
+def buildTtsSettings(tts_config: dict) -> TtsSettings:
+    settings = TtsSettings(
+        voice_id=tts_config["voice_id"],
+        format=tts_config["format"],
+        save_audio=bool(tts_config["save_audio"]),
+        cache_enabled=bool(tts_config.get("cache_enabled", True)),
+        cache_max_mb=float(tts_config.get("cache_max_mb", 200)),
+        cache_max_age_hours=float(tts_config.get("cache_max_age_hours", 168)),
+        filler_phrases=tuple(
+            phrase for phrase in (tts_config.get("filler_phrases") or []) if phrase and str(phrase).strip()
+        ),
+        delivery=str(tts_config.get("delivery", "http")),
+        http_queue_size=int(tts_config.get("http_queue_size", 8)),
+        http_wait_seconds=float(tts_config.get("http_wait_seconds", 25)),
+        spool_max_files=int(tts_config.get("spool_max_files", 200)),
+        spool_max_mb=float(tts_config.get("spool_max_mb", 500)),
+    )
+
+    if settings.delivery not in AUDIO_DELIVERY_MODES:
+        raise ValueError(f"tts.delivery debe ser uno de {AUDIO_DELIVERY_MODES}")
+    if settings.http_queue_size < 1 or settings.http_wait_seconds <= 0:
+        raise ValueError("tts.http_queue_size debe ser >= 1 y tts.http_wait_seconds > 0")
+    if settings.spool_max_files < 1 or settings.spool_max_mb < 0:
+        raise ValueError("tts.spool_max_files debe ser >= 1 y tts.spool_max_mb >= 0")
+
+    return settings
+
+
+def buildInferenceSettings(inference_config: dict) -> InferenceSettings:
+    if not isinstance(inference_config, dict):
+        raise TypeError("config.inference debe ser un objeto tipo mapa")
+
+    settings = InferenceSettings(
+        max_concurrent=int(inference_config.get("max_concurrent", 1)),
+        weight=float(inference_config.get("weight", 1.0)),
+        max_wait_seconds=float(inference_config.get("max_wait_seconds", 0)),
+        max_calls_per_minute=int(inference_config.get("max_calls_per_minute", 0)),
+    )
+
+    if settings.max_concurrent < 1:
+        raise ValueError("inference.max_concurrent debe ser >= 1")
+    if settings.weight <= 0:
+        raise ValueError("inference.weight debe ser > 0")
+    if settings.max_wait_seconds < 0 or settings.max_calls_per_minute < 0:
+        raise ValueError("inference.max_wait_seconds e inference.max_calls_per_minute deben ser >= 0")
+
+    return settings
+
+
+def mergeConfig(base: dict, override: dict) -> dict:
+    # Combina recursivamente override sobre una copia de base (los mapas se mezclan, el resto se reemplaza).
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = mergeConfig(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def buildStreamProfiles(config_data: dict) -> dict[str, dict]:
+    # Arma el YAML completo de cada perfil de streams: la configuración base con las claves del perfil encima.
+    profiles = config_data.get("streams") or []
+    if not isinstance(profiles, list):
+        raise TypeError("config.streams debe ser una lista de perfiles")
+
+    base = {key: value for key, value in config_data.items() if key != "streams"}
+    base_data_dir = requireMapping(base, "app").get("data_dir", "data")
+
+    result: dict[str, dict] = {}
+    for position, profile in enumerate(profiles):
+        if not isinstance(profile, dict) or not profile.get("name"):
+            raise ValueError(f"streams[{position}] debe ser un mapa con 'name'")
+
+        name = str(profile["name"])
+        if not STREAM_NAME_PATTERN.match(name):
+            raise ValueError(f"streams[{position}].name solo admite letras, números, '-' y '_': {name}")
+        if name in result:
+            raise ValueError(f"streams[{position}].name repetido: {name}")
+
+        overrides = {key: value for key, value in profile.items() if key != "name"}
+        merged = mergeConfig(base, overrides)
+
+        # cada stream escribe frames, audio, historial y logs en su propio directorio salvo que se indique otro
+        if "data_dir" not in (overrides.get("app") or {}):
+            merged["app"]["data_dir"] = os.path.join(base_data_dir, "streams", name)
+
+        result[name] = merged
+    return result
+
+
+def buildSnapshot(config_data: dict, version: int) -> ConfigSnapshot:
+    # Valida el YAML completo y arma el snapshot tipado; lanza error si algo no es válido.
+    if not isinstance(config_data, dict):
+        raise ValueError("El archivo de configuración YAML debe tener un mapa como raíz")
+
+    streams: dict[str, ConfigSnapshot] = {}
+    for name, profile_data in buildStreamProfiles(config_data).items():
+        try:
+            streams[name] = buildSnapshot(profile_data, version)
+        except Exception as error:
+            raise ValueError(f"perfil de stream '{name}': {error}") from error
+
+    return ConfigSnapshot(
+        app=buildAppSettings(requireMapping(config_data, "app")),
+        obs=buildObsSettings(requireMapping(config_data, "obs")),
+        llm=buildLlmSettings(requireMapping(config_data, "llm")),
+        tts=buildTtsSettings(requireMapping(config_data, "tts")),
+        inference=buildInferenceSettings(config_data.get("inference") or {}),
+        raw=config_data,
+        version=version,
+        loaded_at=time.time(),
+        streams=streams,
+    )
+
+
+def diffSnapshots(previous: ConfigSnapshot, current: ConfigSnapshot) -> list[str]:
+    # Lista las claves tipadas que cambiaron entre dos snapshots (ej. "llm.temperature").
+    changed: list[str] = []
+    for section_name in ("app", "obs", "llm", "tts", "inference"):
+        before = getattr(previous, section_name)
+        after = getattr(current, section_name)
+        for item in fields(before):
+            if getattr(before, item.name) != getattr(after, item.name):
+                changed.append(f"{section_name}.{item.name}")
+
+    for name, stream_snapshot in current.streams.items():
+        changed.extend(f"{name}:{key}" for key in diffSnapshots(previous.streams[name], stream_snapshot))
+    return changed
+
+
+def getCurrentStream() -> str | None:
+    # Nombre del stream que atiende el hilo actual (None en modo de un solo stream o fuera de un stream).
+    return getattr(_stream_context, "name", None)
+
+
+def setCurrentStream(name: str | None):
+    # Marca el hilo actual como parte de un stream: desde aquí getConfig() devuelve la configuración de su perfil.
+    _stream_context.name = name
+
+
+def bindCurrentStream(target):
+    # Envuelve target para que, al correr en otro hilo, vea el mismo stream que el hilo que lo creó.
+    name = getCurrentStream()
+
+    def runInStream(*args, **kwargs):
+        setCurrentStream(name)
+        return target(*args, **kwargs)
+
+    return runInStream
 
 
 class ConfigManager:
@@ -15,28 +538,73 @@ class ConfigManager:
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"No se encontró el archivo de configuración: {config_path}")
 
-        with open(config_path, "r", encoding="utf-8") as file:
-            config_data = yaml.safe_load(file)
+        self.config_path = config_path
+        self._signature = self._fileSignature()
+        # el snapshot es la única referencia al estado: se reemplaza de una vez al recargar
+        self._snapshot = buildSnapshot(self._readFile(), version=1)
 
-        if not isinstance(config_data, dict):
-            raise ValueError("El archivo de configuración YAML debe tener un mapa como raíz")
+    def _fileSignature(self):
+        # (mtime, tamaño): el tamaño detecta la escritura final aunque coincida el mtime de una escritura a medias.
+        stat = os.stat(self.config_path)
+        return stat.st_mtime_ns, stat.st_size
 
-        self._config_data = config_data
+    def _readFile(self):
+        with open(self.config_path, "r", encoding="utf-8") as file:
+            return yaml.safe_load(file)
+
+    def getSnapshot(self) -> ConfigSnapshot:
+        # Devuelve el snapshot tipado vigente (el del perfil si el hilo pertenece a un stream).
+        snapshot = self._snapshot
+        name = getCurrentStream()
+        if name is None:
+            return snapshot
+        return snapshot.streams[name]
+
+    def getBaseSnapshot(self) -> ConfigSnapshot:
+        # Snapshot de la configuración base, sin aplicar el perfil del stream del hilo actual.
+        return self._snapshot
+
+    def getStreamNames(self) -> list[str]:
+        # Perfiles definidos en config.streams (lista vacía = modo de un solo stream).
+        return list(self._snapshot.streams)
 
     def getYaml(self):
-        # Devuelve el diccionario completo cargado desde config.yaml.
-        return self._config_data
+        # Devuelve el diccionario completo cargado desde config.yaml (con el perfil del stream aplicado).
+        return self.getSnapshot().raw
 
     def getSection(self, section_name):
         # Devuelve una sección específica del YAML (por ejemplo 'app', 'obs', 'llm').
-        if section_name not in self._config_data:
-            raise KeyError(f"config.yaml no contiene la sección '{section_name}'")
+        return requireMapping(self.getSnapshot().raw, section_name)
+
+    def reloadIfChanged(self) -> bool:
+        # Recarga config.yaml si cambió en disco; si el nuevo archivo no es válido se mantiene el anterior.
+        try:
+            signature = self._fileSignature()
+        except OSError:
+            return False
+
+        if signature == self._signature:
+            return False
+        self._signature = signature
+
+        previous = self._snapshot
+        try:
+            current = buildSnapshot(self._readFile(), version=previous.version + 1)
+        except Exception as error:
+            print(f"[!] config.yaml modificado pero no es válido, se mantiene la configuración anterior: {error}")
+            return False
 
-        section = self._config_data[section_name]
-        if not isinstance(section, dict):
-            raise TypeError(f"config.{section_name} debe ser un objeto tipo mapa")
+        if set(current.streams) != set(previous.streams):
+            # cada stream tiene su conexión y sus hilos: agregar o quitar perfiles requiere reiniciar
+            print("[!] config.yaml modificado con otros perfiles en 'streams'; se mantiene la configuración anterior "
+                  "(reinicia el servicio para agregar o quitar streams)")
+            return False
 
-        return section
+        self._snapshot = current
+        changed = diffSnapshots(previous, current)
+        print(f"[i] config.yaml recargado (versión {current.version}): "
+              f"{', '.join(changed) if changed else 'sin cambios en claves en caliente'}")
+        return True
 
     def requireEnv(self, name, allow_empty=False):
         # Obtiene una variable de entorno obligatoria o lanza error si falta.
@@ -54,6 +622,23 @@ class ConfigManager:
         return os.getenv(name)
 
 
+class ConfigWatcher(threading.Thread):
+    # Revisa periódicamente el mtime de config.yaml y recarga el snapshot cuando cambia.
+
+    def __init__(self, config_manager: ConfigManager, interval_seconds: float):
+        super().__init__(name="config-watcher", daemon=True)
+        self.config_manager = config_manager
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            self.config_manager.reloadIfChanged()
+
+    def stop(self):
+        self._stop_event.set()
+
+
 def getConfigManager():
     # Devuelve la instancia singleton de ConfigManager.
     global _config_manager
@@ -62,6 +647,28 @@ def getConfigManager():
     return _config_manager
 
 
+def getConfig() -> ConfigSnapshot:
+    # Atajo al snapshot tipado vigente.
+    return getConfigManager().getSnapshot()
+
+
+def startConfigWatcher():
+    # Arranca (una sola vez) la recarga en caliente según config.app.config_reload_seconds (0 = desactivada).
+    global _config_watcher
+    if _config_watcher is not None:
+        return _config_watcher
+
+    config_manager = getConfigManager()
+    interval = config_manager.getSnapshot().app.config_reload_seconds
+    if interval <= 0:
+        return None
+
+    _config_watcher = ConfigWatcher(config_manager, interval)
+    _config_watcher.start()
+    print(f"[i] Recarga en caliente de {config_manager.config_path} cada {interval:g} s")
+    return _config_watcher
+
+
 def loadConfig():
     # Devuelve el diccionario YAML completo (compatibilidad con código existente).
     return getConfigManager().getYaml()
@@ -1,7 +1,25 @@
+import json
 import os
+import random
 import re
-from obswebsocket import obsws, requests
-from config_loader import getConfigManager
+import threading
+import time
+
+import websocket
+from obswebsocket import events, exceptions, obsws, requests
+from obswebsocket.core import EventManager
+from config_loader import bindCurrentStream, getConfigManager, getCurrentStream
+from metrics import OBS_CONNECTED, OBS_OUTAGE_SECONDS, OBS_SCENE_CHANGES_TOTAL
+
+_scene_trackers = {}  # seguidor de escena de la conexión activa de cada stream (None = modo de un solo stream)
+
+# errores que indican que el socket con OBS murió (OBS cerrado, host con otra IP, red caída) y no una petición inválida
+RECONNECT_ERRORS = (websocket.WebSocketException, OSError, exceptions.ConnectionFailure, exceptions.MessageTimeout)
+
+
+class ObsUnavailable(RuntimeError):
+    # OBS no responde: la conexión se está recuperando en segundo plano y la petición no se hizo.
+    pass
 
 
 def isRunningInDocker():
@@ -32,9 +50,12 @@ def assertRunningInDocker():
         raise RuntimeError(hint)
 
 
-def getIpFromLog(log_path):
+def getIpFromLog(log_path, verbose: bool = True):
     # Lee el archivo de log de red de Windows y devuelve una dirección IPv4 detectada.
-    print(f"Leyendo archivo de red: {log_path}")
+    # Con verbose=False no imprime nada (se vuelve a leer en cada reintento de reconexión).
+    log = print if verbose else lambda message: None
+
+    log(f"Leyendo archivo de red: {log_path}")
 
     if not os.path.exists(log_path):
         raise FileNotFoundError(f"No se encontró el archivo de IP: {log_path}")
@@ -49,62 +70,64 @@ def getIpFromLog(log_path):
     else:
         encoding = "utf-8"
 
-    print(f"\n\t- Encoding detectado: {encoding}")
+    log(f"\n\t- Encoding detectado: {encoding}")
 
     with open(log_path, "r", encoding=encoding, errors="ignore") as file:
         content = file.read()
 
     lines = content.splitlines()
 
-    print("\t- Buscando líneas que contengan IPv4:")
+    log("\t- Buscando líneas que contengan IPv4:")
     matches = [line for line in lines if "IPv4" in line]
     if matches:
         for line in matches:
-            print("\t\t->" + line)
+            log("\t\t->" + line)
     else:
-        print("\t\t(Sin coincidencias)")
+        log("\t\t(Sin coincidencias)")
 
     regex = r"(Dirección\s+IPv4|IPv4 Address).*?((\d{1,3}\.){3}\d{1,3})"
     match_line = re.search(regex, content)
 
     if match_line:
         ip = match_line.group(2)
-        print(f"\t- IP detectada correctamente: {ip}")
+        log(f"\t- IP detectada correctamente: {ip}")
         return ip
 
     all_ips = re.findall(r"(\d{1,3}(?:\.\d{1,3}){3})", content)
     if all_ips:
-        print("\t- IPs encontradas en fallback:")
+        log("\t- IPs encontradas en fallback:")
         for ip in all_ips:
-            print("\t → " + ip)
+            log("\t → " + ip)
 
         selected = all_ips[0]
-        print(f"\t- Usando la primera IP encontrada: {selected}")
+        log(f"\t- Usando la primera IP encontrada: {selected}")
         return selected
 
     raise RuntimeError("No se encontró ninguna dirección IPv4 válida en el archivo de IP")
 
 
-def getConfig():
+def getConfig(verbose: bool = True):
     # Construye la configuración necesaria para conectar con OBS usando YAML y entorno.
     assertRunningInDocker()
 
     config_manager = getConfigManager()
     app_config = config_manager.getSection("app")
+    obs_config = config_manager.getSection("obs")
 
     path_ip_file = app_config["path_ip_file"]
 
-    obs_port_value = config_manager.requireEnv("OBS_PORT")
+    # un perfil de streams puede fijar host, puerto y la variable con la contraseña de su OBS
+    obs_port_value = obs_config.get("port") or config_manager.requireEnv("OBS_PORT")
     try:
         obs_port = int(obs_port_value)
     except ValueError:
-        raise ValueError(f"OBS_PORT debe ser entero, recibido: {obs_port_value}")
+        raise ValueError(f"El puerto de OBS debe ser entero, recibido: {obs_port_value}")
 
-    obs_password = config_manager.requireEnv("OBS_PASSWORD", allow_empty=True)
+    obs_password = config_manager.requireEnv(obs_config.get("password_env") or "OBS_PASSWORD", allow_empty=True)
 
     app_port = config_manager.getEnv("APP_PORT")
 
-    obs_host = getIpFromLog(path_ip_file)
+    obs_host = obs_config.get("host") or getIpFromLog(path_ip_file, verbose)
 
     return {
         "obs_host": obs_host,
@@ -126,23 +149,418 @@ def printObsVersion(version):
     print(f"\t\t- RPC versión: {version.getRpcVersion()}")
 
 
+class BatchResponseSocket:
+    # Envuelve el websocket de obsws para atender RequestBatchResponse (op 9), que obs-websocket-py ignora.
+    # El resto de mensajes pasa intacto al hilo receptor de la librería.
+
+    def __init__(self, socket, client):
+        self._socket = socket
+        self._client = client
+
+    def recv(self):
+        message = self._socket.recv()
+        # solo se parsea aquí si el op está en los extremos del mensaje (OBS serializa "op" al final);
+        # así los screenshots grandes no se decodifican dos veces
+        if message and '"op":9' in (message[:16] + message[-16:]).replace(" ", ""):
+            result = json.loads(message)
+            if result.get("op") == 9:
+                self._client.onBatchResponse(result["d"])
+                return ""  # RecvThread ignora los mensajes vacíos
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self._socket, name)
+
+
+class ObsClient(obsws):
+    # Cliente obs-websocket v5 con soporte de RequestBatch: varias peticiones en una sola ida y vuelta.
+
+    def _auth(self):
+        super()._auth()
+        # se envuelve el socket antes de que connect() arranque el hilo receptor
+        self.ws = BatchResponseSocket(self.ws, self)
+
+    def onBatchResponse(self, data: dict):
+        request_id = data.get("requestId")
+        if request_id in self.events:
+            self.answers[request_id] = data
+            self.events[request_id].set()
+
+    def callBatch(self, request_list: list, halt_on_failure: bool = False) -> list:
+        # Envía las peticiones como un RequestBatch (ejecución en serie) y rellena cada objeto con su respuesta.
+        message_id = str(self.id)
+        self.id += 1
+        event = threading.Event()
+        self.events[message_id] = event
+
+        payload = {
+            "op": 8,
+            "d": {
+                "requestId": message_id,
+                "haltOnFailure": halt_on_failure,
+                "executionType": 0,  # SerialRealtime
+                "requests": [
+                    {"requestType": request.name, "requestId": str(index), "requestData": request.data()}
+                    for index, request in enumerate(request_list)
+                ],
+            },
+        }
+        self.ws.send(json.dumps(payload))
+
+        event.wait(self.timeout)
+        self.events.pop(message_id)
+
+        if message_id not in self.answers:
+            raise exceptions.MessageTimeout(f"Sin respuesta para el lote {message_id}")
+
+        results = {result.get("requestId"): result for result in self.answers.pop(message_id).get("results", [])}
+        for index, request in enumerate(request_list):
+            result = results.get(str(index))
+            if result is None:
+                # con haltOnFailure OBS no devuelve las peticiones posteriores al fallo
+                request.input({}, False)
+            else:
+                request.input(result.get("responseData") or {}, result["requestStatus"]["result"])
+        return request_list
+
+
+def isClientAlive(client: ObsClient | None) -> bool:
+    # El hilo receptor de obswebsocket termina (sin avisar) cuando OBS cierra el socket o falla la red.
+    if client is None or client.ws is None:
+        return False
+    thread = client.thread_recv
+    return thread is not None and thread.running and thread.is_alive() and bool(client.ws.connected)
+
+
+def closeClientQuietly(client: ObsClient | None):
+    if client is None:
+        return
+    try:
+        client.disconnect()
+    except Exception:
+        pass
+
+
+class ObsConnectionManager:
+    # Conexión con OBS que se recupera sola: se usa igual que el cliente (call, callBatch, register), detecta
+    # el socket muerto (hilo receptor detenido, errores de red, peticiones sin respuesta o un GetVersion
+    # periódico sin respuesta) y reconecta en segundo plano con backoff exponencial con jitter, volviendo a
+    # resolver la IP del host en cada intento. Mientras está caída, las peticiones fallan al instante con
+    # ObsUnavailable en vez de esperar el timeout.
+
+    def __init__(self, config: dict, stream_label: str = "default"):
+        self.config = config
+        self.stream_label = stream_label
+        self.client: ObsClient | None = None
+        self.outages = 0
+        self.down_since: float | None = None
+
+        # las suscripciones a eventos viven aquí y no en cada cliente: sobreviven a las reconexiones
+        self._event_manager = EventManager()
+        self._reconnect_callbacks = []
+        self._connected = threading.Event()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._last_ok_at = time.monotonic()
+        self._supervisor: threading.Thread | None = None
+
+    def connect(self):
+        # Primera conexión: si falla el error se propaga (createObsConnection explica las causas posibles).
+        self.client = self._openClient(self.config)
+        self._last_ok_at = time.monotonic()
+        self._connected.set()
+        OBS_CONNECTED.set(1, stream=self.stream_label)
+
+        self._supervisor = threading.Thread(
+            target=bindCurrentStream(self._supervise), name=f"obs-supervisor-{self.stream_label}", daemon=True
+        )
+        self._supervisor.start()
+
+    def _openClient(self, config: dict) -> ObsClient:
+        obs_settings = getConfigManager().getSnapshot().obs
+        client = ObsClient(config["obs_host"], config["obs_port"], config["obs_password"],
+                           timeout=obs_settings.request_timeout_seconds)
+        client.eventmanager = self._event_manager
+        try:
+            client.connect()
+        except Exception:
+            # un handshake a medias deja el socket abierto
+            if client.ws is not None:
+                try:
+                    client.ws.close()
+                except Exception:
+                    pass
+            raise
+        return client
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def waitConnected(self, timeout: float | None = None) -> bool:
+        # Espera a que la conexión esté activa; devuelve False si no se recuperó en timeout segundos.
+        return self._connected.wait(timeout)
+
+    def onReconnect(self, callback):
+        # callback() se llama después de cada reconexión (por ejemplo, para volver a consultar la escena).
+        self._reconnect_callbacks.append(callback)
+
+    def removeReconnectCallback(self, callback):
+        if callback in self._reconnect_callbacks:
+            self._reconnect_callbacks.remove(callback)
+
+    def register(self, func, event=None):
+        self._event_manager.register(func, event)
+
+    def unregister(self, func, event=None):
+        self._event_manager.unregister(func, event)
+
+    def call(self, request):
+        return self._run(lambda client: client.call(request))
+
+    def callBatch(self, request_list: list, halt_on_failure: bool = False) -> list:
+        return self._run(lambda client: client.callBatch(request_list, halt_on_failure))
+
+    def _run(self, operation):
+        client = self.client
+        if not self._connected.is_set():
+            down_seconds = time.monotonic() - self.down_since if self.down_since is not None else 0.0
+            raise ObsUnavailable(f"OBS sin conexión desde hace {down_seconds:.0f} s")
+        if not isClientAlive(client):
+            self.markDown(client, "el socket se cerró")
+            raise ObsUnavailable("se perdió la conexión con OBS")
+
+        try:
+            result = operation(client)
+        except RECONNECT_ERRORS as error:
+            self.markDown(client, f"{type(error).__name__}: {error}")
+            raise ObsUnavailable(f"se perdió la conexión con OBS: {error}") from error
+        self._last_ok_at = time.monotonic()
+        return result
+
+    def markDown(self, client: ObsClient | None, reason: str):
+        # Marca la conexión como caída (una sola vez por corte) y despierta al supervisor para reconectar.
+        with self._lock:
+            if client is not self.client or not self._connected.is_set():
+                return
+            self._connected.clear()
+            self.down_since = time.monotonic()
+            self.outages += 1
+        OBS_CONNECTED.set(0, stream=self.stream_label)
+        print(f"[!] Se perdió la conexión con OBS ({reason}); reintentando en segundo plano...")
+        self._wake.set()
+
+    def _supervise(self):
+        while not self._stop_event.is_set():
+            if self._connected.is_set():
+                self._wake.wait(1.0)
+                self._wake.clear()
+                if not self._stop_event.is_set():
+                    self._checkHealth()
+            else:
+                self._reconnect()
+
+    def _checkHealth(self):
+        # Sin peticiones recientes (cooldown largo) el socket puede haber muerto sin que nadie lo note:
+        # un GetVersion cada obs.health_check_seconds lo detecta antes del próximo ciclo que habla.
+        client = self.client
+        if not isClientAlive(client):
+            self.markDown(client, "el socket se cerró")
+            return
+        interval = getConfigManager().getSnapshot().obs.health_check_seconds
+        if interval > 0 and time.monotonic() - self._last_ok_at >= interval:
+            try:
+                self.call(requests.GetVersion())
+            except ObsUnavailable:
+                pass
+
+    def _reconnect(self):
+        closeClientQuietly(self.client)
+        attempt = 0
+        while not self._stop_event.is_set():
+            attempt += 1
+            obs_settings = getConfigManager().getSnapshot().obs
+            delay = min(obs_settings.reconnect_max_seconds,
+                        obs_settings.reconnect_initial_seconds * 2 ** min(attempt - 1, 16))
+            # jitter: varios streams contra el mismo OBS no reintentan todos a la vez
+            if self._stop_event.wait(random.uniform(delay / 2, delay)):
+                return
+
+            try:
+                # la IP del host de Windows puede haber cambiado: se vuelve a leer el archivo de ipconfig
+                config = getConfig(verbose=False)
+            except Exception as error:
+                print(f"[!] No se pudo volver a resolver el host de OBS ({error}); se usa {self.config['obs_host']}")
+                config = self.config
+
+            try:
+                client = self._openClient(config)
+            except Exception as error:
+                if getConfigManager().getSnapshot().app.debug:
+                    print(f"\t- Intento {attempt} de reconexión con OBS en {config['obs_host']}:{config['obs_port']} "
+                          f"falló: {error}")
+                continue
+
+            with self._lock:
+                self.client = client
+                self.config = config
+                self._last_ok_at = time.monotonic()
+                outage_seconds = time.monotonic() - self.down_since
+                self._connected.set()
+            OBS_CONNECTED.set(1, stream=self.stream_label)
+            OBS_OUTAGE_SECONDS.observe(outage_seconds, stream=self.stream_label)
+            print(f"[i] Reconectado a OBS en {config['obs_host']}:{config['obs_port']} tras {outage_seconds:.1f} s "
+                  f"({attempt} intentos)")
+
+            for callback in list(self._reconnect_callbacks):
+                try:
+                    callback()
+                except Exception as error:
+                    print(f"[!] Error al restaurar el estado tras reconectar con OBS: {error}")
+            return
+
+    def disconnect(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._supervisor is not None and self._supervisor is not threading.current_thread():
+            self._supervisor.join(5.0)
+        self._connected.clear()
+        closeClientQuietly(self.client)
+        OBS_CONNECTED.set(0, stream=self.stream_label)
+
+
+class ObsSceneTracker:
+    # Mantiene en caché la escena de programa actual a partir de los eventos de OBS (sin consultar por frame).
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.current_scene: str | None = None
+        self.changes = 0
+        self.last_change_at: float | None = None
+        self._pending_change = False
+        self._last_consumed_at = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Se suscribe a los eventos de escena y obtiene la escena inicial con una sola petición.
+        self.ws.register(self.onProgramSceneChanged, events.CurrentProgramSceneChanged)
+        self.ws.register(self.onSceneNameChanged, events.SceneNameChanged)
+        if isinstance(self.ws, ObsConnectionManager):
+            self.ws.onReconnect(self.onReconnected)
+        self.refresh()
+        return self
+
+    def stop(self):
+        self.ws.unregister(self.onProgramSceneChanged, events.CurrentProgramSceneChanged)
+        self.ws.unregister(self.onSceneNameChanged, events.SceneNameChanged)
+        if isinstance(self.ws, ObsConnectionManager):
+            self.ws.removeReconnectCallback(self.onReconnected)
+
+    def refresh(self) -> str:
+        # Consulta la escena actual a OBS (al arrancar o si la caché se perdió).
+        current = self.ws.call(requests.GetCurrentProgramScene())
+        scene_name = current.datain["currentProgramSceneName"]
+        with self._lock:
+            self.current_scene = scene_name
+        return scene_name
+
+    def onReconnected(self):
+        # Durante el corte no llegaron eventos: se consulta la escena y, si cambió, cuenta como un cambio más.
+        with self._lock:
+            previous = self.current_scene
+        scene_name = self.refresh()
+        if previous is not None and scene_name != previous:
+            with self._lock:
+                self.changes += 1
+                self.last_change_at = time.time()
+                self._pending_change = True
+            OBS_SCENE_CHANGES_TOTAL.inc()
+
+    def onProgramSceneChanged(self, event):
+        # Corre en el hilo receptor de obswebsocket: solo actualiza estado, nada bloqueante.
+        scene_name = event.datain.get("sceneName")
+        with self._lock:
+            if scene_name == self.current_scene:
+                return
+            self.current_scene = scene_name
+            self.changes += 1
+            self.last_change_at = time.time()
+            self._pending_change = True
+        OBS_SCENE_CHANGES_TOTAL.inc()
+
+        if getConfigManager().getSnapshot().app.debug:
+            print(f"\n[i] OBS cambió la escena de programa a: {scene_name}")
+
+    def onSceneNameChanged(self, event):
+        old_name = event.datain.get("oldSceneName")
+        with self._lock:
+            if old_name is not None and old_name == self.current_scene:
+                self.current_scene = event.datain.get("sceneName")
+
+    def getCurrentScene(self) -> str:
+        # Devuelve la escena en caché; solo consulta a OBS si todavía no se conoce.
+        with self._lock:
+            scene_name = self.current_scene
+        return scene_name if scene_name is not None else self.refresh()
+
+    def consumeSceneChange(self, min_interval_seconds: float = 0.0) -> str | None:
+        # Devuelve la nueva escena si hubo un cambio sin atender (y limpia la marca), o None.
+        # Los cambios que llegan antes de min_interval_seconds desde el último atendido se descartan.
+        with self._lock:
+            if not self._pending_change:
+                return None
+            self._pending_change = False
+            now = time.time()
+            if now - self._last_consumed_at < min_interval_seconds:
+                return None
+            self._last_consumed_at = now
+            return self.current_scene
+
+
+def startSceneTracker(ws) -> ObsSceneTracker:
+    # Crea el seguidor de escena para esta conexión y lo deja como el activo del stream actual.
+    stream_name = getCurrentStream()
+    previous = _scene_trackers.get(stream_name)
+    if previous is not None:
+        try:
+            previous.stop()
+        except Exception:
+            pass
+    tracker = ObsSceneTracker(ws).start()
+    _scene_trackers[stream_name] = tracker
+    return tracker
+
+
+def getSceneTracker(ws=None) -> ObsSceneTracker | None:
+    # Devuelve el seguidor de escena activo del stream (solo si corresponde a la conexión ws, cuando se indica).
+    tracker = _scene_trackers.get(getCurrentStream())
+    if tracker is None:
+        return None
+    if ws is not None and tracker.ws is not ws:
+        return None
+    return tracker
+
+
 def createObsConnection():
-    # Crea una conexión WebSocket con OBS y devuelve el cliente y la configuración usada.
+    # Crea la conexión con OBS (que se recupera sola si se corta) y devuelve el gestor y la configuración usada.
     config = getConfig()
 
     obs_host = config["obs_host"]
     obs_port = config["obs_port"]
-    obs_password = config["obs_password"]
 
     print(f"\nConectando a OBS en {obs_host}:{obs_port}...\n")
 
-    ws = obsws(obs_host, obs_port, obs_password)
+    ws = ObsConnectionManager(config, getCurrentStream() or "default")
 
     try:
         ws.connect()
         version = ws.call(requests.GetVersion())
         printObsVersion(version)
+        tracker = startSceneTracker(ws)
+        print(f"\t\t- Escena de programa: {tracker.current_scene}")
     except Exception as error:
+        ws.disconnect()
         print("\nError al conectar a OBS\n")
 
         print("Posibles causas:")
@@ -0,0 +1,156 @@
+import dataclasses
+import threading
+import time
+
+from capture_obs_frame import (
+    CapturedFrame,
+    clearSavedFrames,
+    getCapturePlan,
+    grabCaptureStep,
+    isDebugEnabled,
+    isFrameSavingEnabled,
+    printCapturedFrames,
+    saveCapturedFrames,
+)
+from config_loader import getConfig, getCurrentStream, setCurrentStream
+from conn import ObsUnavailable
+from metrics import ERRORS_TOTAL, FRAME_BUFFER_STEPS
+
+
+class FrameRingBuffer:
+    # Buffer circular de capacidad fija con las capturas más recientes (una captura = uno o varios frames).
+    # Los slots se reservan al crear el buffer y se sobrescriben en orden: la memoria queda acotada.
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("La capacidad del buffer de frames debe ser mayor que 0")
+        self.capacity = capacity
+        self._slots: list[list[CapturedFrame] | None] = [None] * capacity
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def push(self, step: list[CapturedFrame]):
+        with self._lock:
+            self._slots[self._next] = step
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def recent(self, window_seconds: float, now: float | None = None) -> list[list[CapturedFrame]]:
+        # Capturas de los últimos window_seconds, de la más antigua a la más nueva.
+        now = now if now is not None else time.time()
+        with self._lock:
+            ordered = [
+                self._slots[(self._next - self._count + offset) % self.capacity]
+                for offset in range(self._count)
+            ]
+        return [step for step in ordered if step and now - step[0].timestamp <= window_seconds]
+
+    def snapshot(self, window_seconds: float, n: int) -> list[CapturedFrame]:
+        # Elige hasta n capturas repartidas uniformemente en la ventana (siempre incluye la más reciente)
+        # y devuelve sus frames con el índice renumerado según su posición en el ciclo.
+        steps = self.recent(window_seconds)
+        if not steps or n <= 0:
+            return []
+
+        if len(steps) > n:
+            if n == 1:
+                steps = [steps[-1]]
+            else:
+                stride = (len(steps) - 1) / float(n - 1)
+                steps = [steps[round(position * stride)] for position in range(n)]
+
+        # copias superficiales: comparten los bytes de la imagen pero no el índice ni la ruta de depuración
+        return [
+            dataclasses.replace(frame, index=index, path=None)
+            for index, step in enumerate(steps)
+            for frame in step
+        ]
+
+
+class BackgroundCapture(threading.Thread):
+    # Captura continuamente desde el origen de frames (OBS) a ritmo fijo y llena el buffer circular,
+    # también durante el cooldown.
+
+    def __init__(self, source, buffer: FrameRingBuffer, fps: float):
+        super().__init__(name="obs-capture", daemon=True)
+        self.source = source
+        self.buffer = buffer
+        self.interval_seconds = 1.0 / fps
+        self.captured = 0
+        self.errors = 0
+        self.stream_name = getCurrentStream()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        setCurrentStream(self.stream_name)
+        next_at = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                # el plan se relee en cada captura para seguir la recarga en caliente y la resolución adaptativa
+                step = grabCaptureStep(self.source, getCapturePlan())
+                if step:
+                    self.buffer.push(step)
+                    self.captured += 1
+                    FRAME_BUFFER_STEPS.set(len(self.buffer))
+            except ObsUnavailable:
+                # el gestor de la conexión ya avisó del corte y está reconectando: se espera sin repetir el error
+                self.source.waitAvailable(max(1.0, self.interval_seconds))
+                next_at = time.monotonic()
+                continue
+            except Exception as error:
+                self.errors += 1
+                ERRORS_TOTAL.inc(stage="capture")
+                print(f"[!] Error en la captura en segundo plano: {error}")
+                # ante errores seguidos no se insiste más rápido que una vez por segundo
+                self._stop_event.wait(max(1.0, self.interval_seconds))
+
+            next_at += self.interval_seconds
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                # OBS tardó más que el intervalo: se sigue desde ahora sin acumular capturas atrasadas
+                next_at = time.monotonic()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        self.join(timeout)
+
+    def snapshot(self, window_seconds: float, n: int) -> list[CapturedFrame]:
+        return self.buffer.snapshot(window_seconds, n)
+
+
+def startBackgroundCapture(source) -> BackgroundCapture | None:
+    # Arranca la captura en segundo plano si config.app.background_capture está activo.
+    app_config = getConfig().app
+    if not app_config.background_capture:
+        return None
+
+    capacity = max(1, int(round(app_config.background_capture_fps * app_config.frame_buffer_seconds)))
+    worker = BackgroundCapture(source, FrameRingBuffer(capacity), app_config.background_capture_fps)
+    worker.start()
+
+    print(f"\t- Captura en segundo plano: {app_config.background_capture_fps:g} fps, "
+          f"buffer de {capacity} capturas (~{app_config.frame_buffer_seconds:g} s)")
+    return worker
+
+
+def takeCycleFrames(capture_worker: BackgroundCapture, frames_dir: str, frames_per_cycle: int,
+                    capture_interval_seconds: float) -> list[CapturedFrame]:
+    # Frames del último intervalo tomados del buffer al instante (sin esperar la captura).
+    frames = capture_worker.snapshot(capture_interval_seconds, frames_per_cycle)
+
+    if frames and isFrameSavingEnabled():
+        clearSavedFrames(frames_dir)
+        saveCapturedFrames(frames, frames_dir, int(time.time() * 1000))
+
+    if isDebugEnabled():
+        print(f"\nFrames tomados del buffer: {len(frames)} (buffer {len(capture_worker.buffer)}/"
+              f"{capture_worker.buffer.capacity})")
+        printCapturedFrames(frames)
+
+    return frames
@@ -0,0 +1,227 @@
+import base64
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+
+import cv2
+import numpy as np
+
+from config_loader import getConfig
+
+THUMBNAIL_SIZE = (64, 36)  # ancho, alto de la miniatura en escala de grises usada para puntuar keyframes
+DHASH_SIZE = 8
+SLOTS_PER_WORKER = 4  # bloques de memoria compartida por proceso: capturas que pueden estar en vuelo a la vez
+
+_preprocess_pool = None  # pool de procesos global (compartido por todos los streams)
+_pool_lock = threading.Lock()
+_worker_slots = {}  # dentro de cada proceso del pool: bloques de memoria compartida por nombre
+
+
+def readImageSize(img_bytes: bytes, fallback_width: int, fallback_height: int) -> tuple[int, int]:
+    # Lee ancho y alto desde la cabecera IHDR de un PNG sin decodificar la imagen.
+    if len(img_bytes) >= 24 and img_bytes[:8] == b"\x89PNG\r\n\x1a\n":
+        width, height = struct.unpack(">II", img_bytes[16:24])
+        return width, height
+    return fallback_width, fallback_height
+
+
+def encodeImage(image: np.ndarray, image_format: str, image_quality: int) -> bytes:
+    # Codifica un array de OpenCV en el formato y calidad pedidos.
+    params: list[int] = []
+    if image_quality >= 0:
+        if image_format == "jpg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, image_quality]
+        elif image_format == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, max(1, image_quality)]
+        else:
+            # en PNG la "calidad" se traduce a nivel de compresión (0-9)
+            params = [cv2.IMWRITE_PNG_COMPRESSION, min(9, max(0, (100 - image_quality) // 10))]
+
+    ok, buffer = cv2.imencode(f".{image_format}", image, params)
+    if not ok:
+        raise ValueError(f"OpenCV no pudo codificar la imagen como {image_format}")
+    return buffer.tobytes()
+
+
+def decodeReducedGray(data: bytes) -> np.ndarray | None:
+    # IMREAD_REDUCED_GRAYSCALE_4 decodifica directamente a 1/4 de resolución: mucho más barato que decodificar completo
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+
+
+def dhashFromGray(gray: np.ndarray, hash_size: int = DHASH_SIZE) -> int:
+    # Difference hash de hash_size * hash_size bits de una imagen en escala de grises.
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def thumbnailFromGray(gray: np.ndarray) -> np.ndarray:
+    # Miniatura normalizada a [0, 1] para comparar frames al elegir keyframes.
+    small = cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return small.astype(np.float32) / 255.0
+
+
+def attachSlots(slot_names: list[str]):
+    # Inicializador de cada proceso del pool: se conecta una sola vez a los bloques de memoria compartida.
+    for name in slot_names:
+        _worker_slots[name] = shared_memory.SharedMemory(name=name)
+
+
+def pingWorker() -> bool:
+    return True
+
+
+def preprocessInWorker(slot_name: str, input_size: int, options: dict) -> dict:
+    # Trabajo de un proceso del pool: el base64 de OBS llega en el bloque compartido y la imagen resultante
+    # vuelve en el mismo bloque; por la cola del pool solo viajan los metadatos (hash, tamaño, miniatura).
+    started = time.perf_counter()
+    buffer = _worker_slots[slot_name].buf
+    data = base64.b64decode(buffer[:input_size])
+    result = {"reencoded": False, "dhash": None, "thumbnail": None}
+
+    if options["grayscale"]:
+        gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is not None:
+            data = encodeImage(gray, options["image_format"], options["image_quality"])
+            result["reencoded"] = True
+
+    # el hash y la miniatura salen de la imagen final, igual que si se calcularan después en el hilo principal
+    small = decodeReducedGray(data)
+    if small is not None:
+        result["dhash"] = dhashFromGray(small)
+        if options["thumbnail"]:
+            result["thumbnail"] = thumbnailFromGray(small)
+
+    result["width"], result["height"] = readImageSize(data, options["width"], options["height"])
+
+    encoded = base64.b64encode(data) if result["reencoded"] else b""
+    if len(data) + len(encoded) <= len(buffer):
+        buffer[:len(data)] = data
+        buffer[len(data):len(data) + len(encoded)] = encoded
+        result["data_size"], result["b64_size"] = len(data), len(encoded)
+    else:
+        # no entra en el bloque (re-codificación más grande que el original): vuelve serializado por la cola
+        result["data"], result["b64"] = data, encoded.decode("ascii")
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+class FramePreprocessPool:
+    # Procesos que hacen el trabajo de CPU de cada captura (base64 → bytes, escala de grises, dhash,
+    # miniatura) fuera del hilo de captura, así el GIL no corre el espaciado entre frames. Las imágenes
+    # viajan por bloques de memoria compartida reservados al arrancar, no serializadas por la cola del pool.
+
+    def __init__(self, workers: int, slots: int, slot_bytes: int):
+        self.workers = workers
+        self.slot_bytes = slot_bytes
+        self._slots = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self._free: queue.Queue = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            # spawn: los procesos no heredan con fork los locks de los hilos de websocket, HTTP y captura
+            mp_context=get_context("spawn"),
+            initializer=attachSlots,
+            initargs=([slot.name for slot in self._slots],),
+        )
+
+        self.submitted = 0
+        self.rejected = 0
+
+    def warmUp(self):
+        # Arranca ya todos los procesos (spawn + importar OpenCV tarda) en vez de hacerlo con el primer frame.
+        for future in [self._executor.submit(pingWorker) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, img_base64: str, options: dict) -> Future | None:
+        # Manda a un proceso el base64 de una captura. Devuelve None si no hay bloque libre, si no entra o
+        # si el pool está roto: el llamador la procesa entonces en su propio hilo.
+        encoded = img_base64.encode("ascii")
+        if len(encoded) > self.slot_bytes:
+            self.rejected += 1
+            return None
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.rejected += 1
+            return None
+
+        slot.buf[:len(encoded)] = encoded
+        outer = Future()
+        try:
+            inner = self._executor.submit(preprocessInWorker, slot.name, len(encoded), options)
+        except (BrokenProcessPool, RuntimeError):
+            self._free.put(slot)
+            self.rejected += 1
+            return None
+
+        inner.add_done_callback(lambda done: self._collect(slot, done, outer))
+        self.submitted += 1
+        return outer
+
+    def _collect(self, slot: shared_memory.SharedMemory, inner: Future, outer: Future):
+        # Copia el resultado fuera del bloque compartido y lo devuelve a la lista de libres.
+        try:
+            result = inner.result()
+            if "data" not in result:
+                data_size, b64_size = result["data_size"], result["b64_size"]
+                result["data"] = bytes(slot.buf[:data_size])
+                result["b64"] = bytes(slot.buf[data_size:data_size + b64_size]).decode("ascii")
+            outer.set_result(result)
+        except BaseException as error:
+            outer.set_exception(error)
+        finally:
+            self._free.put(slot)
+
+    def summary(self) -> str:
+        return (f"{self.workers} procesos, {len(self._slots)} bloques de {self.slot_bytes / (1024 * 1024):.0f} MB, "
+                f"{self.submitted} frames en el pool, {self.rejected} en el hilo de captura")
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+
+
+def getFramePreprocessPool() -> FramePreprocessPool | None:
+    # Devuelve el pool global si obs.preprocess_workers > 0 en la config vigente (None = procesar en el hilo).
+    # El tamaño se fija con la config del primer stream que lo pide; se aplica al reiniciar.
+    global _preprocess_pool
+    obs_config = getConfig().obs
+    if obs_config.preprocess_workers <= 0:
+        return None
+
+    with _pool_lock:
+        if _preprocess_pool is None:
+            workers = obs_config.preprocess_workers
+            _preprocess_pool = FramePreprocessPool(
+                workers=workers,
+                slots=workers * SLOTS_PER_WORKER,
+                slot_bytes=int(obs_config.preprocess_slot_mb * 1024 * 1024),
+            )
+            try:
+                _preprocess_pool.warmUp()
+                print(f"[i] Preprocesado de frames en paralelo: {_preprocess_pool.summary()}")
+            except Exception as error:
+                # el pool queda roto y cada frame se procesa en el hilo de captura, como con 0 procesos
+                print(f"[!] No se pudieron arrancar los procesos de preprocesado: {error}")
+        return _preprocess_pool
+
+
+def closeFramePreprocessPool():
+    # Detiene los procesos y libera la memoria compartida al apagar el servicio.
+    global _preprocess_pool
+    with _pool_lock:
+        if _preprocess_pool is None:
+            return
+        print(f"\t- Preprocesado de frames: {_preprocess_pool.summary()}")
+        _preprocess_pool.close()
+        _preprocess_pool = None
@@ -0,0 +1,144 @@
+import threading
+from collections import deque
+
+from capture_obs_frame import CapturedFrame, isDebugEnabled
+from config_loader import getConfig
+from frame_preprocess import DHASH_SIZE, decodeReducedGray, dhashFromGray
+
+
+def computeDHash(frame: CapturedFrame, hash_size: int = DHASH_SIZE) -> int:
+    # Calcula (y cachea en el frame) el difference hash de 64 bits de la imagen en escala de grises;
+    # con el pool de preprocesado activo ya viene calculado desde la captura.
+    if frame.dhash is not None:
+        return frame.dhash
+
+    gray = decodeReducedGray(frame.data)
+    if gray is None:
+        raise ValueError(f"No se pudo decodificar el frame {frame.index} de {frame.source_name}")
+
+    frame.dhash = dhashFromGray(gray, hash_size)
+    return frame.dhash
+
+
+def hammingDistance(hash_a: int, hash_b: int) -> int:
+    return (hash_a ^ hash_b).bit_count()
+
+
+class SceneChangeGate:
+    # Compara frames por hash perceptual para quitar duplicados de un ciclo y saltar reacciones a escenas sin cambios.
+
+    def __init__(
+        self,
+        dedupe_enabled: bool = True,
+        dedupe_threshold: int = 4,
+        gate_enabled: bool = False,
+        change_threshold: int = 10,
+        max_consecutive_skips: int = 3,
+        defer_cycles: int = 2,
+        history_size: int = 8,
+    ):
+        self.dedupe_enabled = dedupe_enabled
+        self.dedupe_threshold = dedupe_threshold
+        self.gate_enabled = gate_enabled
+        self.change_threshold = change_threshold
+        self.max_consecutive_skips = max_consecutive_skips
+        self.defer_cycles = defer_cycles
+
+        # hashes de los frames que originaron las últimas reacciones; en modo staged los registra la etapa LLM
+        # mientras el hilo de captura los consulta
+        self._reaction_hashes: deque[int] = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._consecutive_skips = 0
+
+        self.frames_seen = 0
+        self.frames_deduped = 0
+        self.cycles_checked = 0
+        self.cycles_skipped = 0
+
+    def dedupeFrames(self, frames: list[CapturedFrame]) -> list[CapturedFrame]:
+        # Quita del ciclo los frames casi idénticos a otro ya incluido (siempre conserva el primero).
+        self.frames_seen += len(frames)
+        if not self.dedupe_enabled or len(frames) <= 1:
+            return frames
+
+        kept: list[CapturedFrame] = []
+        kept_hashes: list[int] = []
+        for frame in frames:
+            frame_hash = computeDHash(frame)
+            if any(hammingDistance(frame_hash, other) <= self.dedupe_threshold for other in kept_hashes):
+                self.frames_deduped += 1
+                continue
+            kept.append(frame)
+            kept_hashes.append(frame_hash)
+
+        if isDebugEnabled() and len(kept) < len(frames):
+            print(f"\t- Frames casi idénticos descartados: {len(frames) - len(kept)} de {len(frames)}")
+
+        return kept
+
+    def sceneDistance(self, frames: list[CapturedFrame]) -> int | None:
+        # Distancia mínima entre los frames actuales y los de reacciones recientes (None si no hay referencia).
+        with self._lock:
+            reaction_hashes = list(self._reaction_hashes)
+        if not reaction_hashes or not frames:
+            return None
+        return min(
+            hammingDistance(computeDHash(frame), previous)
+            for frame in frames
+            for previous in reaction_hashes
+        )
+
+    def shouldReact(self, frames: list[CapturedFrame]) -> bool:
+        # Decide si vale la pena llamar al LLM: hay cambio de escena o ya se saltaron demasiados ciclos.
+        if not self.gate_enabled:
+            return True
+
+        self.cycles_checked += 1
+        distance = self.sceneDistance(frames)
+
+        if distance is None or distance > self.change_threshold:
+            self._consecutive_skips = 0
+            return True
+
+        if self._consecutive_skips >= self.max_consecutive_skips:
+            if isDebugEnabled():
+                print(f"\t- Escena sin cambios (distancia {distance}), pero se alcanzó el máximo de saltos seguidos")
+            self._consecutive_skips = 0
+            return True
+
+        self._consecutive_skips += 1
+        self.cycles_skipped += 1
+        print(f"\t- Escena sin cambios significativos (distancia {distance} <= {self.change_threshold}); "
+              f"se omite la llamada al LLM ({self.hitRateSummary()})")
+        return False
+
+    def recordReaction(self, frames: list[CapturedFrame]):
+        # Guarda los hashes de los frames de una reacción que el avatar llegó a decir como referencia futura.
+        if not self.gate_enabled:
+            return
+        hashes = [computeDHash(frame) for frame in frames]
+        with self._lock:
+            self._reaction_hashes.extend(hashes)
+
+    def hitRateSummary(self) -> str:
+        # Resumen de aciertos del filtro: frames deduplicados y ciclos sin llamada al LLM.
+        frame_rate = (self.frames_deduped / self.frames_seen * 100) if self.frames_seen else 0.0
+        cycle_rate = (self.cycles_skipped / self.cycles_checked * 100) if self.cycles_checked else 0.0
+        return (
+            f"frames deduplicados {self.frames_deduped}/{self.frames_seen} ({frame_rate:.0f}%), "
+            f"ciclos omitidos {self.cycles_skipped}/{self.cycles_checked} ({cycle_rate:.0f}%)"
+        )
+
+
+def createSceneChangeGate() -> SceneChangeGate:
+    # Construye el filtro de similitud leyendo umbrales de las secciones obs y app de config.yaml.
+    config = getConfig()
+
+    return SceneChangeGate(
+        dedupe_enabled=config.obs.dedupe_frames,
+        dedupe_threshold=config.obs.dedupe_hamming_threshold,
+        gate_enabled=config.app.scene_gate_enabled,
+        change_threshold=config.app.scene_change_threshold,
+        max_consecutive_skips=config.app.scene_gate_max_skips,
+        defer_cycles=config.app.scene_gate_defer_cycles,
+    )
@@ -0,0 +1,299 @@
+import base64
+import bisect
+import json
+import os
+import statistics
+import time
+
+import cv2
+
+from capture_obs_frame import CapturedFrame, preprocessImage, submitCaptureStep
+from conn import getSceneTracker
+from frame_preprocess import encodeImage
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+SESSION_FILE = "session.jsonl"  # índice de una sesión grabada con `python replay.py record`
+
+
+class ReplayFinished(Exception):
+    # La grabación se terminó: no quedan frames que reproducir.
+    pass
+
+
+class ObsFrameSource:
+    # Origen de frames en vivo: capturas de OBS por websocket, con el reloj real.
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.name = "OBS"
+
+    def submitStep(self, plan: dict, index: int = 0) -> list:
+        # Una captura según el plan (ver capture_obs_frame.submitCaptureStep).
+        return submitCaptureStep(self.ws, plan, index)
+
+    def sceneTracker(self):
+        return getSceneTracker(self.ws)
+
+    def waitAvailable(self, timeout: float) -> bool:
+        # Con el gestor de conexión espera a que OBS vuelva tras un corte (como mucho timeout segundos).
+        wait_connected = getattr(self.ws, "waitConnected", None)
+        return wait_connected(timeout) if wait_connected is not None else True
+
+    def now(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, seconds: float, stop_event) -> bool:
+        # Espera de un ciclo silencioso; devuelve True si hay que detener el pipeline.
+        return stop_event.wait(seconds)
+
+    def close(self):
+        self.ws.disconnect()
+
+
+class VideoReader:
+    # Frames de un archivo de video (cualquier formato que abra OpenCV) por posición en segundos.
+
+    def __init__(self, path: str):
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError(f"OpenCV no pudo abrir el video: {path}")
+
+        self.name = os.path.basename(path)
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        # algunos contenedores no informan la cantidad de frames: se reproduce hasta que falle la lectura
+        self.duration = frame_count / self.fps if frame_count > 0 else float("inf")
+        self._next_index = 0
+        self._last: tuple[int, object] | None = None
+
+    def frameAt(self, position: float) -> list[tuple[str, str | None, object]]:
+        target = int(position * self.fps)
+        if self._last is None or self._last[0] != target:
+            if target < self._next_index or target - self._next_index > self.fps * 10:
+                # hacia atrás o un salto largo: se busca en vez de decodificar todo el tramo
+                self._capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+                self._next_index = target
+            while self._next_index < target and self._capture.grab():
+                self._next_index += 1
+
+            ok, image = self._capture.read()
+            if not ok:
+                raise ReplayFinished(f"{self.name} no tiene más frames (posición {position:.1f} s)")
+            self._next_index += 1
+            self._last = (target, image)
+        return [(self.name, None, self._last[1])]
+
+    def close(self):
+        self._capture.release()
+
+
+class ImageSequenceReader:
+    # Frames de imágenes sueltas: cada paso (una imagen, o una por fuente en una sesión multi_source)
+    # se muestra desde su posición hasta la del siguiente.
+
+    def __init__(self, name: str, steps: list[tuple[float, list[tuple[str, str | None, str]]]], duration: float):
+        if not steps:
+            raise ValueError(f"No hay imágenes que reproducir en {name}")
+        self.name = name
+        self.duration = duration
+        self._positions = [position for position, _ in steps]
+        self._steps = [files for _, files in steps]
+        self._loaded: tuple[int, list] | None = None
+
+    def frameAt(self, position: float) -> list[tuple[str, str | None, object]]:
+        step = max(0, bisect.bisect_right(self._positions, position) - 1)
+        if self._loaded is None or self._loaded[0] != step:
+            frames = []
+            for source_name, label, path in self._steps[step]:
+                image = cv2.imread(path, cv2.IMREAD_COLOR)
+                if image is None:
+                    print(f"\t[!] No se pudo leer la imagen {path}; se omite")
+                    continue
+                frames.append((source_name, label, image))
+            self._loaded = (step, frames)
+        return self._loaded[1]
+
+    def close(self):
+        self._loaded = None
+
+
+def loadImageDirectory(directory: str, fps: float) -> ImageSequenceReader:
+    # Carpeta de imágenes en orden alfabético, una cada 1/fps segundos.
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    step_seconds = 1.0 / fps
+    steps = [
+        (position * step_seconds, [(name, None, os.path.join(directory, name))])
+        for position, name in enumerate(names)
+    ]
+    return ImageSequenceReader(os.path.basename(os.path.normpath(directory)), steps, len(steps) * step_seconds)
+
+
+def loadRecordedSession(directory: str) -> ImageSequenceReader:
+    # Sesión grabada con SessionRecorder: respeta los tiempos y las fuentes/etiquetas de la captura original.
+    grouped: dict[int, tuple[float, list]] = {}
+    with open(os.path.join(directory, SESSION_FILE), "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            _, files = grouped.setdefault(int(record["step"]), (float(record["offset"]), []))
+            files.append((record["source"], record.get("label"), os.path.join(directory, record["file"])))
+
+    steps = [grouped[step] for step in sorted(grouped)]
+    positions = [position for position, _ in steps]
+    gaps = [later - earlier for earlier, later in zip(positions, positions[1:]) if later > earlier]
+    # el último paso dura lo mismo que el intervalo típico entre capturas
+    last_gap = statistics.median(gaps) if gaps else 1.0
+    duration = positions[-1] + last_gap if positions else 0.0
+    return ImageSequenceReader(os.path.basename(os.path.normpath(directory)), steps, duration)
+
+
+def sourceSize(plan: dict, source_name: str) -> tuple[int, int, str | None]:
+    # Tamaño (y etiqueta) que pediría el pipeline a OBS para esa fuente según el plan de captura vigente.
+    for name, label, width, height in plan["batch_sources"]:
+        if name == source_name:
+            return width, height, label
+    return plan["capture_width"], plan["capture_height"], None
+
+
+class ReplayFrameSource:
+    # Reproduce una grabación (video, carpeta de imágenes o sesión grabada) como si fuera OBS: cada captura toma
+    # el frame de la posición actual, lo escala y codifica según el plan vigente (tamaño, formato, calidad) y lo
+    # pasa por el mismo preprocesado que un screenshot. Con realtime la posición avanza con el reloj; si no,
+    # solo con las esperas del pipeline, que no duermen: la grabación se recorre a máxima velocidad y cada ciclo
+    # cubre siempre el mismo tramo, así dos corridas con la misma config ven exactamente los mismos frames.
+
+    def __init__(self, reader, realtime: bool = False, start_seconds: float = 0.0, end_seconds: float | None = None):
+        self.reader = reader
+        self.name = f"replay {reader.name}"
+        self.realtime = realtime
+        self.start_seconds = start_seconds
+        self.end_seconds = min(reader.duration, end_seconds) if end_seconds else reader.duration
+        self.finished = False
+        self.steps = 0
+        self._position = start_seconds
+        self._started_at: float | None = None
+
+    def now(self) -> float:
+        # Posición actual en la grabación, en segundos.
+        if not self.realtime:
+            return self._position
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        return self.start_seconds + time.monotonic() - self._started_at
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        if self.realtime:
+            time.sleep(seconds)
+        else:
+            self._position += seconds
+
+    def wait(self, seconds: float, stop_event) -> bool:
+        # Los ciclos silenciosos también consumen grabación; al llegar al final se detiene el pipeline.
+        if self.realtime:
+            stop_event.wait(seconds)
+        else:
+            self.sleep(seconds)
+        if self.now() >= self.end_seconds:
+            self.finished = True
+            stop_event.set()
+        return stop_event.is_set()
+
+    def submitStep(self, plan: dict, index: int = 0) -> list:
+        position = self.now()
+        if position >= self.end_seconds:
+            self.finished = True
+            raise ReplayFinished(f"{self.reader.name} terminó ({self.end_seconds:.1f} s)")
+        try:
+            images = self.reader.frameAt(position)
+        except ReplayFinished:
+            self.finished = True
+            raise
+
+        encoding_config = plan["encoding"]
+        timestamp = time.time()
+        items = []
+        for source_name, recorded_label, image in images:
+            width, height, label = sourceSize(plan, source_name)
+            if (image.shape[1], image.shape[0]) != (width, height):
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            data = encodeImage(image, encoding_config["image_format"], encoding_config["image_quality"])
+            source = (f"{source_name}@{position:.2f}s", label or recorded_label, width, height)
+            items.append(preprocessImage(base64.b64encode(data).decode("ascii"), source, index, timestamp,
+                                         encoding_config))
+        self.steps += 1
+        return items
+
+    def sceneTracker(self):
+        return None
+
+    def waitAvailable(self, timeout: float) -> bool:
+        return True
+
+    def close(self):
+        self.reader.close()
+
+
+def createReplaySource(path: str, realtime: bool = False, fps: float = 1.0, start_seconds: float = 0.0,
+                       duration_seconds: float | None = None) -> ReplayFrameSource:
+    # Elige el lector según la ruta: carpeta con session.jsonl, carpeta de imágenes (a fps) o archivo de video.
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, SESSION_FILE)):
+            reader = loadRecordedSession(path)
+        else:
+            reader = loadImageDirectory(path, fps)
+    elif os.path.isfile(path):
+        reader = VideoReader(path)
+    else:
+        raise FileNotFoundError(f"No existe la grabación: {path}")
+
+    end_seconds = start_seconds + duration_seconds if duration_seconds else None
+    return ReplayFrameSource(reader, realtime, start_seconds, end_seconds)
+
+
+class SessionRecorder:
+    # Graba capturas de OBS tal como llegan (imagen + fuente, etiqueta e instante) para reproducirlas después.
+
+    def __init__(self, session_dir: str):
+        os.makedirs(session_dir, exist_ok=True)
+        index_path = os.path.join(session_dir, SESSION_FILE)
+        if os.path.exists(index_path):
+            raise FileExistsError(f"Ya hay una sesión grabada en {session_dir}")
+
+        self.session_dir = session_dir
+        self.steps = 0
+        self._started_at: float | None = None
+        self._index = open(index_path, "w", encoding="utf-8")
+
+    def write(self, frames: list[CapturedFrame]):
+        # Guarda una captura (un frame, o uno por fuente en multi_source) como un paso de la sesión.
+        if not frames:
+            return
+        if self._started_at is None:
+            self._started_at = frames[0].timestamp
+
+        for position, frame in enumerate(frames):
+            file_name = f"step_{self.steps:06d}_{position}.{frame.image_format}"
+            with open(os.path.join(self.session_dir, file_name), "wb") as file:
+                file.write(frame.data)
+            record = {
+                "step": self.steps,
+                "offset": round(frame.timestamp - self._started_at, 3),
+                "file": file_name,
+                "source": frame.source_name,
+                "label": frame.label,
+                "width": frame.width,
+                "height": frame.height,
+            }
+            self._index.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._index.flush()
+        self.steps += 1
+
+    def close(self):
+        self._index.close()
@@ -1,18 +1,210 @@
-def saveHistory(
-    history_file: str,
-    messages: list[str],
-    max_history_messages: int,
-    persist_file: bool,
-) -> list[str]:
-    # Recorta el historial a un máximo de mensajes y opcionalmente lo guarda en disco.
-    if max_history_messages > 0:
-        trimmed = messages[-max_history_messages:]
-    else:
-        trimmed = []
-
-    if persist_file and max_history_messages > 0:
-        with open(history_file, "w", encoding="utf-8") as file:
-            for msg in trimmed:
-                file.write(msg.replace("\n", " ") + "\n")
-
-    return trimmed
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+from capture_obs_frame import isDebugEnabled
+from config_loader import getConfig
+from metrics import ERRORS_TOTAL
+
+_history_stores = {}  # historial por archivo (uno por stream en modo multi-stream)
+_stores_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    # Una respuesta dicha por el avatar junto con el contexto en que se dijo.
+    text: str
+    timestamp: float
+    scene: str | None = None
+    frame_hashes: list[str] = field(default_factory=list)  # dhash hexadecimal de los frames enviados al LLM
+
+
+def parseHistoryLine(line: str) -> HistoryEntry | None:
+    # Lee una línea del archivo: JSON del formato actual o texto plano del history.txt antiguo.
+    line = line.strip()
+    if not line:
+        return None
+    if not line.startswith("{"):
+        return HistoryEntry(text=line, timestamp=0.0)
+    record = json.loads(line)
+    return HistoryEntry(
+        text=str(record["text"]),
+        timestamp=float(record.get("timestamp", 0.0)),
+        scene=record.get("scene"),
+        frame_hashes=list(record.get("frame_hashes") or []),
+    )
+
+
+class HistoryStore:
+    # Historial de respuestas: deque acotado en memoria y, si persist está activo, un archivo JSONL de
+    # solo-añadir. Cada respuesta es una línea (O(1) por reacción); cuando el archivo supera compact_lines
+    # se reescribe con lo que hay en memoria de forma atómica (temporal + rename).
+
+    def __init__(
+        self,
+        history_file: str,
+        max_entries: int,
+        persist: bool = False,
+        fsync_policy: str = "interval",
+        fsync_interval_seconds: float = 5.0,
+        compact_lines: int = 500,
+    ):
+        self.history_file = history_file
+        self.persist = persist
+        self.fsync_policy = fsync_policy
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.compact_lines = max(compact_lines, max_entries)
+
+        self._entries: deque[HistoryEntry] = deque(maxlen=max(max_entries, 0))
+        self._file = None
+        self._lines_in_file = 0
+        self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.appended = 0
+        self.compactions = 0
+
+    def load(self) -> int:
+        # Recupera la cola del archivo tras un reinicio; una última línea cortada por un crash se descarta
+        # y el archivo se compacta para dejarlo limpio antes de seguir añadiendo.
+        if not self.persist or not os.path.exists(self.history_file):
+            return 0
+
+        with self._lock:
+            lines = 0
+            corrupt = 0
+            with open(self.history_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    lines += 1
+                    try:
+                        entry = parseHistoryLine(line)
+                    except (ValueError, KeyError, TypeError):
+                        corrupt += 1
+                        continue
+                    if entry is not None:
+                        self._entries.append(entry)
+
+            self._lines_in_file = lines
+            if corrupt:
+                ERRORS_TOTAL.inc(stage="history")
+                print(f"[!] Historial: {corrupt} líneas dañadas descartadas en {self.history_file}")
+                self._compact()
+
+            return len(self._entries)
+
+    def messages(self) -> list[str]:
+        # Textos del historial, del más antiguo al más reciente (lo que ve el prompt).
+        with self._lock:
+            return [entry.text for entry in self._entries]
+
+    def applySettings(self, max_entries: int, persist: bool):
+        # Aplica cambios en caliente de max_history_messages y history_persist_file (conserva lo más reciente).
+        with self._lock:
+            self.persist = persist
+            if self._entries.maxlen == max_entries:
+                return
+            self._entries = deque(self._entries, maxlen=max(max_entries, 0))
+            self.compact_lines = max(self.compact_lines, max_entries)
+
+    def append(self, entry: HistoryEntry):
+        # Agrega una respuesta en memoria y, si se persiste, como una línea al final del archivo.
+        with self._lock:
+            if self._entries.maxlen == 0:
+                return
+            self._entries.append(entry)
+            self.appended += 1
+
+            if not self.persist:
+                return
+            try:
+                if self._lines_in_file >= self.compact_lines:
+                    self._compact()
+                else:
+                    self._appendLine(entry)
+            except OSError as error:
+                ERRORS_TOTAL.inc(stage="history")
+                print(f"[!] No se pudo guardar el historial ({self.history_file}): {error}")
+
+    def close(self):
+        # Cierra el archivo asegurando en disco lo escrito desde el último fsync.
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            if self.fsync_policy != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _appendLine(self, entry: HistoryEntry):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.history_file) or ".", exist_ok=True)
+            self._file = open(self.history_file, "a", encoding="utf-8")
+
+        self._file.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._lines_in_file += 1
+        self._maybeFsync()
+
+    def _maybeFsync(self):
+        now = time.monotonic()
+        if self.fsync_policy == "always" or (
+            self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval_seconds
+        ):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _compact(self):
+        # Reescribe el archivo solo con las entradas en memoria; el rename es atómico, así que tras un crash
+        # queda el archivo viejo o el nuevo completo, nunca uno a medias.
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        os.makedirs(os.path.dirname(self.history_file) or ".", exist_ok=True)
+        temp_file = f"{self.history_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as file:
+            for entry in self._entries:
+                file.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+            file.flush()
+            if self.fsync_policy != "never":
+                os.fsync(file.fileno())
+        os.replace(temp_file, self.history_file)
+
+        self._lines_in_file = len(self._entries)
+        self._last_fsync = time.monotonic()
+        self.compactions += 1
+        if isDebugEnabled():
+            print(f"\t- Historial compactado a {self._lines_in_file} entradas: {self.history_file}")
+
+
+def getHistoryStore(history_file: str) -> HistoryStore:
+    # Devuelve el historial de ese archivo (uno por archivo), cargando lo guardado antes del último reinicio.
+    with _stores_lock:
+        store = _history_stores.get(history_file)
+        if store is not None:
+            return store
+
+        app_config = getConfig().app
+        store = HistoryStore(
+            history_file=history_file,
+            max_entries=app_config.max_history_messages,
+            persist=app_config.history_persist_file,
+            fsync_policy=app_config.history_fsync,
+            fsync_interval_seconds=app_config.history_fsync_interval_seconds,
+            compact_lines=app_config.history_compact_lines,
+        )
+        store.load()
+        _history_stores[history_file] = store
+        return store
+
+
+def closeHistoryStores():
+    # Cierra los archivos de historial al apagar el servicio.
+    with _stores_lock:
+        for store in _history_stores.values():
+            store.close()
+        _history_stores.clear()
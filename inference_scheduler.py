@@ -0,0 +1,220 @@
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config_loader import getConfig, getConfigManager, getCurrentStream
+from metrics import INFERENCE_BUSY_SECONDS_TOTAL, INFERENCE_REJECTED_TOTAL, INFERENCE_WAIT_SECONDS
+
+_inference_scheduler = None  # instancia global única del planificador de llamadas a Ollama
+_scheduler_lock = threading.Lock()
+
+
+class InferenceRejected(Exception):
+    # La llamada al LLM no se hizo porque el stream superó su cuota (tasa máxima o espera de turno).
+
+    def __init__(self, stream_label: str, reason: str, detail: str):
+        super().__init__(f"Stream '{stream_label}' sin turno en el LLM ({detail})")
+        self.stream_label = stream_label
+        self.reason = reason
+
+
+class ReactionExpired(Exception):
+    # La reacción dejó de tener sentido: venció su plazo ("deadline") o un ciclo más nuevo la reemplazó ("superseded").
+
+    def __init__(self, reason: str, age_seconds: float):
+        detail = "reemplazada por un ciclo más nuevo" if reason == "superseded" else "fuera de plazo"
+        super().__init__(f"Reacción a frames de hace {age_seconds:.1f} s {detail}")
+        self.reason = reason
+        self.age_seconds = age_seconds
+        self.partial_text = ""  # texto que ya se alcanzó a decir (modo streaming)
+
+
+class ReactionRequest:
+    # Plazo y cancelación de una llamada al LLM; el plazo se cuenta desde el primer frame, no desde la llamada.
+
+    def __init__(self, frames_timestamp: float | None, deadline_seconds: float, max_tokens: int | None = None):
+        self.created_at = frames_timestamp or time.time()
+        self.deadline = self.created_at + deadline_seconds if deadline_seconds > 0 else None
+        self.max_tokens = max_tokens
+        self._cancelled = threading.Event()
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def remaining(self) -> float | None:
+        # Segundos hasta el plazo (None si no tiene plazo).
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        # Lanza ReactionExpired si la reacción fue reemplazada o ya venció su plazo.
+        if self._cancelled.is_set():
+            raise ReactionExpired("superseded", self.age())
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise ReactionExpired("deadline", self.age())
+
+    def boundTimeout(self, timeout: float) -> float:
+        # Recorta un timeout para no esperar más allá del plazo (con un mínimo para que el error sea de plazo).
+        remaining = self.remaining()
+        return timeout if remaining is None else max(0.1, min(timeout, remaining))
+
+
+class StreamShare:
+    # Estado de reparto de un stream: tiempo de GPU consumido (ponderado) y llamadas recientes.
+
+    def __init__(self):
+        self.virtual_time = 0.0
+        self.busy_seconds = 0.0
+        self.calls = 0
+        self.active = 0  # llamadas esperando turno o en curso
+        self.recent_calls: deque[float] = deque()
+
+
+class InferenceScheduler:
+    # Reparte las llamadas a Ollama entre streams: como mucho max_concurrent a la vez y, cuando hay
+    # cola, el turno es del stream que menos tiempo de GPU consumió en proporción a su peso.
+
+    def __init__(self, max_concurrent: int = 1):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._cond = threading.Condition()
+        self._shares: dict[str, StreamShare] = {}
+        self._waiting: list[tuple[str, int]] = []  # (stream, orden de llegada)
+        self._sequence = itertools.count()
+        self._running = 0
+
+    def _share(self, stream_label: str) -> StreamShare:
+        share = self._shares.get(stream_label)
+        if share is None:
+            share = self._shares[stream_label] = StreamShare()
+        return share
+
+    def _nextTicket(self) -> tuple[str, int] | None:
+        # Turno justo: menor tiempo virtual; a igualdad, el que llegó primero.
+        if not self._waiting:
+            return None
+        return min(self._waiting, key=lambda ticket: (self._shares[ticket[0]].virtual_time, ticket[1]))
+
+    def acquire(self, stream_label: str, max_wait_seconds: float = 0.0, max_calls_per_minute: int = 0) -> float:
+        # Espera turno para una llamada; devuelve los segundos esperados o lanza InferenceRejected.
+        requested_at = time.monotonic()
+        with self._cond:
+            share = self._share(stream_label)
+
+            if max_calls_per_minute > 0:
+                while share.recent_calls and requested_at - share.recent_calls[0] >= 60.0:
+                    share.recent_calls.popleft()
+                if len(share.recent_calls) >= max_calls_per_minute:
+                    INFERENCE_REJECTED_TOTAL.inc(stream=stream_label, reason="rate")
+                    raise InferenceRejected(stream_label, "rate", f"máximo {max_calls_per_minute} llamadas por minuto")
+
+            # un stream que estuvo inactivo no acumula crédito: entra al nivel de los que ya compiten
+            if share.active == 0:
+                competing = [other.virtual_time for other in self._shares.values() if other.active > 0]
+                if competing:
+                    share.virtual_time = max(share.virtual_time, min(competing))
+
+            ticket = (stream_label, next(self._sequence))
+            self._waiting.append(ticket)
+            share.active += 1
+
+            deadline = requested_at + max_wait_seconds if max_wait_seconds > 0 else None
+            while self._running >= self.max_concurrent or self._nextTicket() != ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(ticket)
+                    share.active -= 1
+                    self._cond.notify_all()
+                    INFERENCE_REJECTED_TOTAL.inc(stream=stream_label, reason="timeout")
+                    raise InferenceRejected(stream_label, "timeout", f"más de {max_wait_seconds:g} s esperando turno")
+                self._cond.wait(remaining)
+
+            self._waiting.remove(ticket)
+            self._running += 1
+            share.calls += 1
+            share.recent_calls.append(time.monotonic())
+            # quien sigue en la cola puede tener turno si todavía hay lugar
+            self._cond.notify_all()
+
+        waited = time.monotonic() - requested_at
+        INFERENCE_WAIT_SECONDS.observe(waited, stream=stream_label)
+        return waited
+
+    def release(self, stream_label: str, busy_seconds: float, weight: float = 1.0):
+        # Libera el turno y carga el tiempo usado al stream, dividido por su peso.
+        with self._cond:
+            share = self._share(stream_label)
+            share.active -= 1
+            share.busy_seconds += busy_seconds
+            share.virtual_time += busy_seconds / max(weight, 0.001)
+            self._running -= 1
+            self._cond.notify_all()
+        INFERENCE_BUSY_SECONDS_TOTAL.inc(busy_seconds, stream=stream_label)
+
+    @contextmanager
+    def slot(self, request: ReactionRequest | None = None):
+        # Turno para una llamada del stream del hilo actual, con la cuota de su perfil en config.inference.
+        # Con request, la espera de turno tampoco pasa del plazo de la reacción.
+        stream_label = getCurrentStream() or "default"
+        quota = getConfig().inference
+
+        max_wait_seconds = quota.max_wait_seconds
+        bound_by_deadline = False
+        if request is not None:
+            request.check()
+            remaining = request.remaining()
+            if remaining is not None and (max_wait_seconds <= 0 or remaining < max_wait_seconds):
+                max_wait_seconds = remaining
+                bound_by_deadline = True
+
+        try:
+            self.acquire(stream_label, max_wait_seconds, quota.max_calls_per_minute)
+        except InferenceRejected as rejection:
+            if bound_by_deadline and rejection.reason == "timeout":
+                raise ReactionExpired("deadline", request.age()) from rejection
+            raise
+        started = time.monotonic()
+        try:
+            if request is not None:
+                # pudo vencer o ser reemplazada mientras esperaba turno
+                request.check()
+            yield
+        finally:
+            self.release(stream_label, time.monotonic() - started, quota.weight)
+
+    def summary(self) -> str:
+        with self._cond:
+            parts = [
+                f"{label}: {share.calls} llamadas, {share.busy_seconds:.1f} s de GPU"
+                for label, share in sorted(self._shares.items())
+            ]
+        return "; ".join(parts) if parts else "sin llamadas"
+
+
+def createReactionRequest(frames) -> ReactionRequest | None:
+    # Plazo de la reacción según config.llm (None si no hay plazo ni cancelación: llamada como siempre).
+    llm_config = getConfig().llm
+    if llm_config.reaction_deadline_seconds <= 0 and not llm_config.cancel_superseded:
+        return None
+    return ReactionRequest(frames[0].timestamp if frames else None, llm_config.reaction_deadline_seconds)
+
+
+def createShortPromptRequest() -> ReactionRequest:
+    # Plazo propio (corto) del reintento con prompt reducido, contado desde ahora.
+    llm_config = getConfig().llm
+    return ReactionRequest(None, llm_config.short_prompt_timeout_seconds, llm_config.short_prompt_max_tokens)
+
+
+def getInferenceScheduler() -> InferenceScheduler:
+    # Devuelve el planificador único, compartido por todos los streams del proceso
+    # (max_concurrent se toma de la configuración base al crearlo).
+    global _inference_scheduler
+    with _scheduler_lock:
+        if _inference_scheduler is None:
+            max_concurrent = getConfigManager().getBaseSnapshot().inference.max_concurrent
+            _inference_scheduler = InferenceScheduler(max_concurrent)
+        return _inference_scheduler
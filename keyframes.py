@@ -0,0 +1,183 @@
+import dataclasses
+import threading
+from collections import deque
+
+import numpy as np
+
+from capture_obs_frame import CapturedFrame, isDebugEnabled
+from config_loader import getConfig
+from frame_preprocess import decodeReducedGray, thumbnailFromGray
+from metrics import KEYFRAME_SELECTION_SECONDS
+
+HISTOGRAM_BINS = 16
+
+
+def computeThumbnail(frame: CapturedFrame) -> np.ndarray:
+    # Calcula (y cachea en el frame) una miniatura en gris normalizada a [0, 1] para comparar frames;
+    # con el pool de preprocesado activo ya viene calculada desde la captura.
+    if frame.thumbnail is not None:
+        return frame.thumbnail
+
+    gray = decodeReducedGray(frame.data)
+    if gray is None:
+        raise ValueError(f"No se pudo decodificar el frame {frame.index} de {frame.source_name}")
+
+    frame.thumbnail = thumbnailFromGray(gray)
+    return frame.thumbnail
+
+
+def computeHistograms(thumbnails: np.ndarray) -> np.ndarray:
+    # Histogramas de intensidad normalizados (N x HISTOGRAM_BINS) de todas las miniaturas en una sola pasada.
+    count = thumbnails.shape[0]
+    bins = np.minimum((thumbnails.reshape(count, -1) * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    offsets = np.arange(count, dtype=np.int64)[:, None] * HISTOGRAM_BINS
+    histograms = np.bincount((bins + offsets).ravel(), minlength=count * HISTOGRAM_BINS)
+    histograms = histograms.reshape(count, HISTOGRAM_BINS).astype(np.float32)
+    return histograms / histograms.sum(axis=1, keepdims=True)
+
+
+def normalizeScores(values: np.ndarray) -> np.ndarray:
+    # Lleva una señal a [0, 1] dividiendo por su máximo (todo cero si no hay variación).
+    peak = float(values.max()) if values.size else 0.0
+    return values / peak if peak > 0 else np.zeros_like(values)
+
+
+class KeyframeSelector:
+    # Elige los K momentos más informativos de un conjunto de candidatos en lugar de repartirlos uniformemente.
+    # Cada candidato se puntúa con tres señales sobre miniaturas: movimiento respecto del frame anterior,
+    # distancia de histograma respecto del resto de candidatos y novedad respecto de la última reacción.
+
+    def __init__(
+        self,
+        candidates: int = 6,
+        motion_weight: float = 1.0,
+        histogram_weight: float = 1.0,
+        novelty_weight: float = 1.0,
+        history_size: int = 4,
+    ):
+        self.candidates = candidates
+        self.motion_weight = motion_weight
+        self.histogram_weight = histogram_weight
+        self.novelty_weight = novelty_weight
+
+        # miniaturas de los frames de las últimas reacciones dichas, por fuente; en modo staged las registra
+        # la etapa LLM mientras el hilo de captura puntúa candidatos
+        self._reaction_thumbnails: dict[str, deque[np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self._history_size = history_size
+
+        self.cycles_selected = 0
+        self.frames_considered = 0
+        self.frames_selected = 0
+
+    def scoreSource(self, thumbnails: np.ndarray, source_name: str) -> tuple[np.ndarray, np.ndarray]:
+        # Puntuación base de los candidatos de una fuente (en orden temporal) y sus distancias por pares.
+        count = thumbnails.shape[0]
+
+        # distancia media absoluta entre todos los pares: sirve para movimiento, novedad y diversidad
+        pairwise = np.abs(thumbnails[:, None] - thumbnails[None, :]).mean(axis=(2, 3))
+
+        motion = np.zeros(count, dtype=np.float32)
+        if count > 1:
+            steps = np.diagonal(pairwise, offset=1)
+            motion[1:] = steps
+            motion[0] = steps[0]
+
+        histograms = computeHistograms(thumbnails)
+        histogram_distance = 0.5 * np.abs(histograms - histograms.mean(axis=0)).sum(axis=1)
+
+        with self._lock:
+            previous = list(self._reaction_thumbnails.get(source_name) or ())
+        if previous:
+            reference = np.stack(previous)
+            novelty = np.abs(thumbnails[:, None] - reference[None, :]).mean(axis=(2, 3)).min(axis=1)
+        else:
+            novelty = np.zeros(count, dtype=np.float32)
+
+        score = (
+            self.motion_weight * normalizeScores(motion)
+            + self.histogram_weight * normalizeScores(histogram_distance)
+            + self.novelty_weight * normalizeScores(novelty)
+        )
+        return score, pairwise
+
+    def select(self, frames: list[CapturedFrame], k: int) -> list[CapturedFrame]:
+        # Devuelve los frames de los k momentos elegidos, en orden temporal y con el índice renumerado.
+        moments = sorted({frame.index for frame in frames})
+        if k <= 0 or len(moments) <= k:
+            return frames
+
+        with KEYFRAME_SELECTION_SECONDS.time():
+            position = {index: offset for offset, index in enumerate(moments)}
+            score = np.zeros(len(moments), dtype=np.float32)
+            pairwise = np.zeros((len(moments), len(moments)), dtype=np.float32)
+
+            # en multi_source cada momento tiene un frame por fuente: se puntúa cada fuente y se promedia
+            by_source: dict[str, list[CapturedFrame]] = {}
+            for frame in frames:
+                by_source.setdefault(frame.source_name, []).append(frame)
+
+            for source_name, source_frames in by_source.items():
+                source_frames.sort(key=lambda frame: frame.index)
+                offsets = np.array([position[frame.index] for frame in source_frames])
+                thumbnails = np.stack([computeThumbnail(frame) for frame in source_frames])
+                source_score, source_pairwise = self.scoreSource(thumbnails, source_name)
+                score[offsets] += source_score / len(by_source)
+                pairwise[np.ix_(offsets, offsets)] += source_pairwise / len(by_source)
+
+            chosen = self.pickDiverse(score, pairwise, k)
+
+        chosen_indexes = [moments[offset] for offset in sorted(chosen)]
+        renumber = {index: new_index for new_index, index in enumerate(chosen_indexes)}
+        selected = [
+            dataclasses.replace(frame, index=renumber[frame.index])
+            for frame in frames
+            if frame.index in renumber
+        ]
+
+        self.cycles_selected += 1
+        self.frames_considered += len(frames)
+        self.frames_selected += len(selected)
+
+        if isDebugEnabled():
+            ranking = ", ".join(f"{moments[offset]}:{score[offset]:.2f}" for offset in range(len(moments)))
+            print(f"\t- Keyframes elegidos: {chosen_indexes} de {len(moments)} momentos (puntajes {ranking})")
+
+        return selected
+
+    def pickDiverse(self, score: np.ndarray, pairwise: np.ndarray, k: int) -> list[int]:
+        # Selección voraz: el mejor puntaje primero y luego se premia alejarse de los ya elegidos,
+        # para no mandar dos frames contiguos del mismo pico de movimiento.
+        spread = float(pairwise.max())
+        chosen = [int(np.argmax(score))]
+        while len(chosen) < k:
+            distance = pairwise[:, chosen].min(axis=1)
+            gain = score + (distance / spread if spread > 0 else 0.0)
+            gain[chosen] = -np.inf
+            chosen.append(int(np.argmax(gain)))
+        return chosen
+
+    def recordReaction(self, frames: list[CapturedFrame]):
+        # Guarda las miniaturas de los frames de una reacción que el avatar llegó a decir como referencia de novedad.
+        thumbnails = [(frame.source_name, computeThumbnail(frame)) for frame in frames]
+        with self._lock:
+            for source_name, thumbnail in thumbnails:
+                history = self._reaction_thumbnails.setdefault(source_name, deque(maxlen=self._history_size))
+                history.append(thumbnail)
+
+    def summary(self) -> str:
+        return f"keyframes {self.frames_selected}/{self.frames_considered} frames en {self.cycles_selected} ciclos"
+
+
+def createKeyframeSelector() -> KeyframeSelector | None:
+    # Construye el selector desde config.app; None si app.keyframe_selection está desactivado.
+    app_config = getConfig().app
+    if not app_config.keyframe_selection:
+        return None
+
+    return KeyframeSelector(
+        candidates=app_config.keyframe_candidates,
+        motion_weight=app_config.keyframe_motion_weight,
+        histogram_weight=app_config.keyframe_histogram_weight,
+        novelty_weight=app_config.keyframe_novelty_weight,
+    )
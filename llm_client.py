@@ -1,14 +1,22 @@
 import json
-import base64
+import re
+import struct
+import threading
+import time
+import zlib
 from datetime import datetime
-from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from config_loader import getConfigManager
-from capture_obs_frame import isDebugEnabled
+from config_loader import bindCurrentStream, getConfig, getConfigManager, getCurrentStream
+from capture_obs_frame import CapturedFrame, isDebugEnabled, reportPromptEvalTiming
+from inference_scheduler import ReactionExpired, ReactionRequest, getInferenceScheduler
+from llm_log import getLlmLogWriter, hashPrompt
+from metrics import ERRORS_TOTAL, IMAGE_ENCODING_SECONDS, OLLAMA_PHASE_SECONDS, OLLAMA_REQUEST_SECONDS
 
-_model_name_cache: str | None = None  # cache interno del nombre de modelo
+_model_name_cache: dict[str | None, str] = {}  # último modelo usado por cada stream (None = un solo stream)
+_ollama_client = None  # instancia global única del cliente persistente de Ollama
 
 
 def getOllamaUrl() -> str:
@@ -19,17 +27,15 @@ def getOllamaUrl() -> str:
 
 
 def resolveAndCacheModel() -> str:
-    # Resuelve el modelo desde config.llm.model_name y lo cachea para toda la ejecución.
-    global _model_name_cache
+    # Resuelve el modelo desde config.llm.model_name del stream actual; avisa cuando cambia por una recarga.
+    stream_name = getCurrentStream()
+    model_name = getConfig().llm.model_name
+    if _model_name_cache.get(stream_name) == model_name:
+        return model_name
 
-    if _model_name_cache is not None:
-        return _model_name_cache
-
-    config_manager = getConfigManager()
-    llm_config = config_manager.getSection("llm")
-
-    model_name = llm_config["model_name"]
-    _model_name_cache = model_name
+    _model_name_cache[stream_name] = model_name
+    if _ollama_client is not None and stream_name is None:
+        _ollama_client.model_name = model_name
 
     if isDebugEnabled():
         print(f"[i] Usando modelo LLM: {model_name}")
@@ -37,82 +43,466 @@ def resolveAndCacheModel() -> str:
     return model_name
 
 
-def encodeImagesAsBase64(image_paths: list[str]) -> list[str]:
-    # Convierte una lista de rutas de imágenes en una lista de strings base64.
+def encodeImagesAsBase64(frames: list[CapturedFrame]) -> list[str]:
+    # Convierte una lista de frames en memoria en una lista de strings base64.
     images_b64: list[str] = []
 
-    for path in image_paths:
-        img_path = Path(path)
-        if not img_path.exists():
-            if isDebugEnabled():
-                print(f"[!] La imagen no existe y se omite del request: {img_path}")
-            continue
+    with IMAGE_ENCODING_SECONDS.time(step="payload"):
+        for frame in frames:
+            if not frame.data:
+                if isDebugEnabled():
+                    print(f"[!] Frame vacío omitido del request: {frame.source_name} #{frame.index}")
+                continue
 
-        with img_path.open("rb") as file:
-            img_bytes = file.read()
-
-        img_b64 = base64.b64encode(img_bytes).decode("utf-8")
-        images_b64.append(img_b64)
+            images_b64.append(frame.toBase64())
 
     return images_b64
 
 
-def callOllamaGenerate(model_name: str, prompt: str, image_paths: list[str]) -> str:
-    # Llama a Ollama /api/generate con soporte opcional de imágenes.
-    url = f"{getOllamaUrl()}/api/generate"
+def buildDummyPng(size: int = 32) -> bytes:
+    # Genera un PNG negro mínimo (sin PIL) para las peticiones de calentamiento del modelo de visión.
+    def chunk(tag: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF)
 
-    config_manager = getConfigManager()
-    llm_config = config_manager.getSection("llm")
+    header = struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0)  # 8 bits, escala de grises
+    raw_rows = b"".join(b"\x00" + b"\x00" * size for _ in range(size))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw_rows))
+        + chunk(b"IEND", b"")
+    )
 
-    payload = {
-        "model": model_name,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": llm_config["temperature"],
-            "top_p": llm_config["top_p"],
-        },
+
+def parseOllamaTimings(data: dict) -> dict:
+    # Convierte los campos *_duration (nanosegundos) de Ollama a milisegundos para reportar latencias.
+    def toMs(key: str) -> float | None:
+        value = data.get(key)
+        return round(value / 1e6, 1) if isinstance(value, (int, float)) else None
+
+    return {
+        "total_ms": toMs("total_duration"),
+        "load_ms": toMs("load_duration"),
+        "prompt_eval_ms": toMs("prompt_eval_duration"),
+        "prompt_eval_count": data.get("prompt_eval_count"),
+        "eval_ms": toMs("eval_duration"),
+        "eval_count": data.get("eval_count"),
     }
 
-    if image_paths:
-        images_b64 = encodeImagesAsBase64(image_paths)
-        if images_b64:
-            payload["images"] = images_b64
 
-    if isDebugEnabled():
-        print(f"[i] Llamando a Ollama en: {url}")
-        # print(f"[i] Payload: {json.dumps(payload)[:200]}...")
+def recordOllamaTimings(timings: dict):
+    # Registra en métricas las fases que reporta Ollama (carga, evaluación del prompt y generación).
+    for phase in ("load", "prompt_eval", "eval"):
+        value = timings.get(f"{phase}_ms")
+        if value is not None:
+            OLLAMA_PHASE_SECONDS.observe(value / 1000.0, phase=phase)
 
-    try:
-        resp = requests.post(url, json=payload, timeout=600)
-    except requests.exceptions.RequestException as error:
-        msg = (
-            f"[ERROR] Error de red al llamar a Ollama: {error}\n"
-            f"       URL: {url}\n"
-            f"       ¿Está corriendo el contenedor 'ollama-runtime'?"
+
+def formatOllamaTimings(timings: dict) -> str:
+    # Resume los tiempos de Ollama en una línea legible para la consola.
+    def fmt(value):
+        return "?" if value is None else f"{value:.0f}"
+
+    return (
+        f"carga {fmt(timings.get('load_ms'))} ms, "
+        f"prompt {fmt(timings.get('prompt_eval_ms'))} ms ({timings.get('prompt_eval_count')} tokens), "
+        f"generación {fmt(timings.get('eval_ms'))} ms ({timings.get('eval_count')} tokens), "
+        f"total {fmt(timings.get('total_ms'))} ms"
+    )
+
+
+class OllamaHttpError(Exception):
+    # Ollama respondió con un código HTTP distinto de 200.
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"Ollama devolvió HTTP {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+class OllamaClient:
+    # Cliente persistente de Ollama: sesión HTTP con pool, keep_alive, timeouts, reintentos y warm-up.
+
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str,
+        keep_alive: str | int | None = "30m",
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 2,
+        retry_backoff_seconds: float = 1.0,
+        pool_size: int = 4,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # cada hilo (un stream o una etapa) lee los tiempos de su propia llamada
+        self._local = threading.local()
+
+    @property
+    def last_timings(self) -> dict | None:
+        return getattr(self._local, "timings", None)
+
+    @last_timings.setter
+    def last_timings(self, timings: dict | None):
+        self._local.timings = timings
+
+    @property
+    def generate_url(self) -> str:
+        return f"{self.base_url}/api/generate"
+
+    def buildPayload(self, prompt: str, frames: list[CapturedFrame], stream: bool, options: dict,
+                     model_name: str | None = None) -> dict:
+        # Arma el cuerpo del request a /api/generate con opciones de muestreo, keep_alive e imágenes.
+        payload = {
+            "model": model_name or self.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options,
+        }
+
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        if frames:
+            images_b64 = encodeImagesAsBase64(frames)
+            if images_b64:
+                payload["images"] = images_b64
+
+        return payload
+
+    def post(self, payload: dict, stream: bool = False, timeout=None,
+             request: ReactionRequest | None = None) -> requests.Response:
+        # POST a /api/generate con reintentos y backoff exponencial ante fallos de red o HTTP 5xx.
+        # Con request, el timeout de lectura y los reintentos no pasan del plazo de la reacción.
+        attempt = 0
+        while True:
+            delay = self.retry_backoff_seconds * (2 ** attempt)
+            last_attempt = attempt >= self.max_retries
+            if request is not None:
+                remaining = request.remaining()
+                last_attempt = last_attempt or (remaining is not None and remaining <= delay)
+
+            connect_timeout, read_timeout = timeout or self.timeout
+            if request is not None:
+                read_timeout = request.boundTimeout(read_timeout)
+
+            try:
+                resp = self.session.post(
+                    self.generate_url,
+                    json=payload,
+                    timeout=(connect_timeout, read_timeout),
+                    stream=stream,
+                )
+                if resp.status_code < 500 or last_attempt:
+                    return resp
+                resp.close()
+                reason = f"HTTP {resp.status_code}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                if last_attempt:
+                    raise
+                reason = str(error)
+
+            attempt += 1
+            print(f"[!] Fallo al llamar a Ollama ({reason}); reintento {attempt}/{self.max_retries} en {delay:.1f} s")
+            time.sleep(delay)
+
+    def generate(self, prompt: str, frames: list[CapturedFrame], options: dict, model_name: str | None = None) -> str:
+        # Llamada no streaming; devuelve el texto y deja en last_timings los tiempos reportados por Ollama.
+        self.last_timings = None
+        payload = self.buildPayload(prompt, frames, stream=False, options=options, model_name=model_name)
+
+        with OLLAMA_REQUEST_SECONDS.time(mode="generate"):
+            resp = self.post(payload)
+            if resp.status_code != 200:
+                raise OllamaHttpError(resp.status_code, resp.text)
+            data = resp.json()
+
+        self.last_timings = parseOllamaTimings(data)
+        recordOllamaTimings(self.last_timings)
+        return data.get("response", "")
+
+    def stream(self, prompt: str, frames: list[CapturedFrame], options: dict, model_name: str | None = None,
+               request: ReactionRequest | None = None):
+        # Llamada streaming; entrega los fragmentos de texto y al final deja last_timings.
+        # Con request, corta entre fragmentos si la reacción venció o fue reemplazada (cerrar la conexión
+        # hace que Ollama deje de generar).
+        self.last_timings = None
+        payload = self.buildPayload(prompt, frames, stream=True, options=options, model_name=model_name)
+        start = time.perf_counter()
+        resp = self.post(payload, stream=True, request=request)
+
+        with resp:
+            if resp.status_code != 200:
+                raise OllamaHttpError(resp.status_code, resp.text)
+
+            for line in resp.iter_lines(decode_unicode=True):
+                if request is not None:
+                    request.check()
+                if not line:
+                    continue
+
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"[!] Línea del stream de Ollama no es JSON válido: {line[:200]}")
+                    continue
+
+                if chunk.get("error"):
+                    print(f"[!] Ollama reportó un error en el stream: {chunk['error']}")
+                    break
+
+                token = chunk.get("response", "")
+                if token:
+                    yield token
+
+                if chunk.get("done"):
+                    OLLAMA_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream")
+                    self.last_timings = parseOllamaTimings(chunk)
+                    recordOllamaTimings(self.last_timings)
+                    break
+
+    def warmUp(self) -> dict | None:
+        # Fuerza la carga del modelo del stream actual (con una imagen dummy para cargar también el encoder de visión).
+        model_name = resolveAndCacheModel()
+        dummy = CapturedFrame(
+            data=buildDummyPng(),
+            image_format="png",
+            source_name="warmup",
+            timestamp=time.time(),
+            width=32,
+            height=32,
         )
-        print(msg)
-        return msg
+        payload = self.buildPayload("ok", [dummy], stream=False, options={"num_predict": 1}, model_name=model_name)
+
+        start = time.time()
+        try:
+            resp = self.post(payload)
+        except requests.exceptions.RequestException as error:
+            print(f"[!] No se pudo precalentar el modelo {model_name}: {error}")
+            return None
+
+        if resp.status_code != 200:
+            print(f"[!] Warm-up de Ollama devolvió HTTP {resp.status_code}: {resp.text[:200]}")
+            return None
+
+        timings = parseOllamaTimings(resp.json())
+        print(f"[i] Modelo {model_name} precalentado en {time.time() - start:.2f} s ({formatOllamaTimings(timings)})")
+        return timings
+
+    def warmUpAsync(self):
+        # Lanza el warm-up en segundo plano (por ejemplo durante el cooldown).
+        thread = threading.Thread(target=bindCurrentStream(self.warmUp), name="ollama-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self.session.close()
+
+
+def getOllamaClient() -> OllamaClient:
+    # Devuelve la instancia única de OllamaClient construida desde OLLAMA_URL y config.llm.
+    global _ollama_client
+    if _ollama_client is not None:
+        return _ollama_client
+
+    llm_config = getConfig().llm
+
+    _ollama_client = OllamaClient(
+        base_url=getOllamaUrl(),
+        model_name=resolveAndCacheModel(),
+        keep_alive=llm_config.keep_alive,
+        connect_timeout=llm_config.connect_timeout_seconds,
+        read_timeout=llm_config.read_timeout_seconds,
+        max_retries=llm_config.max_retries,
+        retry_backoff_seconds=llm_config.retry_backoff_seconds,
+    )
+    return _ollama_client
 
-    if resp.status_code != 200:
-        print(f"[!] Ollama devolvió código HTTP {resp.status_code}")
-        print("---- Cuerpo de la respuesta (máx 2000 chars) ----")
-        print(resp.text[:2000])
-        print("-------------------------------------------------")
-        return f"[ERROR] Ollama devolvió HTTP {resp.status_code}. Revisa logs."
+
+def getSamplingOptions() -> dict:
+    # Opciones de muestreo del modelo leídas de config.llm.
+    llm_config = getConfig().llm
+    return {
+        "temperature": llm_config.temperature,
+        "top_p": llm_config.top_p,
+    }
+
+
+def printOllamaHttpError(error: OllamaHttpError):
+    # Muestra en consola el código y el cuerpo de una respuesta HTTP fallida de Ollama.
+    ERRORS_TOTAL.inc(stage="llm")
+    print(f"[!] Ollama devolvió código HTTP {error.status_code}")
+    print("---- Cuerpo de la respuesta (máx 2000 chars) ----")
+    print(error.body[:2000])
+    print("-------------------------------------------------")
+
+
+def networkErrorMessage(error: Exception, url: str) -> str:
+    # Arma (e imprime) el mensaje de error de red que se devuelve en lugar de la reacción.
+    ERRORS_TOTAL.inc(stage="llm")
+    msg = (
+        f"[ERROR] Error de red al llamar a Ollama: {error}\n"
+        f"       URL: {url}\n"
+        f"       ¿Está corriendo el contenedor 'ollama-runtime'?"
+    )
+    print(msg)
+    return msg
+
+
+def getRequestOptions(request: ReactionRequest | None, temperature: float | None = None) -> dict:
+    # Opciones de muestreo de config.llm más los ajustes propios de la petición (reintento corto, regeneración).
+    options = getSamplingOptions()
+    if temperature is not None:
+        options["temperature"] = temperature
+    if request is not None and request.max_tokens:
+        options["num_predict"] = request.max_tokens
+    return options
+
+
+def raiseIfDeadlineHit(request: ReactionRequest | None, error: Exception):
+    # Un timeout de red al borde del plazo es un plazo vencido, no un error de red que haya que decir.
+    if request is None:
+        return
+    request.check()
+    remaining = request.remaining()
+    if remaining is not None and remaining < 1.0:
+        raise ReactionExpired("deadline", request.age()) from error
+
+
+def callOllamaGenerate(model_name: str, prompt: str, frames: list[CapturedFrame],
+                       request: ReactionRequest | None = None, temperature: float | None = None) -> str:
+    # Llama a Ollama /api/generate con soporte opcional de imágenes usando el cliente persistente.
+    # Con request lanza ReactionExpired si la reacción vence o es reemplazada antes de terminar.
+    client = getOllamaClient()
+
+    if isDebugEnabled():
+        print(f"[i] Llamando a Ollama en: {client.generate_url}")
 
     try:
-        data = resp.json()
+        # el turno se pide al planificador compartido: con varios streams la GPU se reparte entre ellos
+        with getInferenceScheduler().slot(request):
+            options = getRequestOptions(request, temperature)
+            if request is None:
+                response = client.generate(prompt, frames, options, model_name)
+            else:
+                # con plazo se consume en streaming para poder cortar la generación entre tokens
+                response = "".join(client.stream(prompt, frames, options, model_name, request))
+    except requests.exceptions.RequestException as error:
+        raiseIfDeadlineHit(request, error)
+        return networkErrorMessage(error, client.generate_url)
+    except OllamaHttpError as error:
+        printOllamaHttpError(error)
+        return f"[ERROR] Ollama devolvió HTTP {error.status_code}. Revisa logs."
     except json.JSONDecodeError:
-        print("[!] No se pudo parsear la respuesta de Ollama como JSON:")
-        print(resp.text[:2000])
+        ERRORS_TOTAL.inc(stage="llm")
+        print("[!] No se pudo parsear la respuesta de Ollama como JSON.")
         return "[ERROR] Respuesta de Ollama no es JSON válido."
 
-    return data.get("response", "")
+    if isDebugEnabled() and client.last_timings:
+        print(f"[i] Tiempos de Ollama: {formatOllamaTimings(client.last_timings)}")
+
+    return response
+
 
+def streamOllamaGenerate(model_name: str, prompt: str, frames: list[CapturedFrame],
+                         request: ReactionRequest | None = None):
+    # Llama a Ollama /api/generate en modo streaming y va entregando los fragmentos de texto (NDJSON).
+    client = getOllamaClient()
+
+    if isDebugEnabled():
+        print(f"[i] Llamando a Ollama (streaming) en: {client.generate_url}")
+
+    try:
+        # el turno se mantiene mientras dura el stream de tokens
+        with getInferenceScheduler().slot(request):
+            yield from client.stream(prompt, frames, getRequestOptions(request), model_name, request)
+    except requests.exceptions.RequestException as error:
+        raiseIfDeadlineHit(request, error)
+        yield networkErrorMessage(error, client.generate_url)
+        return
+    except OllamaHttpError as error:
+        printOllamaHttpError(error)
+        yield f"[ERROR] Ollama devolvió HTTP {error.status_code}. Revisa logs."
+        return
+
+    if isDebugEnabled() and client.last_timings:
+        print(f"[i] Tiempos de Ollama: {formatOllamaTimings(client.last_timings)}")
+
+
+class SentenceSplitter:
+    # Acumula fragmentos de texto del stream y los corta en frases completas.
+    _boundary = re.compile(r"[.!?…]+[\"'”»)]*\s+|\n+")
+
+    def __init__(self, min_chars: int = 12):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, token: str) -> list[str]:
+        # Agrega texto y devuelve las frases que ya quedaron cerradas.
+        self._buffer += token
+        sentences: list[str] = []
+
+        search_from = 0
+        while True:
+            match = self._boundary.search(self._buffer, search_from)
+            if match is None:
+                break
+
+            candidate = self._buffer[:match.end()].strip()
+            # frases muy cortas ("XD.", "Bro.") se juntan con la siguiente para no fragmentar el audio
+            if len(candidate) < self.min_chars:
+                search_from = match.end()
+                continue
+
+            sentences.append(candidate)
+            self._buffer = self._buffer[match.end():]
+            search_from = 0
+
+        return sentences
+
+    def flush(self) -> str | None:
+        # Devuelve lo que quede pendiente al terminar el stream.
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder or None
+
+
+def describeFrameSources(frames: list[CapturedFrame]) -> str:
+    # En capturas de varias fuentes, indica al LLM qué muestra cada imagen (en el orden en que se envían).
+    if not frames or all(frame.label is None for frame in frames):
+        return ""
+
+    several_moments = len({frame.index for frame in frames}) > 1
+    lines = []
+    for position, frame in enumerate(frames, start=1):
+        line = f"{position}) {frame.label or frame.source_name}"
+        if several_moments:
+            line += f" (captura {frame.index + 1})"
+        lines.append(line)
+
+    return (
+        "Recibes imágenes de distintas fuentes del stream tomadas al mismo tiempo en cada captura. "
+        "En orden, corresponden a:\n" + "\n".join(lines)
+    )
+
+
+def buildPrompt(prompt_base: str, history_messages: list[str], frames: list[CapturedFrame] | None = None) -> str:
+    # Construye el prompt final usando el prompt base, las fuentes de las imágenes y el historial reciente.
+    sources_block = describeFrameSources(frames or [])
+    if sources_block:
+        prompt_base = f"{prompt_base.strip()}\n\n{sources_block}"
 
-def buildPrompt(prompt_base: str, history_messages: list[str]) -> str:
-    # Construye el prompt final usando el prompt base y el historial reciente del avatar.
     if not history_messages:
         return prompt_base
 
@@ -133,49 +523,118 @@ def buildPrompt(prompt_base: str, history_messages: list[str]) -> str:
 def appendLlmLog(
     log_file: str,
     model_name: str,
-    prompt: str,
-    image_paths: list[str],
+    prompt_base: str,
+    history_messages: list[str],
+    frames: list[CapturedFrame],
     response: str,
+    timings: dict | None = None,
+    wall_ms: float | None = None,
 ) -> None:
-    # Escribe un registro JSONL con la llamada al LLM (timestamp, modelo, imágenes, prompt, respuesta).
+    # Encola un registro JSONL de la llamada al LLM; el prompt base se guarda una vez y se referencia por hash.
     entry = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "model": model_name,
-        "images": [str(path) for path in image_paths],
-        "prompt": prompt,
+        "images": [frame.describe() for frame in frames],
+        "prompt_hash": hashPrompt(prompt_base),
+        "history": history_messages[-6:] if history_messages else [],
         "response": response,
+        "wall_ms": round(wall_ms, 1) if wall_ms is not None else None,
+        "timings": timings,
     }
 
-    log_path = Path(log_file)
-    log_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with log_path.open("a", encoding="utf-8") as file:
-        file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    getLlmLogWriter(log_file).log(entry, prompt_base)
 
 
 def runLlm(
     prompt_base: str,
-    images_paths: list[str],
+    frames: list[CapturedFrame],
     history_messages: list[str],
     log_file: str,
+    request: ReactionRequest | None = None,
+    temperature: float | None = None,
 ) -> str:
     # Punto de entrada desde el pipeline para invocar al LLM con imágenes, historial y logging.
+    # Con request puede lanzar ReactionExpired (plazo vencido o reacción reemplazada);
+    # temperature reemplaza a llm.temperature solo en esta llamada (regenerar una respuesta repetida).
     model_name = resolveAndCacheModel()
-    full_prompt = buildPrompt(prompt_base, history_messages)
+    full_prompt = buildPrompt(prompt_base, history_messages, frames)
 
+    started = time.perf_counter()
     response = callOllamaGenerate(
         model_name=model_name,
         prompt=full_prompt,
-        image_paths=images_paths,
+        frames=frames,
+        request=request,
+        temperature=temperature,
     )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    # el modo de resolución adaptativa se ajusta con el prompt-eval de esta llamada
+    reportPromptEvalTiming(getOllamaClient().last_timings)
+
+    try:
+        appendLlmLog(
+            log_file=log_file,
+            model_name=model_name,
+            prompt_base=prompt_base,
+            history_messages=history_messages,
+            frames=frames,
+            response=response,
+            timings=getOllamaClient().last_timings,
+            wall_ms=wall_ms,
+        )
+    except Exception as error:
+        print(f"[!] Error al escribir en el log de LLM: {error}")
+
+    return response
+
+
+def runLlmStreaming(
+    prompt_base: str,
+    frames: list[CapturedFrame],
+    history_messages: list[str],
+    log_file: str,
+    on_sentence,
+    request: ReactionRequest | None = None,
+) -> str:
+    # Igual que runLlm pero en streaming: llama a on_sentence con cada frase completa apenas se cierra.
+    model_name = resolveAndCacheModel()
+    full_prompt = buildPrompt(prompt_base, history_messages, frames)
+
+    splitter = SentenceSplitter(getConfig().llm.stream_min_sentence_chars)
+
+    started = time.perf_counter()
+    parts: list[str] = []
+    try:
+        for token in streamOllamaGenerate(model_name=model_name, prompt=full_prompt, frames=frames, request=request):
+            parts.append(token)
+            for sentence in splitter.feed(token):
+                on_sentence(sentence)
+    except ReactionExpired as expired:
+        # las frases ya entregadas se dicen igual; la política de plazo no debe repetir la reacción
+        expired.partial_text = "".join(parts).strip()
+        raise
+
+    remainder = splitter.flush()
+    if remainder:
+        on_sentence(remainder)
+
+    response = "".join(parts).strip()
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    # el modo de resolución adaptativa se ajusta con el prompt-eval de esta llamada
+    reportPromptEvalTiming(getOllamaClient().last_timings)
 
     try:
         appendLlmLog(
             log_file=log_file,
             model_name=model_name,
-            prompt=full_prompt,
-            image_paths=images_paths,
+            prompt_base=prompt_base,
+            history_messages=history_messages,
+            frames=frames,
             response=response,
+            timings=getOllamaClient().last_timings,
+            wall_ms=wall_ms,
         )
     except Exception as error:
         print(f"[!] Error al escribir en el log de LLM: {error}")
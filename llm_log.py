@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from capture_obs_frame import isDebugEnabled
+from config_loader import bindCurrentStream, getConfig
+from metrics import ERRORS_TOTAL
+
+_llm_log_writers = {}  # writer del log de LLM por archivo (uno por stream en modo multi-stream)
+_writers_lock = threading.Lock()
+
+_STOP = object()  # marca de cierre para el hilo escritor
+
+
+def hashPrompt(prompt: str) -> str:
+    # Hash corto y estable del prompt, usado como referencia dentro del log.
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class LlmLogWriter:
+    # Escribe el log JSONL de llamadas al LLM desde un hilo de fondo, con rotación y prompts deduplicados.
+
+    def __init__(
+        self,
+        log_file: str,
+        max_bytes: int = 20 * 1024 * 1024,
+        rotate_seconds: float | None = 24 * 3600,
+        compress: bool = True,
+        backups: int = 10,
+        queue_size: int = 256,
+        flush_interval_seconds: float = 1.0,
+    ):
+        self.log_file = log_file
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self.rotate_seconds = rotate_seconds if rotate_seconds and rotate_seconds > 0 else None
+        self.compress = compress
+        self.backups = backups
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self.written = 0
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._opened_at = 0.0
+        self._prompts_in_file: set[str] = set()
+
+        self._thread = threading.Thread(target=bindCurrentStream(self._run), name="llm-log", daemon=True)
+        self._thread.start()
+
+    def log(self, entry: dict, prompt_base: str | None = None):
+        # Encola una entrada sin bloquear; si la cola está llena se descarta (nunca frena al pipeline).
+        try:
+            self._queue.put_nowait((entry, prompt_base))
+        except queue.Full:
+            self.dropped += 1
+            if isDebugEnabled():
+                print(f"[!] Cola del log de LLM llena: entrada descartada ({self.dropped} en total)")
+
+    def close(self, timeout: float = 5.0):
+        # Vacía la cola pendiente y cierra el archivo.
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        self._file = open(self.log_file, "a", encoding="utf-8")
+        self._prompts_in_file = set()
+
+        # al abrir un archivo existente se usa su antigüedad real para la rotación por tiempo
+        try:
+            self._opened_at = os.path.getmtime(self.log_file) if self._file.tell() > 0 else time.time()
+        except OSError:
+            self._opened_at = time.time()
+
+    def _shouldRotate(self) -> bool:
+        if self._file is None:
+            return False
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        if self.rotate_seconds and self._file.tell() > 0 and time.time() - self._opened_at >= self.rotate_seconds:
+            return True
+        return False
+
+    def _rotate(self):
+        # Renombra el archivo actual con sello de tiempo, lo comprime si corresponde y poda los más antiguos.
+        self._file.close()
+        self._file = None
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        rotated = f"{self.log_file}.{timestamp}"
+        os.replace(self.log_file, rotated)
+
+        if self.compress:
+            with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated)
+
+        self._pruneBackups()
+        self._open()
+
+    def _pruneBackups(self):
+        if self.backups is None or self.backups < 0:
+            return
+        directory = os.path.dirname(self.log_file) or "."
+        prefix = os.path.basename(self.log_file) + "."
+        rotated = sorted(name for name in os.listdir(directory) if name.startswith(prefix))
+        for name in rotated[:max(0, len(rotated) - self.backups)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def _write(self, entry: dict, prompt_base: str | None):
+        if self._shouldRotate():
+            self._rotate()
+
+        # el prompt base (largo y casi siempre igual) se escribe una sola vez por archivo
+        if prompt_base is not None:
+            prompt_hash = entry.get("prompt_hash") or hashPrompt(prompt_base)
+            if prompt_hash not in self._prompts_in_file:
+                record = {"type": "prompt", "hash": prompt_hash, "text": prompt_base}
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._prompts_in_file.add(prompt_hash)
+
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.written += 1
+
+    def _run(self):
+        self._open()
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_seconds)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                break
+
+            if item is not None:
+                try:
+                    self._write(*item)
+                except Exception as error:
+                    ERRORS_TOTAL.inc(stage="llm_log")
+                    print(f"[!] Error al escribir en el log de LLM: {error}")
+
+            # se agrupan las escrituras y se hace flush como mucho una vez por intervalo
+            if self._queue.empty() or time.monotonic() - last_flush >= self.flush_interval_seconds:
+                try:
+                    if self._file is not None:
+                        self._file.flush()
+                except Exception:
+                    pass
+                last_flush = time.monotonic()
+
+        # vaciar lo que quede pendiente antes de cerrar
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                try:
+                    self._write(*item)
+                except Exception as error:
+                    print(f"[!] Error al escribir en el log de LLM: {error}")
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def getLlmLogWriter(log_file: str) -> LlmLogWriter:
+    # Devuelve el writer del log de LLM de ese archivo (uno por archivo) configurado en config.app.
+    with _writers_lock:
+        writer = _llm_log_writers.get(log_file)
+        if writer is not None:
+            return writer
+
+        app_config = getConfig().app
+        writer = LlmLogWriter(
+            log_file=log_file,
+            max_bytes=int(app_config.llm_log_max_mb * 1024 * 1024),
+            rotate_seconds=app_config.llm_log_rotate_hours * 3600,
+            compress=app_config.llm_log_compress,
+            backups=app_config.llm_log_backups,
+        )
+        _llm_log_writers[log_file] = writer
+        return writer
+
+
+def closeLlmLogWriter():
+    # Vacía y cierra los writers al apagar el servicio.
+    with _writers_lock:
+        for writer in _llm_log_writers.values():
+            writer.close()
+        _llm_log_writers.clear()
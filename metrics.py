@@ -0,0 +1,261 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# buckets en segundos pensados para latencias entre milisegundos (OBS) y decenas de segundos (carga del modelo)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = None  # instancia global única del registro de métricas
+
+
+def labelKey(labels: dict) -> tuple:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def escapeLabelValue(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def formatLabels(key: tuple, extra: tuple = ()) -> str:
+    # Formatea etiquetas al estilo Prometheus: {a="1",b="2"}.
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escapeLabelValue(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    # Contador monotónico con etiquetas opcionales.
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = labelKey(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(labelKey(labels), 0.0)
+
+    def snapshot(self) -> dict[str, float]:
+        # Valor de cada combinación de etiquetas ("reason=stale,stage=llm"), para reportes.
+        with self._lock:
+            return {",".join(f"{k}={v}" for k, v in key): value for key, value in sorted(self._values.items())}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{formatLabels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    # Valor instantáneo que puede subir o bajar.
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[labelKey(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = labelKey(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(labelKey(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{formatLabels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    # Histograma acumulativo con buckets fijos (en segundos) compatible con Prometheus.
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = labelKey(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        # Mide la duración del bloque y la registra al salir (también si hubo excepción).
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(labelKey(labels))
+            return series["count"] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{formatLabels(key, (('le', repr(float(bound))),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{formatLabels(key, (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{formatLabels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{formatLabels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    # Registro central de métricas del proceso; cada métrica se crea una sola vez por nombre.
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _getOrCreate(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise TypeError(f"La métrica {name} ya existe con otro tipo")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._getOrCreate(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._getOrCreate(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._getOrCreate(Histogram, name, help_text, buckets=buckets)
+
+    def renderPrometheus(self) -> str:
+        # Devuelve todas las métricas en formato de exposición de texto de Prometheus.
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def getMetricsRegistry() -> MetricsRegistry:
+    # Devuelve la instancia singleton del registro de métricas.
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+# métricas del pipeline, compartidas por todos los módulos
+OBS_SCREENSHOT_SECONDS = getMetricsRegistry().histogram(
+    "avatar_obs_screenshot_seconds", "Ida y vuelta de GetSourceScreenshot contra OBS"
+)
+IMAGE_ENCODING_SECONDS = getMetricsRegistry().histogram(
+    "avatar_image_encoding_seconds", "Decodificación/re-codificación de frames y armado del base64"
+)
+OLLAMA_REQUEST_SECONDS = getMetricsRegistry().histogram(
+    "avatar_ollama_request_seconds", "Duración total (reloj de pared) de la petición a Ollama"
+)
+OLLAMA_PHASE_SECONDS = getMetricsRegistry().histogram(
+    "avatar_ollama_phase_seconds", "Duración reportada por Ollama por fase (load, prompt_eval, eval)"
+)
+STARTUP_STEP_SECONDS = getMetricsRegistry().gauge(
+    "avatar_startup_step_seconds", "Duración de cada paso del arranque de un stream"
+)
+STARTUP_READY = getMetricsRegistry().gauge(
+    "avatar_startup_ready", "1 cuando el stream terminó de arrancar (aunque falle un paso opcional)"
+)
+FRAME_PREPROCESS_TOTAL = getMetricsRegistry().counter(
+    "avatar_frame_preprocess_total", "Frames preprocesados por modo (pool de procesos, en el hilo de captura o de respaldo)"
+)
+KEYFRAME_SELECTION_SECONDS = getMetricsRegistry().histogram(
+    "avatar_keyframe_selection_seconds", "Puntuación y elección de keyframes entre los frames candidatos"
+)
+FRAME_BUFFER_STEPS = getMetricsRegistry().gauge(
+    "avatar_frame_buffer_steps", "Capturas disponibles en el buffer circular de la captura en segundo plano"
+)
+INFERENCE_WAIT_SECONDS = getMetricsRegistry().histogram(
+    "avatar_inference_wait_seconds", "Espera de turno en el planificador de Ollama, por stream"
+)
+INFERENCE_BUSY_SECONDS_TOTAL = getMetricsRegistry().counter(
+    "avatar_inference_busy_seconds_total", "Tiempo de Ollama consumido por cada stream"
+)
+INFERENCE_REJECTED_TOTAL = getMetricsRegistry().counter(
+    "avatar_inference_rejected_total", "Llamadas al LLM rechazadas por la cuota del stream, por motivo (rate, timeout)"
+)
+RESPONSE_CHECKS_TOTAL = getMetricsRegistry().counter(
+    "avatar_response_checks_total", "Respuestas del LLM comparadas con las recientes, por resultado (unique, duplicate)"
+)
+RESPONSE_REGENERATE_SECONDS_TOTAL = getMetricsRegistry().counter(
+    "avatar_response_regenerate_seconds_total", "Tiempo gastado regenerando respuestas repetidas"
+)
+TTS_SYNTHESIS_SECONDS = getMetricsRegistry().histogram(
+    "avatar_tts_synthesis_seconds", "Duración de la síntesis de voz en Fish Audio"
+)
+AUDIO_FIRST_CHUNK_SECONDS = getMetricsRegistry().histogram(
+    "avatar_audio_first_chunk_seconds", "Desde que se publica un audio por HTTP hasta su primer fragmento"
+)
+TTS_FILE_WRITE_SECONDS = getMetricsRegistry().histogram(
+    "avatar_tts_file_write_seconds", "Escritura del archivo de audio generado"
+)
+AUDIO_SPOOL_BYTES = getMetricsRegistry().gauge(
+    "avatar_audio_spool_bytes", "Bytes de audio en el spool del reproductor por archivos, por stream"
+)
+AUDIO_SPOOL_EVICTIONS_TOTAL = getMetricsRegistry().counter(
+    "avatar_audio_spool_evictions_total", "Audios borrados del spool por superar tts.spool_max_files o spool_max_mb"
+)
+TTS_CACHE_TOTAL = getMetricsRegistry().counter(
+    "avatar_tts_cache_total", "Consultas a la caché de audio TTS, por resultado (hit, miss)"
+)
+OBS_CONNECTED = getMetricsRegistry().gauge(
+    "avatar_obs_connected", "1 mientras la conexión con OBS del stream está activa, 0 durante un corte"
+)
+OBS_OUTAGE_SECONDS = getMetricsRegistry().histogram(
+    "avatar_obs_outage_seconds", "Duración de cada corte de la conexión con OBS hasta reconectar",
+    buckets=(1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+)
+OBS_SCENE_CHANGES_TOTAL = getMetricsRegistry().counter(
+    "avatar_obs_scene_changes_total", "Cambios de escena de programa recibidos por eventos de OBS"
+)
+CYCLES_TOTAL = getMetricsRegistry().counter(
+    "avatar_cycles_total", "Ciclos del pipeline ejecutados, por tipo (silent, speak)"
+)
+SKIPPED_CYCLES_TOTAL = getMetricsRegistry().counter(
+    "avatar_skipped_cycles_total", "Intervenciones omitidas, por motivo"
+)
+ERRORS_TOTAL = getMetricsRegistry().counter(
+    "avatar_errors_total", "Errores por etapa del pipeline"
+)
@@ -1,5 +1,5 @@
 import os
-from config_loader import getConfigManager
+from config_loader import getConfig, getConfigManager
 
 
 def getAppPaths():
@@ -12,6 +12,7 @@ def getAppPaths():
     frames_dir = os.path.join(base_dir, app_cfg["frames_subdir"])
     history_dir = os.path.join(base_dir, app_cfg["history_subdir"])
     audio_dir = os.path.join(base_dir, app_cfg["audio_subdir"])
+    tts_cache_dir = os.path.join(base_dir, app_cfg.get("tts_cache_subdir", "tts_cache"))
     history_file = os.path.join(history_dir, app_cfg["history_file"])
 
     logs_dir = os.path.join(base_dir, app_cfg["logs_subdir"])
@@ -20,6 +21,7 @@ def getAppPaths():
     os.makedirs(frames_dir, exist_ok=True)
     os.makedirs(history_dir, exist_ok=True)
     os.makedirs(audio_dir, exist_ok=True)
+    os.makedirs(tts_cache_dir, exist_ok=True)
     os.makedirs(logs_dir, exist_ok=True)
 
     return {
@@ -27,31 +29,51 @@ def getAppPaths():
         "history_dir": history_dir,
         "history_file": history_file,
         "audio_dir": audio_dir,
+        "tts_cache_dir": tts_cache_dir,
         "logs_dir": logs_dir,
         "llm_log_file": llm_log_file,
     }
 
 
 def getAppParams():
-    # Devuelve parámetros de runtime del pipeline y del LLM leídos desde config.yaml.
-    config_manager = getConfigManager()
-    app_cfg = config_manager.getSection("app")
-    llm_cfg = config_manager.getSection("llm")
+    # Devuelve parámetros de runtime del pipeline y del LLM del snapshot vigente de config.yaml.
+    config = getConfig()
+    app_cfg = config.app
+    llm_cfg = config.llm
 
     return {
-        "frames_per_cycle": app_cfg["frames_per_cycle"],
-        "capture_interval_seconds": app_cfg["capture_interval_seconds"],
+        "frames_per_cycle": app_cfg.frames_per_cycle,
+        "capture_interval_seconds": app_cfg.capture_interval_seconds,
 
         # control de historial
-        "max_history_messages": app_cfg["max_history_messages"],
-        "history_enabled": app_cfg["history_enabled"],
-        "history_persist_file": app_cfg["history_persist_file"],
+        "max_history_messages": app_cfg.max_history_messages,
+        "history_enabled": app_cfg.history_enabled,
+        "history_persist_file": app_cfg.history_persist_file,
 
-        "min_speak_cycles": app_cfg["min_speak_cycles"],
-        "max_speak_cycles": app_cfg["max_speak_cycles"],
+        "min_speak_cycles": app_cfg.min_speak_cycles,
+        "max_speak_cycles": app_cfg.max_speak_cycles,
 
         # parámetros del LLM
-        "prompt_base": llm_cfg["prompt_base"],
-        "llm_temperature": llm_cfg["temperature"],
-        "llm_top_p": llm_cfg["top_p"],
+        "prompt_base": llm_cfg.prompt_base,
+        "llm_temperature": llm_cfg.temperature,
+        "llm_top_p": llm_cfg.top_p,
+        "llm_stream": llm_cfg.stream,
+        "llm_warmup_on_start": llm_cfg.warmup_on_start,
+        "llm_warmup_during_cooldown": llm_cfg.warmup_during_cooldown,
+        "config_version": config.version,
+    }
+
+
+def getPipelineParams():
+    # Devuelve la configuración de etapas del pipeline (sección opcional pipeline de config.yaml).
+    config_manager = getConfigManager()
+    pipeline_cfg = config_manager.getYaml().get("pipeline") or {}
+
+    mode = pipeline_cfg.get("mode", "sequential")
+    if mode not in ("sequential", "staged"):
+        raise ValueError("pipeline.mode debe ser 'sequential' o 'staged'")
+
+    return {
+        "mode": mode,
+        "raw": pipeline_cfg,
     }
@@ -1,13 +1,40 @@
 import os
 import random
+import threading
 import time
 
-from conn import createObsConnection
-from paths_manager import getAppPaths, getAppParams
-from history_manager import saveHistory
+from app_server import startAppServer
+from config_loader import getConfig, getConfigManager, getCurrentStream, setCurrentStream, startConfigWatcher
+from conn import ObsUnavailable, createObsConnection
+from paths_manager import getAppPaths, getAppParams, getPipelineParams
+from pipeline_stages import StageItem, StageQueue, StageWorker, getStageQueueConfig
+from history_manager import HistoryEntry, closeHistoryStores, getHistoryStore
+from inference_scheduler import (
+    InferenceRejected,
+    ReactionExpired,
+    createReactionRequest,
+    createShortPromptRequest,
+    getInferenceScheduler,
+)
 from capture_obs_frame import captureFrames, isDebugEnabled
-from llm_client import runLlm
-from tts_client import synthesizeAndPlay
+from frame_buffer import startBackgroundCapture, takeCycleFrames
+from frame_source import ObsFrameSource, ReplayFinished
+from frame_preprocess import closeFramePreprocessPool, getFramePreprocessPool
+from frame_similarity import computeDHash, createSceneChangeGate
+from keyframes import createKeyframeSelector
+from response_similarity import createResponseGuard
+from startup import createStartupOrchestrator
+from metrics import CYCLES_TOTAL, ERRORS_TOTAL, RESPONSE_REGENERATE_SECONDS_TOTAL, SKIPPED_CYCLES_TOTAL
+from llm_log import closeLlmLogWriter
+from llm_client import getOllamaClient, runLlm, runLlmStreaming
+from tts_client import (
+    SentenceSpeaker,
+    newReactionId,
+    pickFillerPhrase,
+    prepareTts,
+    synthesizeAndPlay,
+    synthesizeSegment,
+)
 
 
 def sendToTts(text: str, audio_dir: str):
@@ -18,13 +45,533 @@ def sendToTts(text: str, audio_dir: str):
     try:
         synthesizeAndPlay(text, audio_dir)
     except Exception as error:
+        ERRORS_TOTAL.inc(stage="tts")
         print(f"[!] Error al usar TTS: {error}")
 
 
-def runPipeline():
-    # Orquesta el ciclo principal: captura frames, llama al LLM y maneja el historial.
+def runLlmAndSpeakStreaming(prompt_base: str, frames, history_messages: list[str], log_file: str, audio_dir: str,
+                            request=None) -> str:
+    # Genera la reacción en streaming y manda cada frase al TTS apenas se completa.
+    print("\nEnviando respuesta a TTS por frases (streaming):")
+    speaker = SentenceSpeaker(audio_dir)
+
+    def onSentence(sentence: str):
+        print(f"\t- Frase: {sentence[:120]}")
+        speaker.speak(sentence)
+
+    try:
+        return runLlmStreaming(
+            prompt_base=prompt_base,
+            frames=frames,
+            history_messages=history_messages,
+            log_file=log_file,
+            on_sentence=onSentence,
+            request=request,
+        )
+    finally:
+        speaker.finish()
+
+
+def gateCapturedFrames(scene_gate, frames):
+    # Quita frames casi idénticos del ciclo y devuelve None si la escena no cambió lo suficiente para reaccionar.
+    # Solo consulta: la referencia del filtro se actualiza al hablar (ver recordSpokenReaction).
+    frames = scene_gate.dedupeFrames(frames)
+    if not scene_gate.shouldReact(frames):
+        SKIPPED_CYCLES_TOTAL.inc(reason="scene_unchanged")
+        return None
+    return frames
+
+
+def recordSpokenReaction(scene_gate, keyframe_selector, frames):
+    # La reacción a estos frames se dijo: pasan a ser la referencia del filtro de escena y de la novedad del
+    # selector de keyframes. Los ciclos rechazados, vencidos, repetidos o descartados en las colas no cuentan,
+    # así una escena sin respuesta no se salta ni se penaliza.
+    scene_gate.recordReaction(frames)
+    if keyframe_selector is not None:
+        keyframe_selector.recordReaction(frames)
+
+
+def skipRejectedReaction(rejection: InferenceRejected):
+    # El planificador compartido no dio turno al stream (cuota o espera): la reacción se omite sin hablar.
+    SKIPPED_CYCLES_TOTAL.inc(reason=f"inference_{rejection.reason}")
+    print(f"[!] {rejection}; se omite esta intervención")
+
+
+def runLlmAvoidingRepeats(response_guard, prompt_base: str, frames, history_messages: list[str], log_file: str,
+                          request=None) -> str | None:
+    # Genera la reacción y la compara con las recientes antes de gastar TTS: si se repite, la regenera con
+    # más temperatura (hasta repetition_max_regenerations) o la omite devolviendo None.
+    response = runLlm(
+        prompt_base=prompt_base,
+        frames=frames,
+        history_messages=history_messages,
+        log_file=log_file,
+        request=request,
+    )
+
+    attempt = 0
+    while response_guard.isDuplicate(response):
+        if response_guard.policy == "skip" or attempt >= response_guard.max_regenerations:
+            SKIPPED_CYCLES_TOTAL.inc(reason="repeated_response")
+            print("[!] La respuesta repite algo dicho hace poco; se omite esta intervención")
+            return None
+
+        attempt += 1
+        response_guard.regenerations += 1
+        started = time.perf_counter()
+        try:
+            response = runLlm(
+                prompt_base=prompt_base,
+                frames=frames,
+                history_messages=history_messages,
+                log_file=log_file,
+                request=request,
+                temperature=response_guard.regenerateTemperature(attempt),
+            )
+        finally:
+            RESPONSE_REGENERATE_SECONDS_TOTAL.inc(time.perf_counter() - started)
+
+    response_guard.recordResponse(response)
+    return response
+
+
+def recordStreamedResponse(response_guard, response: str):
+    # En streaming las frases ya se dijeron mientras llegaban: la repetición solo se mide y se indexa.
+    response_guard.isDuplicate(response)
+    response_guard.recordResponse(response)
+
+
+def recoverExpiredReaction(expired: ReactionExpired, prompt_base: str, frames, log_file: str) -> str | None:
+    # La reacción venció o fue reemplazada: aplica config.llm.deadline_policy y devuelve el texto a decir
+    # (None = callar). Una reacción reemplazada nunca se recupera: ya viene otra más nueva detrás.
+    SKIPPED_CYCLES_TOTAL.inc(reason=f"llm_{expired.reason}")
+    print(f"[!] {expired}; se descarta la respuesta")
+
+    policy = getConfig().llm.deadline_policy
+    if expired.reason == "superseded" or expired.partial_text or policy == "skip":
+        return None
+
+    if policy == "filler":
+        return pickFillerPhrase()
+
+    # short_prompt: solo el último momento capturado, sin historial y con plazo y tokens propios
+    latest_index = max(frame.index for frame in frames)
+    latest_frames = [frame for frame in frames if frame.index == latest_index]
+    try:
+        return runLlm(
+            prompt_base=prompt_base,
+            frames=latest_frames,
+            history_messages=[],
+            log_file=log_file,
+            request=createShortPromptRequest(),
+        )
+    except (ReactionExpired, InferenceRejected) as error:
+        SKIPPED_CYCLES_TOTAL.inc(reason="llm_short_prompt")
+        print(f"[!] El reintento con prompt corto tampoco llegó a tiempo: {error}")
+        return None
+
+
+def cyclesAfterSkip(scene_gate, nextGap) -> int:
+    # Tras omitir una reacción: reintentar en pocos ciclos (defer) o volver al cooldown normal (skip).
+    if scene_gate.defer_cycles > 0:
+        return scene_gate.defer_cycles
+    return nextGap()
+
+
+def getHistoryForPrompt(history_store, params: dict) -> list[str]:
+    # Si el historial está deshabilitado o max=0, no lo mandamos al prompt.
+    if params["history_enabled"] and params["max_history_messages"] > 0:
+        return history_store.messages()
+    return []
+
+
+def updateHistory(history_store, response: str, params: dict, frames, source=None):
+    # Actualizar historial solo si está habilitado y max_history_messages > 0
+    if not (params["history_enabled"] and params["max_history_messages"] > 0):
+        return
+
+    history_store.applySettings(params["max_history_messages"], params["history_persist_file"])
+    tracker = source.sceneTracker() if source is not None else None
+    history_store.append(HistoryEntry(
+        text=response,
+        timestamp=time.time(),
+        scene=tracker.current_scene if tracker is not None else None,
+        frame_hashes=[f"{computeDHash(frame):016x}" for frame in frames],
+    ))
+
+
+def printCooldown(cycles_until_talk: int, capture_interval_seconds: int, scene_gate=None):
+    # Informa cuántos ciclos faltan para la próxima intervención del avatar.
+    if isDebugEnabled():
+        print(f"\t- Próxima intervención del avatar en ~{cycles_until_talk} ciclos.")
+        if scene_gate is not None:
+            print(f"\t- Filtro de escena: {scene_gate.hitRateSummary()}")
+    else:
+        total_seconds = cycles_until_talk * capture_interval_seconds
+        print(f"\nAvatar en cooldown: hablará de nuevo en {cycles_until_talk} ciclos (~{total_seconds} segundos)\n")
+
+
+def maybeWarmUpDuringCooldown(cycles_until_talk: int, params: dict):
+    # Un ciclo antes de hablar vuelve a tocar el modelo para que no esté descargado al llegar el turno.
+    if params["llm_warmup_during_cooldown"] and cycles_until_talk == 1:
+        if isDebugEnabled():
+            print("\t- Precalentando el modelo antes de la próxima intervención...")
+        getOllamaClient().warmUpAsync()
+
+
+def interruptCooldownOnSceneChange(source, cycles_until_talk: int) -> int:
+    # Si OBS cambió de escena de programa, la próxima intervención pasa a ser este mismo ciclo.
+    obs_config = getConfig().obs
+    tracker = source.sceneTracker()
+    if tracker is None or not obs_config.react_on_scene_change:
+        return cycles_until_talk
+
+    # se consume siempre: un cambio ocurrido justo antes de una intervención ya queda cubierto por ella
+    scene_name = tracker.consumeSceneChange(obs_config.scene_change_min_interval_seconds)
+    if scene_name is None or cycles_until_talk == 0:
+        return cycles_until_talk
+
+    print(f"\n[i] Cambio de escena a '{scene_name}': se interrumpe el cooldown ({cycles_until_talk} ciclos restantes)")
+    return 0
+
+
+def refreshParams(params: dict) -> dict:
+    # Vuelve a leer los parámetros solo si config.yaml se recargó desde la última lectura.
+    if getConfig().version == params["config_version"]:
+        return params
+    return getAppParams()
+
+
+def captureCycleFrames(source, capture_worker, frames_dir: str, frames_per_cycle: int, capture_interval_seconds: float,
+                       keyframe_selector=None):
+    # Con captura en segundo plano los frames salen del buffer al instante; si aún está vacío se captura como siempre.
+    # Con selección de keyframes se capturan más candidatos y se quedan los frames_per_cycle más informativos.
+    capture_count = frames_per_cycle
+    if keyframe_selector is not None:
+        capture_count = max(frames_per_cycle, keyframe_selector.candidates)
+
+    frames = None
+    if capture_worker is not None:
+        frames = takeCycleFrames(capture_worker, frames_dir, capture_count, capture_interval_seconds)
+    if not frames:
+        frames = captureFrames(source, frames_dir, capture_count, capture_interval_seconds)
+
+    if keyframe_selector is not None:
+        frames = keyframe_selector.select(frames, frames_per_cycle)
+    return frames
+
+
+def captureOrSkip(source, capture_worker, frames_dir: str, frames_per_cycle: int, capture_interval_seconds: float,
+                  keyframe_selector, stop_event: threading.Event):
+    # Modo degradado: si OBS está caído el ciclo se omite sin gastar el turno de hablar y se espera a que la
+    # conexión vuelva (como mucho un intervalo); el avatar reacciona en cuanto hay frames de nuevo.
+    # Al terminarse una grabación (replay.py) se detiene el ciclo.
+    try:
+        return captureCycleFrames(source, capture_worker, frames_dir, frames_per_cycle, capture_interval_seconds,
+                                  keyframe_selector)
+    except ObsUnavailable as error:
+        SKIPPED_CYCLES_TOTAL.inc(reason="obs_unavailable")
+        if isDebugEnabled():
+            print(f"\t- Ciclo omitido: {error}")
+        source.waitAvailable(capture_interval_seconds)
+        return None
+    except ReplayFinished as finished:
+        print(f"\n[i] Fin del replay: {finished}")
+        stop_event.set()
+        return None
+
+
+def runSequentialLoop(source, paths: dict, params: dict, nextGap, capture_worker=None, stop_event=None):
+    # Ciclo clásico: captura → LLM → TTS en el mismo hilo, uno detrás de otro.
+    stop_event = stop_event or threading.Event()
+    frames_dir = paths["frames_dir"]
+    history_file = paths["history_file"]
+    audio_dir = paths["audio_dir"]
+    llm_log_file = paths["llm_log_file"]
+
+    history_store = getHistoryStore(history_file)
+    scene_gate = createSceneChangeGate()
+    keyframe_selector = createKeyframeSelector()
+    response_guard = createResponseGuard()
+    cycles_until_talk = 0
+
+    while not stop_event.is_set():
+        # los cambios de config.yaml (prompt, intervalos, muestreo) se aplican al inicio de cada ciclo
+        params = refreshParams(params)
+        frames_per_cycle = params["frames_per_cycle"]
+        capture_interval_seconds = params["capture_interval_seconds"]
+        prompt_base = params["prompt_base"].strip()
+
+        if isDebugEnabled():
+            print("\n======================== NUEVO CICLO ========================")
+
+        cycles_until_talk = interruptCooldownOnSceneChange(source, cycles_until_talk)
+
+        # Mientras está en cooldown, no capturamos frames ni llamamos al LLM.
+        if cycles_until_talk > 0:
+            CYCLES_TOTAL.inc(kind="silent")
+            cycles_until_talk -= 1
+            if isDebugEnabled():
+                print(f"\t- Ciclo silencioso. Faltan {cycles_until_talk} ciclos para hablar de nuevo.")
+            maybeWarmUpDuringCooldown(cycles_until_talk, params)
+            source.wait(capture_interval_seconds, stop_event)
+            continue
+
+        # Toca hablar: capturamos frames del intervalo completo.
+        CYCLES_TOTAL.inc(kind="speak")
+        frames = captureOrSkip(source, capture_worker, frames_dir, frames_per_cycle, capture_interval_seconds,
+                               keyframe_selector, stop_event)
+        if frames is None:
+            continue
+
+        frames = gateCapturedFrames(scene_gate, frames)
+        if frames is None:
+            cycles_until_talk = cyclesAfterSkip(scene_gate, nextGap)
+            continue
+
+        # el plazo se cuenta desde el primer frame: si el LLM tarda demasiado la reacción ya no aplica
+        request = createReactionRequest(frames)
+        try:
+            if params["llm_stream"]:
+                response = runLlmAndSpeakStreaming(
+                    prompt_base,
+                    frames,
+                    getHistoryForPrompt(history_store, params),
+                    llm_log_file,
+                    audio_dir,
+                    request,
+                )
+                recordStreamedResponse(response_guard, response)
+            else:
+                response = runLlmAvoidingRepeats(
+                    response_guard,
+                    prompt_base,
+                    frames,
+                    getHistoryForPrompt(history_store, params),
+                    llm_log_file,
+                    request,
+                )
+                if response is None:
+                    cycles_until_talk = cyclesAfterSkip(scene_gate, nextGap)
+                    continue
+
+                sendToTts(response, audio_dir)
+        except InferenceRejected as rejection:
+            skipRejectedReaction(rejection)
+            cycles_until_talk = cyclesAfterSkip(scene_gate, nextGap)
+            continue
+        except ReactionExpired as expired:
+            recovered = recoverExpiredReaction(expired, prompt_base, frames, llm_log_file)
+            if recovered is None:
+                cycles_until_talk = cyclesAfterSkip(scene_gate, nextGap)
+                continue
+            sendToTts(recovered, audio_dir)
+            response = recovered
+
+        updateHistory(history_store, response, params, frames, source)
+        recordSpokenReaction(scene_gate, keyframe_selector, frames)
+
+        cycles_until_talk = nextGap()
+        printCooldown(cycles_until_talk, capture_interval_seconds, scene_gate)
+
+        del frames
+
+
+def runStagedLoop(source, paths: dict, params: dict, pipeline_params: dict, nextGap, capture_worker=None,
+                  stop_event=None):
+    # Pipeline por etapas: la captura sigue en este hilo mientras el LLM y el TTS trabajan en
+    # hilos propios conectados por colas acotadas, así el siguiente ciclo se prepara mientras
+    # la reacción anterior todavía se está generando o sintetizando.
+    stop_event = stop_event or threading.Event()
+    frames_dir = paths["frames_dir"]
+    history_file = paths["history_file"]
+    audio_dir = paths["audio_dir"]
+    llm_log_file = paths["llm_log_file"]
+
+    pipeline_config = pipeline_params["raw"]
+    llm_queue = StageQueue("llm", **getStageQueueConfig(pipeline_config, "llm", 1, "drop_oldest"))
+    tts_queue = StageQueue("tts", **getStageQueueConfig(pipeline_config, "tts", 2, "block"))
+
+    # el historial y el índice de respuestas recientes solo los toca la etapa LLM;
+    # params lo reemplaza el hilo de captura cuando config.yaml se recarga;
+    # request es la llamada en curso, que el hilo de captura cancela al encolar un ciclo más nuevo
+    history_store = getHistoryStore(history_file)
+    response_guard = createResponseGuard()
+    state = {"params": params, "request": None}
+    # el filtro de escena y el selector los consulta el hilo de captura y los actualiza la etapa LLM al hablar
+    scene_gate = createSceneChangeGate()
+    keyframe_selector = createKeyframeSelector()
+
+    def llmStage(frames):
+        params = state["params"]
+        prompt_base = params["prompt_base"].strip()
+        history_for_prompt = getHistoryForPrompt(history_store, params)
+        request = state["request"] = createReactionRequest(frames)
+
+        try:
+            if params["llm_stream"]:
+                # cada frase viaja sola a la etapa TTS como (reacción, índice, texto)
+                reaction_id = newReactionId()
+                segment_count = [0]
+
+                def onSentence(sentence: str):
+                    llm_worker.emit((reaction_id, segment_count[0], sentence))
+                    segment_count[0] += 1
+
+                response = runLlmStreaming(
+                    prompt_base=prompt_base,
+                    frames=frames,
+                    history_messages=history_for_prompt,
+                    log_file=llm_log_file,
+                    on_sentence=onSentence,
+                    request=request,
+                )
+                recordStreamedResponse(response_guard, response)
+                result = None
+            else:
+                response = runLlmAvoidingRepeats(
+                    response_guard, prompt_base, frames, history_for_prompt, llm_log_file, request
+                )
+                if response is None:
+                    return None
+                result = response
+        except InferenceRejected as rejection:
+            skipRejectedReaction(rejection)
+            return None
+        except ReactionExpired as expired:
+            response = recoverExpiredReaction(expired, prompt_base, frames, llm_log_file)
+            if response is None:
+                return None
+            result = response
+
+        updateHistory(history_store, response, params, frames, source)
+        recordSpokenReaction(scene_gate, keyframe_selector, frames)
+        return result
+
+    def ttsStage(payload):
+        if isinstance(payload, tuple):
+            reaction_id, segment_index, sentence = payload
+            try:
+                synthesizeSegment(sentence, audio_dir, reaction_id, segment_index)
+            except Exception as error:
+                ERRORS_TOTAL.inc(stage="tts")
+                print(f"[!] Error al usar TTS en el segmento {segment_index}: {error}")
+        else:
+            sendToTts(payload, audio_dir)
+        return None
+
+    stages_stop_event = threading.Event()
+    llm_worker = StageWorker("llm", llmStage, llm_queue, tts_queue, stages_stop_event)
+    tts_worker = StageWorker("tts", ttsStage, tts_queue, None, stages_stop_event)
+    workers = [llm_worker, tts_worker]
+    for worker in workers:
+        worker.start()
+
+    print(f"\t- Pipeline por etapas activo (cola LLM: {llm_queue.maxsize}/{llm_queue.drop_policy}, "
+          f"cola TTS: {tts_queue.maxsize}/{tts_queue.drop_policy})")
+
+    cycles_until_talk = 0
+    cycle_id = 0
+
+    try:
+        while not stop_event.is_set():
+            cycle_id += 1
+            params = refreshParams(params)
+            state["params"] = params
+            frames_per_cycle = params["frames_per_cycle"]
+            capture_interval_seconds = params["capture_interval_seconds"]
+
+            if isDebugEnabled():
+                print("\n======================== NUEVO CICLO ========================")
+
+            cycles_until_talk = interruptCooldownOnSceneChange(source, cycles_until_talk)
+
+            if cycles_until_talk > 0:
+                CYCLES_TOTAL.inc(kind="silent")
+                cycles_until_talk -= 1
+                if isDebugEnabled():
+                    print(f"\t- Ciclo silencioso. Faltan {cycles_until_talk} ciclos para hablar de nuevo.")
+                maybeWarmUpDuringCooldown(cycles_until_talk, params)
+                source.wait(capture_interval_seconds, stop_event)
+                continue
+
+            CYCLES_TOTAL.inc(kind="speak")
+            frames = captureOrSkip(source, capture_worker, frames_dir, frames_per_cycle, capture_interval_seconds,
+                                   keyframe_selector, stop_event)
+            if frames is None:
+                continue
+
+            frames = gateCapturedFrames(scene_gate, frames)
+            if frames is None:
+                cycles_until_talk = cyclesAfterSkip(scene_gate, nextGap)
+                continue
+
+            # la antigüedad se mide desde el primer frame, no desde que terminó la captura
+            created_at = frames[0].timestamp if frames else None
+            in_flight = state["request"]
+            if in_flight is not None and getConfig().llm.cancel_superseded:
+                # la llamada en curso reacciona a frames más viejos: se corta para que la nueva tenga turno antes
+                in_flight.cancel()
+            llm_queue.put(StageItem(frames, cycle_id, created_at), stages_stop_event)
+
+            cycles_until_talk = nextGap()
+            printCooldown(cycles_until_talk, capture_interval_seconds, scene_gate)
+
+            del frames
+    finally:
+        stages_stop_event.set()
+        llm_queue.close()
+        tts_queue.close()
+        for worker in workers:
+            worker.join(timeout=5)
+
+        if isDebugEnabled():
+            for worker in workers:
+                print(f"\t- Etapa {worker.stage_name}: {worker.processed} procesados, {worker.errors} errores")
+            for queue in (llm_queue, tts_queue):
+                print(f"\t- Cola {queue.name}: {queue.dropped_full} descartes por cola llena, "
+                      f"{queue.dropped_stale} por antigüedad")
+
+
+def clearFramesDir(frames_dir: str):
+    # Paso de arranque "frames_dir": limpia frames previos (solo existen si app.save_frames estuvo activo).
+    try:
+        for fname in os.listdir(frames_dir):
+            fpath = os.path.join(frames_dir, fname)
+            if os.path.isfile(fpath):
+                os.remove(fpath)
+        if isDebugEnabled():
+            print(f"\t- Frames previos eliminados en: {frames_dir}")
+    except Exception as error:
+        print(f"\t[!] No se pudieron limpiar los frames: {error}")
+
+
+def warmUpModel():
+    # Paso de arranque "llm": carga el modelo en Ollama antes de la primera reacción.
+    print("\nPrecalentando el modelo LLM...")
+    if getOllamaClient().warmUp() is None:
+        raise RuntimeError("el modelo no quedó precargado; se cargará con la primera reacción")
+
+
+def runFrameLoop(source, paths: dict, params: dict, pipeline_params: dict, capture_worker=None, stop_event=None):
+    # Corre el ciclo del modo configurado sobre un origen de frames: OBS en vivo o una grabación (replay.py).
+    def nextGap() -> int:
+        # Devuelve el número de ciclos hasta la próxima intervención del avatar (con los valores vigentes).
+        app_config = getConfig().app
+        return random.randint(app_config.min_speak_cycles, app_config.max_speak_cycles)
+
+    if pipeline_params["mode"] == "staged":
+        runStagedLoop(source, paths, params, pipeline_params, nextGap, capture_worker, stop_event)
+    else:
+        runSequentialLoop(source, paths, params, nextGap, capture_worker, stop_event)
+
+
+def runStream(stop_event=None):
+    # Arranca un stream con la configuración del hilo actual: rutas, conexión a OBS, warm-up y el ciclo.
+    stream_name = getCurrentStream()
     paths = getAppPaths()
     params = getAppParams()
+    pipeline_params = getPipelineParams()
 
     frames_dir = paths["frames_dir"]
     history_file = paths["history_file"]
@@ -39,10 +586,8 @@ def runPipeline():
     min_speak_cycles = params["min_speak_cycles"]
     max_speak_cycles = params["max_speak_cycles"]
 
-    prompt_base = params["prompt_base"].strip()
-
-    print("======================== INICIO SERVICIO ========================\n")
-    print("Iniciando pipeline de avatar IA con OBS...")
+    if stream_name is not None:
+        print(f"\nIniciando stream '{stream_name}'...")
     print(f"\t- Directorio de frames: {frames_dir}")
     print(f"\t- Directorio de audio: {audio_dir}")
     print(f"\t- Archivo de historial: {history_file}")
@@ -54,106 +599,106 @@ def runPipeline():
     print(f"\t- Historial persiste en archivo: {history_persist_file}")
     print(f"\t- Ciclos para hablar (min, max): ({min_speak_cycles}, {max_speak_cycles})")
 
-    # limpiar frames previos
-    try:
-        for fname in os.listdir(frames_dir):
-            fpath = os.path.join(frames_dir, fname)
-            if os.path.isfile(fpath):
-                os.remove(fpath)
-        if isDebugEnabled():
-            print(f"\t- Frames previos eliminados en: {frames_dir}")
-    except Exception as error:
-        print(f"\t[!] No se pudieron limpiar los frames: {error}")
+    print(f"\t- Modo de pipeline: {pipeline_params['mode']}")
 
-    # limpiar historial solo si se persiste y tiene sentido (max_history > 0)
-    if history_persist_file and max_history_messages > 0:
-        try:
-            with open(history_file, "w", encoding="utf-8"):
-                pass
-            if isDebugEnabled():
-                print(f"\t- Historial reiniciado: {history_file}")
-        except Exception as error:
-            print(f"\t[!] No se pudo reiniciar el historial ({history_file}): {error}")
+    # los pasos independientes arrancan a la vez; el ciclo solo espera a OBS, y la carga del modelo y
+    # el TTS terminan en segundo plano mientras se captura el primer intervalo
+    startup = createStartupOrchestrator()
+    startup.start("obs", createObsConnection, required=True)
+    startup.start("history", lambda: len(getHistoryStore(history_file).messages()))
+    startup.start("frames_dir", lambda: clearFramesDir(frames_dir))
+    if params["llm_warmup_on_start"]:
+        startup.start("llm", warmUpModel)
+    else:
+        startup.skip("llm", "llm.warmup_on_start: false")
+    startup.start("tts", lambda: prepareTts(audio_dir))
+    if getConfig().obs.preprocess_workers > 0:
+        startup.start("preprocess", getFramePreprocessPool)
+    startup.allStarted()
 
-    # limpiar log de LLM
+    # el historial persistido sobrevive a reinicios: se recupera la cola del archivo en vez de vaciarlo
     try:
-        with open(llm_log_file, "w", encoding="utf-8"):
-            pass
-        if isDebugEnabled():
-            print(f"\t- Log de LLM reiniciado: {llm_log_file}")
-    except Exception as error:
-        print(f"\t[!] No se pudo reiniciar el log LLM ({llm_log_file}): {error}")
+        recovered = startup.waitFor("history")
+    except OSError as error:
+        recovered = 0
+        print(f"\t[!] No se pudo leer el historial ({history_file}): {error}")
+    print(f"\t- Mensajes iniciales en historial (memoria): {recovered}")
 
-    history_messages: list[str] = []
-    print(f"\t- Mensajes iniciales en historial (memoria): {len(history_messages)}")
+    ws, _ = startup.waitFor("obs")
+    source = ObsFrameSource(ws)
+    capture_worker = startBackgroundCapture(source)
 
-    ws, _ = createObsConnection()
+    try:
+        runFrameLoop(source, paths, params, pipeline_params, capture_worker, stop_event)
 
-    def nextGap() -> int:
-        # Devuelve el número de ciclos hasta la próxima intervención del avatar.
-        return random.randint(min_speak_cycles, max_speak_cycles)
+    except KeyboardInterrupt:
+        print("\nInterrupción del usuario (Ctrl+C). Deteniendo pipeline...")
+    finally:
+        if capture_worker is not None:
+            capture_worker.stop()
 
-    cycles_until_talk = 0
-    running = True
+        print(f"\nCerrando conexión con OBS{f' del stream {stream_name}' if stream_name else ''}...")
+        try:
+            ws.disconnect()
+        except Exception as error:
+            print(f"\t- Error al cerrar la conexión: {error}")
 
-    try:
-        while running:
-            if isDebugEnabled():
-                print("\n======================== NUEVO CICLO ========================")
 
-            # Mientras está en cooldown, no capturamos frames ni llamamos al LLM.
-            if cycles_until_talk > 0:
-                cycles_until_talk -= 1
-                if isDebugEnabled():
-                    print(f"\t- Ciclo silencioso. Faltan {cycles_until_talk} ciclos para hablar de nuevo.")
-                time.sleep(capture_interval_seconds)
-                continue
-
-            # Toca hablar: capturamos frames del intervalo completo.
-            frame_paths = captureFrames(ws, frames_dir, frames_per_cycle, capture_interval_seconds)
+def runStreamThread(stream_name: str, stop_event: threading.Event):
+    # Hilo de un stream en modo multi-stream: todo lo que corre aquí usa la configuración de su perfil.
+    setCurrentStream(stream_name)
+    try:
+        runStream(stop_event)
+    except Exception as error:
+        ERRORS_TOTAL.inc(stage="stream")
+        print(f"[!] El stream '{stream_name}' se detuvo por un error: {error}")
 
-            # Si el historial está deshabilitado o max=0, no lo mandamos al prompt.
-            if history_enabled and max_history_messages > 0:
-                history_for_prompt = history_messages
-            else:
-                history_for_prompt = []
 
-            response = runLlm(
-                prompt_base=prompt_base,
-                images_paths=frame_paths,
-                history_messages=history_for_prompt,
-                log_file=llm_log_file,
-            )
+def runMultiStream(stream_names: list[str]):
+    # Corre un stream por perfil de config.streams en hilos propios; todos comparten Ollama por el planificador.
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(target=runStreamThread, args=(name, stop_event), name=f"stream-{name}", daemon=True)
+        for name in stream_names
+    ]
+    for thread in threads:
+        thread.start()
 
-            sendToTts(response, audio_dir)
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        print("\nInterrupción del usuario (Ctrl+C). Deteniendo streams...")
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=10)
+        print(f"\t- Reparto del LLM entre streams: {getInferenceScheduler().summary()}")
 
-            # Actualizar historial solo si está habilitado y max_history_messages > 0
-            if history_enabled and max_history_messages > 0:
-                history_messages.append(response)
-                history_messages = saveHistory(
-                    history_file,
-                    history_messages,
-                    max_history_messages,
-                    history_persist_file,
-                )
-            else:
-                history_messages = []
 
-            cycles_until_talk = nextGap()
-            if isDebugEnabled():
-                print(f"\t- Próxima intervención del avatar en ~{cycles_until_talk} ciclos.")
-            else:
-                total_seconds = cycles_until_talk * capture_interval_seconds
-                print(f"\nAvatar en cooldown: hablará de nuevo en {cycles_until_talk} ciclos (~{total_seconds} segundos)\n")
+def runPipeline():
+    # Orquesta el servicio: servidor HTTP, recarga de config y uno o varios streams (captura → LLM → TTS).
+    print("======================== INICIO SERVICIO ========================\n")
+    print("Iniciando pipeline de avatar IA con OBS...")
+    app_server = startAppServer()
+    startConfigWatcher()
 
-            del frame_paths
+    if getConfig().tts.delivery == "http":
+        if app_server is not None:
+            print("\t- Audio TTS por HTTP: /audio/next y /audio/clip (reproductor: play-tts-stream.ps1)")
+        else:
+            print("[!] tts.delivery es \"http\" pero APP_PORT no está definido: los audios se escriben como archivos")
 
-    except KeyboardInterrupt:
-        print("\nInterrupción del usuario (Ctrl+C). Deteniendo pipeline...")
-        running = False
+    stream_names = getConfigManager().getStreamNames()
+    try:
+        if stream_names:
+            print(f"\t- Modo multi-stream: {', '.join(stream_names)}")
+            runMultiStream(stream_names)
+        else:
+            runStream()
     finally:
-        print("\nCerrando conexión con OBS...")
-        try:
-            ws.disconnect()
-        except Exception as error:
-            print(f"\t- Error al cerrar la conexión: {error}")
+        getOllamaClient().close()
+        closeLlmLogWriter()
+        closeHistoryStores()
+        closeFramePreprocessPool()
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+
+from capture_obs_frame import isDebugEnabled
+from config_loader import getCurrentStream, setCurrentStream
+from metrics import ERRORS_TOTAL, SKIPPED_CYCLES_TOTAL
+
+DROP_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class StageItem:
+    # Unidad de trabajo que viaja entre etapas con su instante de creación (para descartar trabajo viejo).
+
+    def __init__(self, payload, cycle_id: int, created_at: float | None = None):
+        self.payload = payload
+        self.cycle_id = cycle_id
+        self.created_at = created_at if created_at is not None else time.time()
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class StageQueue:
+    # Cola acotada entre dos etapas con backpressure y política de descarte configurable.
+
+    def __init__(self, name: str, maxsize: int, drop_policy: str = "block", max_age_seconds: float | None = None):
+        if maxsize <= 0:
+            raise ValueError(f"pipeline.{name}_queue_size debe ser mayor que 0")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"pipeline.{name}_drop_policy debe ser uno de {DROP_POLICIES}")
+
+        self.name = name
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+        self.max_age_seconds = max_age_seconds if max_age_seconds and max_age_seconds > 0 else None
+
+        self._items: deque[StageItem] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.dropped_full = 0
+        self.dropped_stale = 0
+
+    def put(self, item: StageItem, stop_event: threading.Event | None = None) -> bool:
+        # Encola un item aplicando la política; devuelve False si el item se descartó.
+        with self._cond:
+            while len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_policy == "drop_newest":
+                    self.dropped_full += 1
+                    SKIPPED_CYCLES_TOTAL.inc(reason="queue_full", stage=self.name)
+                    if isDebugEnabled():
+                        print(f"\t[{self.name}] Cola llena, se descarta el trabajo nuevo (ciclo {item.cycle_id})")
+                    return False
+
+                if self.drop_policy == "drop_oldest":
+                    old = self._items.popleft()
+                    self.dropped_full += 1
+                    SKIPPED_CYCLES_TOTAL.inc(reason="queue_full", stage=self.name)
+                    if isDebugEnabled():
+                        print(f"\t[{self.name}] Cola llena, se descarta el trabajo del ciclo {old.cycle_id}")
+                    continue
+
+                # block: backpressure hacia la etapa anterior
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                self._cond.wait(timeout=0.5)
+
+            if self._closed:
+                return False
+
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: float = 0.5) -> StageItem | None:
+        # Devuelve el siguiente item vigente o None si no hay nada antes del timeout.
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                while self._items:
+                    item = self._items.popleft()
+                    self._cond.notify_all()
+                    if self.max_age_seconds is not None and item.age() > self.max_age_seconds:
+                        self.dropped_stale += 1
+                        SKIPPED_CYCLES_TOTAL.inc(reason="stale", stage=self.name)
+                        print(f"\t[{self.name}] Trabajo del ciclo {item.cycle_id} descartado por antiguo ({item.age():.1f} s)")
+                        continue
+                    return item
+
+                remaining = deadline - time.time()
+                if remaining <= 0 or self._closed:
+                    return None
+                self._cond.wait(timeout=remaining)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageWorker(threading.Thread):
+    # Hilo que consume de una cola, procesa cada item y opcionalmente encola el resultado en la siguiente.
+
+    def __init__(self, name: str, handler, input_queue: StageQueue, output_queue: StageQueue | None, stop_event: threading.Event):
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.stage_name = name
+        self.handler = handler
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.stop_event = stop_event
+        self.processed = 0
+        self.errors = 0
+        self._current_item: StageItem | None = None
+        self.stream_name = getCurrentStream()
+
+    def emit(self, result):
+        # Permite al handler entregar resultados parciales a la siguiente etapa antes de terminar.
+        if self.output_queue is None or self._current_item is None:
+            return
+        item = self._current_item
+        self.output_queue.put(StageItem(result, item.cycle_id, item.created_at), self.stop_event)
+
+    def run(self):
+        setCurrentStream(self.stream_name)
+        while not self.stop_event.is_set():
+            item = self.input_queue.get(timeout=0.5)
+            if item is None:
+                continue
+
+            self._current_item = item
+            try:
+                result = self.handler(item.payload)
+            except Exception as error:
+                self.errors += 1
+                ERRORS_TOTAL.inc(stage=self.stage_name)
+                print(f"[!] Error en la etapa {self.stage_name} (ciclo {item.cycle_id}): {error}")
+                continue
+            finally:
+                self._current_item = None
+
+            self.processed += 1
+
+            if self.output_queue is not None and result is not None:
+                # el resultado hereda la antigüedad del trabajo original
+                self.output_queue.put(StageItem(result, item.cycle_id, item.created_at), self.stop_event)
+
+
+def getStageQueueConfig(pipeline_config: dict, stage: str, default_size: int, default_policy: str) -> dict:
+    # Extrae tamaño, política y antigüedad máxima de la cola de una etapa desde config.pipeline.
+    return {
+        "maxsize": int(pipeline_config.get(f"{stage}_queue_size", default_size)),
+        "drop_policy": pipeline_config.get(f"{stage}_drop_policy", default_policy),
+        "max_age_seconds": pipeline_config.get(f"{stage}_max_age_seconds"),
+    }
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import yaml
+
+
+def parseArgs():
+    # Argumentos de línea de comandos: "run" reproduce una grabación por el pipeline, "record" graba una de OBS.
+    parser = argparse.ArgumentParser(
+        description="Corre el pipeline (LLM + TTS) sobre frames grabados en vez de OBS y escribe un reporte."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Reproduce un video, una carpeta de imágenes o una sesión grabada")
+    run.add_argument("input", help="Archivo de video, carpeta de imágenes o carpeta de una sesión grabada")
+    run.add_argument("--config", default=os.getenv("APP_CONFIG_PATH", "config.yaml"), help="config.yaml base")
+    run.add_argument("--realtime", action="store_true", help="Reproducir al ritmo real en vez de a máxima velocidad")
+    run.add_argument("--fps", type=float, default=1.0, help="Imágenes por segundo de grabación (solo carpeta de imágenes)")
+    run.add_argument("--start", type=float, default=0.0, help="Segundo de la grabación desde el que empezar")
+    run.add_argument("--duration", type=float, help="Segundos de grabación a reproducir (por defecto hasta el final)")
+    run.add_argument("--mode", choices=("sequential", "staged"), default="sequential",
+                     help="pipeline.mode (sequential da resultados reproducibles a máxima velocidad)")
+    run.add_argument("--seed", type=int, default=0, help="Semilla de los ciclos de cooldown y las muletillas")
+    run.add_argument("--debug", action="store_true", help="Activar app.debug")
+    run.add_argument("--stub-llm", action="store_true", help="Usar un Ollama simulado en vez de OLLAMA_URL")
+    run.add_argument("--stub-tts", action="store_true", help="Usar un TTS simulado en vez de Fish Audio")
+    run.add_argument("--stub-prompt-ms", type=float, default=300.0, help="Prompt-eval simulado por imagen")
+    run.add_argument("--stub-tokens-per-second", type=float, default=40.0, help="Velocidad de generación simulada")
+    run.add_argument("--stub-tts-ms", type=float, default=400.0, help="Latencia base del TTS simulado")
+    run.add_argument("--data-dir", help="Directorio de datos de la corrida (por defecto uno temporal)")
+    run.add_argument("--output", help="Ruta del JSON del reporte (por defecto data/replays/)")
+    run.add_argument("--baseline", help="Reporte de una corrida anterior para detectar regresiones de latencia")
+    run.add_argument("--tolerance", type=float, default=0.2, help="Regresión tolerada en p95 (0.2 = 20%%)")
+
+    record = subparsers.add_parser("record", help="Graba capturas de OBS en una carpeta para reproducirlas después")
+    record.add_argument("output_dir", help="Carpeta de la sesión (debe estar vacía)")
+    record.add_argument("--config", default=os.getenv("APP_CONFIG_PATH", "config.yaml"), help="config.yaml base")
+    record.add_argument("--seconds", type=float, default=60.0, help="Duración de la grabación")
+    record.add_argument("--fps", type=float, default=1.0, help="Capturas por segundo")
+    return parser.parse_args()
+
+
+def writeReplayConfig(args, data_dir: str) -> str:
+    # Copia config.yaml con los datos de la corrida aislados en data_dir y el modo del replay aplicado.
+    with open(args.config, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+
+    config["app"]["data_dir"] = data_dir
+    config["app"]["debug"] = bool(args.debug)
+    config["app"]["background_capture"] = False
+    # el log del LLM es la fuente del reporte: todo en un solo archivo, sin rotar
+    config["app"]["llm_log_max_mb"] = 0
+    config["app"]["llm_log_rotate_hours"] = 0
+    config.setdefault("pipeline", {})["mode"] = args.mode
+    config["streams"] = []
+
+    config_path = os.path.join(data_dir, "replay_config.yaml")
+    with open(config_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+    return config_path
+
+
+def readLlmLog(log_file: str) -> list[dict]:
+    # Llamadas al LLM de la corrida (sin los registros del prompt base).
+    if not os.path.exists(log_file):
+        return []
+    calls = []
+    with open(log_file, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("type") != "prompt":
+                    calls.append(record)
+    return calls
+
+
+def buildReport(args, source, calls: list[dict], wall_seconds: float, audio_dir: str) -> dict:
+    from run_report import getGitCommit, peakRssMb, summarize
+    from config_loader import getConfig
+    from metrics import CYCLES_TOTAL, SKIPPED_CYCLES_TOTAL
+
+    samples: dict[str, list[float]] = {"llm": [], "prompt_eval": [], "eval": []}
+    reactions = []
+    for call in calls:
+        timings = call.get("timings") or {}
+        if call.get("wall_ms") is not None:
+            samples["llm"].append(call["wall_ms"] / 1000)
+        for phase in ("prompt_eval", "eval"):
+            if timings.get(f"{phase}_ms") is not None:
+                samples[phase].append(timings[f"{phase}_ms"] / 1000)
+        reactions.append({
+            "frames": [image["source"] for image in call.get("images", [])],
+            "response": call.get("response"),
+            "wall_ms": call.get("wall_ms"),
+            "prompt_eval_ms": timings.get("prompt_eval_ms"),
+            "eval_ms": timings.get("eval_ms"),
+        })
+
+    replayed_seconds = min(source.now(), source.end_seconds) - source.start_seconds
+    obs_config = getConfig().obs
+    return {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "commit": getGitCommit(),
+        "input": os.path.abspath(args.input),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "command")},
+        "model": getConfig().llm.model_name,
+        "capture": {
+            "frames_per_cycle": getConfig().app.frames_per_cycle,
+            "capture_interval_seconds": getConfig().app.capture_interval_seconds,
+            "image_format": obs_config.image_format,
+            "image_quality": obs_config.image_quality,
+            "max_long_edge": obs_config.max_long_edge,
+            "grayscale": obs_config.grayscale,
+        },
+        "finished": source.finished,
+        "replayed_seconds": round(replayed_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "speedup": round(replayed_seconds / wall_seconds, 2) if wall_seconds > 0 else None,
+        "captures": source.steps,
+        "cycles": CYCLES_TOTAL.snapshot(),
+        "skipped": SKIPPED_CYCLES_TOTAL.snapshot(),
+        "reactions_count": len(reactions),
+        "throughput_reactions_per_minute": round(len(reactions) / wall_seconds * 60, 2) if wall_seconds > 0 else None,
+        "audio_files": sum(1 for name in os.listdir(audio_dir) if name.startswith("tts_")) if os.path.isdir(audio_dir) else 0,
+        "peak_rss_mb": peakRssMb(),
+        "stages": summarize(samples),
+        "reactions": reactions,
+    }
+
+
+def runReplay(args):
+    from service_stubs import FakeFishClient, FakeOllamaServer
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="avatar-replay-")
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["APP_CONFIG_PATH"] = writeReplayConfig(args, data_dir)
+
+    ollama_server = None
+    if args.stub_llm:
+        ollama_server = FakeOllamaServer(
+            prompt_eval_ms_per_image=args.stub_prompt_ms,
+            tokens_per_second=args.stub_tokens_per_second,
+        ).start()
+        os.environ["OLLAMA_URL"] = ollama_server.url
+    if args.stub_tts:
+        os.environ.setdefault("FISH_API_KEY", "replay")
+
+    import tts_client
+    from frame_preprocess import closeFramePreprocessPool, getFramePreprocessPool
+    from frame_source import createReplaySource
+    from history_manager import closeHistoryStores
+    from llm_client import getOllamaClient
+    from llm_log import closeLlmLogWriter
+    from paths_manager import getAppParams, getAppPaths, getPipelineParams
+    from pipeline import runFrameLoop, warmUpModel
+
+    if args.stub_tts:
+        tts_client._fish_client = FakeFishClient(args.stub_tts_ms)
+
+    random.seed(args.seed)
+    paths = getAppPaths()
+    params = getAppParams()
+    source = createReplaySource(args.input, args.realtime, args.fps, args.start, args.duration)
+    print(f"Replay de {source.reader.name}: {source.end_seconds - source.start_seconds:.1f} s de grabación, "
+          f"{'ritmo real' if args.realtime else 'máxima velocidad'}, modo {args.mode}")
+    print(f"\t- Datos de la corrida: {data_dir}")
+
+    # la preparación (modelo, muletillas, procesos) queda fuera del tiempo medido, igual que en el benchmark
+    if params["llm_warmup_on_start"] and not args.stub_llm:
+        warmUpModel()
+    tts_client.prepareTts(paths["audio_dir"])
+    getFramePreprocessPool()
+
+    stop_event = threading.Event()
+    wall_start = time.perf_counter()
+    try:
+        runFrameLoop(source, paths, params, getPipelineParams(), None, stop_event)
+    except KeyboardInterrupt:
+        print("\nInterrupción del usuario (Ctrl+C): se reporta lo reproducido hasta ahora")
+    finally:
+        stop_event.set()
+        wall_seconds = time.perf_counter() - wall_start
+        source.close()
+        getOllamaClient().close()
+        closeLlmLogWriter()
+        closeHistoryStores()
+        closeFramePreprocessPool()
+        if ollama_server is not None:
+            ollama_server.stop()
+
+    return buildReport(args, source, readLlmLog(paths["llm_log_file"]), wall_seconds, paths["audio_dir"])
+
+
+def printReport(report: dict):
+    print("\nResultados del replay:")
+    print(f"\t- Grabación reproducida: {report['replayed_seconds']:.1f} s en {report['wall_seconds']:.1f} s "
+          f"(x{report['speedup']})")
+    print(f"\t- Reacciones: {report['reactions_count']} "
+          f"({report['throughput_reactions_per_minute']} reacciones/min), audios: {report['audio_files']}")
+    if report["skipped"]:
+        print(f"\t- Omitidas: {report['skipped']}")
+    for stage, stats in report["stages"].items():
+        print(f"\t- {stage:<12} p50 {stats['p50_ms']:>9.1f} ms   p95 {stats['p95_ms']:>9.1f} ms")
+
+
+def writeRecordConfig(args, data_dir: str) -> str:
+    # Copia config.yaml para grabar sin pérdidas y al tamaño completo de la captura: el replay aplica
+    # después el formato, la calidad y el tamaño que se quieran probar.
+    with open(args.config, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+
+    config["app"]["data_dir"] = data_dir
+    config["app"]["background_capture"] = False
+    config["obs"].update({
+        "image_format": "png",
+        "image_quality": -1,
+        "max_long_edge": 0,
+        "grayscale": False,
+        "adaptive_resolution": False,
+        "preprocess_workers": 0,
+    })
+    config["streams"] = []
+
+    config_path = os.path.join(data_dir, "record_config.yaml")
+    with open(config_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+    return config_path
+
+
+def recordSession(args):
+    # Graba capturas de OBS a ritmo fijo en una carpeta que después acepta "run".
+    data_dir = tempfile.mkdtemp(prefix="avatar-record-")
+    os.environ["APP_CONFIG_PATH"] = writeRecordConfig(args, data_dir)
+
+    from capture_obs_frame import getCapturePlan, grabCaptureStep
+    from conn import ObsUnavailable, createObsConnection
+    from frame_source import ObsFrameSource, SessionRecorder
+
+    recorder = SessionRecorder(args.output_dir)
+    ws, _ = createObsConnection()
+    source = ObsFrameSource(ws)
+    interval_seconds = 1.0 / args.fps
+
+    print(f"\nGrabando {args.seconds:g} s a {args.fps:g} capturas/s en {args.output_dir}...")
+    started = time.monotonic()
+    next_at = started
+    try:
+        while time.monotonic() - started < args.seconds:
+            try:
+                recorder.write(grabCaptureStep(source, getCapturePlan()))
+            except ObsUnavailable:
+                source.waitAvailable(interval_seconds)
+
+            next_at += interval_seconds
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # OBS tardó más que el intervalo: se sigue desde ahora sin acumular capturas atrasadas
+                next_at = time.monotonic()
+    except KeyboardInterrupt:
+        print("\nInterrupción del usuario (Ctrl+C): se cierra la grabación")
+    finally:
+        recorder.close()
+        source.close()
+    print(f"\t- Capturas grabadas: {recorder.steps}")
+
+
+def main():
+    args = parseArgs()
+    if args.command == "record":
+        recordSession(args)
+        return
+
+    report = runReplay(args)
+    printReport(report)
+
+    output_path = args.output
+    if not output_path:
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join("data", "replays", f"replay_{timestamp}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nReporte guardado en: {output_path}")
+
+    if args.baseline:
+        from run_report import compareWithBaseline
+
+        print(f"\nComparación con {args.baseline} (tolerancia {args.tolerance:.0%}):")
+        regressions = compareWithBaseline(report["stages"], args.baseline, args.tolerance)
+        if regressions:
+            print(f"[!] Regresiones en: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import re
+import unicodedata
+import zlib
+from collections import deque
+
+import numpy as np
+
+from capture_obs_frame import isDebugEnabled
+from config_loader import getConfig
+from metrics import RESPONSE_CHECKS_TOTAL
+
+SHINGLE_SIZE = 5  # caracteres por shingle
+NUM_PERMUTATIONS = 64  # largo de la firma MinHash (error típico de la similitud estimada ~ 1/sqrt(64))
+MERSENNE_PRIME = (1 << 31) - 1  # módulo de las permutaciones; con valores < 2^31 el producto cabe en uint64
+
+
+def normalizeResponse(text: str) -> str:
+    # Minúsculas, sin tildes ni signos: "¡Bro WHAT!" y "bro what" deben compararse como iguales.
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+def computeShingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    # Subcadenas de size caracteres del texto normalizado (el texto entero si es más corto).
+    normalized = normalizeResponse(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[start:start + size] for start in range(len(normalized) - size + 1)}
+
+
+class MinHasher:
+    # Firma MinHash de tamaño fijo: la fracción de posiciones iguales entre dos firmas estima la
+    # similitud de Jaccard de sus conjuntos de shingles sin guardar los textos.
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = 1):
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, MERSENNE_PRIME, size=(num_permutations, 1), dtype=np.uint64)
+        self._b = generator.integers(0, MERSENNE_PRIME, size=(num_permutations, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray | None:
+        # Firma de la respuesta (None si no queda texto tras normalizar).
+        shingles = computeShingles(text)
+        if not shingles:
+            return None
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) % MERSENNE_PRIME for shingle in shingles],
+                          dtype=np.uint64)
+        return ((self._a * hashes[None, :] + self._b) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+
+class ResponseRepetitionGuard:
+    # Índice acotado de las últimas respuestas para detectar, antes del TTS, cuándo el LLM se repite.
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        threshold: float = 0.6,
+        history_size: int = 20,
+        policy: str = "regenerate",
+        max_regenerations: int = 1,
+        temperature_boost: float = 0.3,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.policy = policy
+        self.max_regenerations = max_regenerations
+        self.temperature_boost = temperature_boost
+
+        self._hasher = MinHasher()
+        # firmas de las últimas respuestas dichas: memoria fija de history_size * NUM_PERMUTATIONS enteros
+        self._signatures: deque[np.ndarray] = deque(maxlen=history_size)
+
+        self.responses_checked = 0
+        self.duplicates_found = 0
+        self.regenerations = 0
+
+    def similarity(self, text: str) -> float:
+        # Similitud estimada (0-1) con la respuesta reciente más parecida.
+        signature = self._hasher.signature(text)
+        if signature is None or not self._signatures:
+            return 0.0
+        recent = np.stack(self._signatures)
+        return float((recent == signature).mean(axis=1).max())
+
+    def isDuplicate(self, text: str) -> bool:
+        # Compara la respuesta con las recientes y cuenta el resultado en métricas.
+        if not self.enabled:
+            return False
+
+        self.responses_checked += 1
+        similarity = self.similarity(text)
+        duplicate = similarity >= self.threshold
+        RESPONSE_CHECKS_TOTAL.inc(result="duplicate" if duplicate else "unique")
+
+        if duplicate:
+            self.duplicates_found += 1
+            print(f"\t- Respuesta repetida (similitud {similarity:.2f} >= {self.threshold}): {text[:80]}")
+        elif isDebugEnabled():
+            print(f"\t- Similitud con respuestas recientes: {similarity:.2f}")
+        return duplicate
+
+    def recordResponse(self, text: str):
+        # Agrega al índice una respuesta que sí se dijo.
+        if not self.enabled:
+            return
+        signature = self._hasher.signature(text)
+        if signature is not None:
+            self._signatures.append(signature)
+
+    def regenerateTemperature(self, attempt: int) -> float:
+        # Temperatura del intento de regeneración attempt (1, 2, ...): más alta para alejarse de lo ya dicho.
+        return min(2.0, getConfig().llm.temperature + self.temperature_boost * attempt)
+
+    def summary(self) -> str:
+        rate = (self.duplicates_found / self.responses_checked * 100) if self.responses_checked else 0.0
+        return (
+            f"respuestas repetidas {self.duplicates_found}/{self.responses_checked} ({rate:.0f}%), "
+            f"{self.regenerations} regeneraciones"
+        )
+
+
+def createResponseGuard() -> ResponseRepetitionGuard:
+    # Construye el detector de respuestas repetidas desde config.llm.
+    llm_config = getConfig().llm
+
+    return ResponseRepetitionGuard(
+        enabled=llm_config.repetition_check,
+        threshold=llm_config.repetition_threshold,
+        history_size=llm_config.repetition_history,
+        policy=llm_config.repetition_policy,
+        max_regenerations=llm_config.repetition_max_regenerations,
+        temperature_boost=llm_config.repetition_temperature_boost,
+    )
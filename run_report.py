@@ -0,0 +1,67 @@
+import json
+import resource
+import statistics
+import subprocess
+import sys
+
+# Resumen de latencias compartido por los reportes de replay.py y de benchmarks/.
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    # Percentil con interpolación lineal (None si no hay muestras).
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: dict[str, list[float]]) -> dict:
+    # Resume cada etapa en p50/p95/p99/media en milisegundos.
+    summary = {}
+    for stage, values in samples.items():
+        if not values:
+            continue
+        summary[stage] = {
+            "count": len(values),
+            "mean_ms": round(statistics.fmean(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    return summary
+
+
+def getGitCommit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def peakRssMb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def compareWithBaseline(summary: dict, baseline_path: str, tolerance: float) -> list[str]:
+    # Compara los p95 contra una corrida anterior y devuelve las etapas que empeoraron más de lo tolerado.
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+
+    regressions: list[str] = []
+    for stage, current in summary.items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"]
+        marker = "REGRESIÓN" if change > tolerance else "ok"
+        print(f"\t- {stage:<12} p95 {previous['p95_ms']:>9.1f} → {current['p95_ms']:>9.1f} ms ({change:+.0%}) {marker}")
+        if change > tolerance:
+            regressions.append(stage)
+    return regressions
@@ -0,0 +1,64 @@
+param(
+    # URL del servidor HTTP de la app (APP_PORT)
+    [string]$BaseUrl = "http://localhost:8000",
+    # Nombre del stream en modo multi-stream (vacío = stream único)
+    [string]$Stream = ""
+)
+
+# Reproductor de referencia para tts.delivery: "http". Pide a la app el siguiente audio con
+# /audio/next?after=<secuencia> (long-poll) y lo reproduce desde /audio/clip, que llega en streaming:
+# la reproducción empieza con los primeros bytes, sin esperar a que el archivo esté completo.
+# Los audios se reproducen en orden de secuencia, uno detrás de otro. OBS debe capturar el audio de powershell.exe.
+
+$streamQuery = if ($Stream) { "&stream=$Stream" } else { "" }
+
+Write-Host "TTS Stream iniciado. Servidor: $BaseUrl $(if ($Stream) { "(stream $Stream)" })"
+
+$player = New-Object -ComObject WMPlayer.OCX
+$player.settings.autoStart = $false
+$last = $null
+
+while ($true) {
+    $afterQuery = if ($null -ne $last) { "after=$last" } else { "" }
+    try {
+        $response = Invoke-WebRequest -UseBasicParsing -TimeoutSec 60 -Uri "$BaseUrl/audio/next?$afterQuery$streamQuery"
+    } catch {
+        Write-Host "Servidor no disponible ($($_.Exception.Message)); reintento en 2 s"
+        Start-Sleep -Seconds 2
+        continue
+    }
+
+    # 204: no hubo audio nuevo durante el long-poll
+    if ($response.StatusCode -ne 200) {
+        continue
+    }
+
+    $clip = $response.Content | ConvertFrom-Json
+    if ($null -ne $last -and $clip.sequence -gt $last + 1) {
+        Write-Host "Se perdieron $($clip.sequence - $last - 1) audios (la cola de la app los descartó)"
+    }
+    $last = $clip.sequence
+
+    Write-Host "Reproduciendo $($clip.sequence) (reacción $($clip.reaction_id), segmento $($clip.segment_index))"
+    try {
+        $player.URL = "$BaseUrl$($clip.url)"
+        $player.controls.play()
+
+        # playState: 3 = reproduciendo, 8 = terminado, 1 = detenido; se espera a que termine antes del siguiente
+        $started = Get-Date
+        while ($true) {
+            Start-Sleep -Milliseconds 50
+            $state = $player.playState
+            if ($state -eq 8 -or ($state -eq 1 -and ((Get-Date) - $started).TotalSeconds -gt 1)) {
+                break
+            }
+            if (((Get-Date) - $started).TotalSeconds -gt 120) {
+                Write-Host "El audio $($clip.sequence) no terminó en 120 s; se pasa al siguiente"
+                break
+            }
+        }
+        $player.controls.stop()
+    } catch {
+        Write-Host "Error al reproducir audio: $_"
+    }
+}
@@ -1,3 +1,8 @@
+param(
+    # Reproduce los audios uno detrás de otro en este proceso (necesario con llm.stream: true)
+    [switch]$Sequential
+)
+
 $scriptDir = $PSScriptRoot
 $projectRoot = Split-Path (Split-Path $scriptDir -Parent) -Parent
 
@@ -6,23 +11,72 @@ $folder = Join-Path $projectRoot "data\audio"
 
 Write-Host "TTS Watcher iniciado. Monitoreando: $folder"
 
-$fsw = New-Object IO.FileSystemWatcher $folder -Property @{
-    NotifyFilter = [IO.NotifyFilters]'FileName, LastWrite'
-    Filter = "*.mp3"
-    EnableRaisingEvents = $true
+if (-not $Sequential) {
+    $fsw = New-Object IO.FileSystemWatcher $folder -Property @{
+        NotifyFilter = [IO.NotifyFilters]'FileName, LastWrite'
+        Filter = "*.mp3"
+        EnableRaisingEvents = $true
+    }
+
+    # la app escribe cada audio en data/audio/.tmp y lo mueve ya completo: según el sistema de archivos
+    # compartido eso llega como Created o como Renamed, así que se escuchan los dos
+    $action = {
+        $path = $Event.SourceEventArgs.FullPath
+        Write-Host "Nuevo audio detectado: $path"
+        try {
+            # Abre el archivo con el reproductor por defecto de Windows
+            Start-Process -FilePath $path
+        } catch {
+            Write-Host "Error al reproducir audio: $_"
+        }
+    }
+    Register-ObjectEvent $fsw Created -Action $action | Out-Null
+    Register-ObjectEvent $fsw Renamed -Action $action | Out-Null
+
+    while ($true) {
+        Start-Sleep -Seconds 1
+    }
 }
 
-Register-ObjectEvent $fsw Created -Action {
-    $path = $Event.SourceEventArgs.FullPath
-    Write-Host "Nuevo audio detectado: $path"
+# Modo secuencial: se lee data/audio/manifest.json (la app lo reemplaza entero con cada audio nuevo) y se
+# reproducen en orden de secuencia los audios posteriores al último reproducido, sin cortarse entre sí.
+# OBS debe capturar el audio de powershell.exe.
+$manifestPath = Join-Path $folder "manifest.json"
+$player = New-Object -ComObject WMPlayer.OCX
+$player.settings.autoStart = $false
+
+# al arrancar no se repite lo que ya estaba en el spool
+$last = 0
+if (Test-Path $manifestPath) {
+    $last = (Get-Content -Raw $manifestPath | ConvertFrom-Json).last_sequence
+}
+
+while ($true) {
+    $next = $null
     try {
-        # Abre el archivo con el reproductor por defecto de Windows
-        Start-Process -FilePath $path
+        $manifest = Get-Content -Raw $manifestPath -ErrorAction Stop | ConvertFrom-Json
+        $next = $manifest.entries | Where-Object { $_.sequence -gt $last } | Sort-Object sequence | Select-Object -First 1
     } catch {
-        Write-Host "Error al reproducir audio: $_"
+        # manifest todavía inexistente o reemplazado justo en este instante: se reintenta
     }
-}
 
-while ($true) {
-    Start-Sleep -Seconds 1
+    if ($null -eq $next) {
+        Start-Sleep -Milliseconds 100
+        continue
+    }
+
+    $last = $next.sequence
+    $path = Join-Path $folder $next.file
+    Write-Host "Reproduciendo $($next.sequence): $path"
+    try {
+        $media = $player.newMedia($path)
+        $player.currentPlaylist.clear()
+        $player.currentPlaylist.appendItem($media)
+        $player.controls.play()
+        # la duración viene de los metadatos del mp3; se espera a que termine antes del siguiente
+        Start-Sleep -Milliseconds ([int]($media.duration * 1000) + 100)
+        $player.controls.stop()
+    } catch {
+        Write-Host "Error al reproducir audio: $_"
+    }
 }
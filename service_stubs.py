@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ollama y TTS simulados: permiten correr el pipeline sin GPU ni API key de Fish Audio
+# (replay.py con --stub-llm/--stub-tts y los benchmarks de benchmarks/).
+
+
+class FakeOllamaServer:
+    # Servidor HTTP que imita /api/generate de Ollama con latencias configurables y streaming NDJSON.
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, load_ms: float = 0.0,
+                 prompt_eval_ms_per_image: float = 300.0, tokens_per_second: float = 40.0,
+                 response_text: str | None = None):
+        self.load_ms = load_ms
+        self.prompt_eval_ms_per_image = prompt_eval_ms_per_image
+        self.tokens_per_second = tokens_per_second
+        self.response_text = response_text or (
+            "Bro what, ese salto fue pura suerte. Nooo la polizziaaa, corre corre. Uff qué F, casi lo logra."
+        )
+        self.requests_served = 0
+        self._loaded = load_ms <= 0
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                fake.handleGenerate(self, body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host = host
+        self.port = self._server.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handleGenerate(self, request: BaseHTTPRequestHandler, body: dict):
+        with self._lock:
+            self.requests_served += 1
+            load_ms = 0.0 if self._loaded else self.load_ms
+            self._loaded = True
+
+        images = len(body.get("images") or [])
+        num_predict = (body.get("options") or {}).get("num_predict")
+        prompt_eval_ms = self.prompt_eval_ms_per_image * max(images, 1)
+        tokens = self.response_text.split(" ")
+        if num_predict:
+            tokens = tokens[:num_predict]
+        token_delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+        time.sleep((load_ms + prompt_eval_ms) / 1000.0)
+
+        final = {
+            "model": body.get("model"),
+            "done": True,
+            "load_duration": int(load_ms * 1e6),
+            "prompt_eval_duration": int(prompt_eval_ms * 1e6),
+            "prompt_eval_count": 256 * max(images, 1),
+            "eval_duration": int(len(tokens) * token_delay * 1e9),
+            "eval_count": len(tokens),
+        }
+        final["total_duration"] = final["load_duration"] + final["prompt_eval_duration"] + final["eval_duration"]
+
+        if not body.get("stream", True):
+            time.sleep(len(tokens) * token_delay)
+            final["response"] = " ".join(tokens)
+            payload = json.dumps(final).encode("utf-8")
+            request.send_response(200)
+            request.send_header("Content-Type", "application/json")
+            request.send_header("Content-Length", str(len(payload)))
+            request.end_headers()
+            request.wfile.write(payload)
+            return
+
+        request.send_response(200)
+        request.send_header("Content-Type", "application/x-ndjson")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+
+        def writeChunk(obj: dict):
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            request.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            request.wfile.flush()
+
+        for index, token in enumerate(tokens):
+            time.sleep(token_delay)
+            text = token if index == len(tokens) - 1 else token + " "
+            writeChunk({"model": body.get("model"), "response": text, "done": False})
+
+        final["response"] = ""
+        writeChunk(final)
+        request.wfile.write(b"0\r\n\r\n")
+        request.wfile.flush()
+
+
+class FakeTtsResource:
+    # Imita client.tts de Fish Audio: latencia fija más un costo por carácter y bytes de audio falsos.
+
+    def __init__(self, base_latency_ms: float, ms_per_char: float):
+        self.base_latency_ms = base_latency_ms
+        self.ms_per_char = ms_per_char
+        self.calls = 0
+        self.characters = 0
+        self.completed_at: list[float] = []  # time.perf_counter() al terminar cada síntesis
+
+    def _latency(self, text: str) -> float:
+        return (self.base_latency_ms + self.ms_per_char * len(text)) / 1000.0
+
+    def convert(self, text: str, reference_id: str | None = None, format: str | None = None, **kwargs) -> bytes:
+        self.calls += 1
+        self.characters += len(text)
+        time.sleep(self._latency(text))
+        self.completed_at.append(time.perf_counter())
+        # ~16 KB por segundo de voz a 128 kbps, estimando 15 caracteres por segundo hablado
+        return b"\xff\xfb" + b"\x00" * max(1024, int(len(text) / 15 * 16000))
+
+    def stream(self, text: str, reference_id: str | None = None, format: str | None = None, **kwargs):
+        audio = self.convert(text, reference_id=reference_id, format=format)
+        chunk_size = 4096
+        for start in range(0, len(audio), chunk_size):
+            yield audio[start:start + chunk_size]
+
+
+class FakeFishClient:
+    # Sustituto de FishAudio con la misma forma (client.tts.convert / client.tts.stream).
+
+    def __init__(self, base_latency_ms: float = 400.0, ms_per_char: float = 2.0):
+        self.tts = FakeTtsResource(base_latency_ms, ms_per_char)
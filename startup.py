@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler
+
+from app_server import registerRoute, sendText
+from config_loader import bindCurrentStream, getCurrentStream
+from metrics import ERRORS_TOTAL, STARTUP_READY, STARTUP_STEP_SECONDS
+
+_startup_orchestrators = {}  # arranque de cada stream (clave None en modo de un solo stream)
+_orchestrators_lock = threading.Lock()
+
+STATE_LABELS = {"ready": "listo", "degraded": "incompleto", "failed": "fallido"}
+
+
+@dataclass(slots=True)
+class StartupStep:
+    # Un paso del arranque (conexión a OBS, carga del modelo, cliente TTS...) con su estado y duración.
+    name: str
+    required: bool
+    state: str = "pending"  # pending, running, ready, failed, skipped
+    seconds: float | None = None
+    error: str | None = None
+    result: object = field(default=None, repr=False)
+    exception: BaseException | None = field(default=None, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def describe(self) -> dict:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class StartupOrchestrator:
+    # Corre los pasos de arranque de un stream a la vez, cada uno en su hilo, y lleva su estado:
+    # el ciclo empieza en cuanto están listos los pasos requeridos y el resto (por ejemplo la carga
+    # del modelo) termina en segundo plano mientras se captura el primer intervalo.
+
+    def __init__(self, stream_label: str = "default"):
+        self.stream_label = stream_label
+        self.started_at = time.monotonic()
+        self.ready_seconds: float | None = None
+        self._steps: dict[str, StartupStep] = {}
+        self._all_started = False
+        self._lock = threading.Lock()
+        STARTUP_READY.set(0, stream=stream_label)
+
+    def start(self, name: str, target, required: bool = False) -> StartupStep:
+        # Lanza target en un hilo propio (con el stream del hilo actual) como paso name.
+        step = StartupStep(name, required)
+        with self._lock:
+            self._steps[name] = step
+        thread = threading.Thread(
+            target=bindCurrentStream(self._run), args=(step, target), name=f"startup-{name}", daemon=True
+        )
+        thread.start()
+        return step
+
+    def skip(self, name: str, reason: str):
+        # Registra un paso desactivado por config (cuenta como listo).
+        step = StartupStep(name, required=False, state="skipped", seconds=0.0, error=reason)
+        step.done.set()
+        with self._lock:
+            self._steps[name] = step
+        self._checkFinished()
+
+    def allStarted(self):
+        # Marca que ya se lanzaron todos los pasos: desde aquí el arranque puede darse por terminado.
+        self._all_started = True
+        self._checkFinished()
+
+    def _run(self, step: StartupStep, target):
+        step.state = "running"
+        started = time.monotonic()
+        try:
+            step.result = target()
+            step.state = "ready"
+        except Exception as error:
+            step.state = "failed"
+            step.error = str(error)
+            step.exception = error
+            ERRORS_TOTAL.inc(stage="startup")
+            if not step.required:
+                print(f"[!] Paso de arranque '{step.name}' falló (se sigue sin él): {error}")
+        finally:
+            step.seconds = time.monotonic() - started
+            STARTUP_STEP_SECONDS.set(step.seconds, stream=self.stream_label, step=step.name)
+            step.done.set()
+            self._checkFinished()
+
+    def waitFor(self, name: str, timeout: float | None = None):
+        # Espera a que termine el paso y devuelve su resultado; si falló, relanza su error.
+        step = self._steps[name]
+        if not step.done.wait(timeout):
+            raise TimeoutError(f"El paso de arranque '{name}' no terminó en {timeout} s")
+        if step.exception is not None:
+            raise step.exception
+        return step.result
+
+    def state(self) -> str:
+        # starting: quedan pasos en curso; ready: todo listo; degraded: falló un paso opcional;
+        # failed: falló un paso requerido.
+        with self._lock:
+            steps = list(self._steps.values())
+        if any(step.state == "failed" and step.required for step in steps):
+            return "failed"
+        if not self._all_started or any(step.state in ("pending", "running") for step in steps):
+            return "starting"
+        if any(step.state == "failed" for step in steps):
+            return "degraded"
+        return "ready"
+
+    def _checkFinished(self):
+        state = self.state()
+        if state == "starting" or self.ready_seconds is not None:
+            return
+        with self._lock:
+            if self.ready_seconds is not None:
+                return
+            self.ready_seconds = time.monotonic() - self.started_at
+        STARTUP_READY.set(1 if state in ("ready", "degraded") else 0, stream=self.stream_label)
+        print(f"[i] Arranque {STATE_LABELS[state]} en {self.ready_seconds:.2f} s: {self.summary()}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            steps = {name: step.describe() for name, step in self._steps.items()}
+        return {
+            "state": self.state(),
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "ready_seconds": round(self.ready_seconds, 3) if self.ready_seconds is not None else None,
+            "steps": steps,
+        }
+
+    def summary(self) -> str:
+        with self._lock:
+            steps = list(self._steps.values())
+        parts = []
+        for step in steps:
+            if step.state == "skipped":
+                parts.append(f"{step.name} omitido")
+            elif step.seconds is None:
+                parts.append(f"{step.name} {step.state}")
+            else:
+                parts.append(f"{step.name} {step.seconds:.2f} s{'' if step.state == 'ready' else f' ({step.state})'}")
+        return ", ".join(parts)
+
+
+def createStartupOrchestrator() -> StartupOrchestrator:
+    # Crea (o reemplaza, al reiniciar un stream) el arranque del stream del hilo actual.
+    stream_name = getCurrentStream()
+    orchestrator = StartupOrchestrator(stream_name or "default")
+    with _orchestrators_lock:
+        _startup_orchestrators[stream_name] = orchestrator
+    return orchestrator
+
+
+def getStartupSnapshot() -> tuple[bool, dict]:
+    # Estado de arranque de todos los streams y si el servicio ya está listo para reaccionar.
+    with _orchestrators_lock:
+        orchestrators = dict(_startup_orchestrators)
+    streams = {name or "default": orchestrator.snapshot() for name, orchestrator in orchestrators.items()}
+    ready = bool(streams) and all(stream["state"] in ("ready", "degraded") for stream in streams.values())
+    return ready, streams
+
+
+def handleReady(request: BaseHTTPRequestHandler):
+    # 200 cuando todos los streams terminaron de arrancar (aunque sea sin un paso opcional), 503 si no.
+    ready, streams = getStartupSnapshot()
+    body = json.dumps({"ready": ready, "streams": streams}, ensure_ascii=False, indent=2)
+    sendText(request, 200 if ready else 503, body, "application/json; charset=utf-8")
+
+
+registerRoute("/ready", handleReady)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# los módulos de la aplicación viven en la raíz del repo y leen config.yaml al primer getConfig()
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault("APP_CONFIG_PATH", os.path.join(ROOT_DIR, "config.yaml"))
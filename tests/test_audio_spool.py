@@ -0,0 +1,95 @@
+import json
+import os
+
+from audio_spool import MANIFEST_FILE, TEMP_SUBDIR, AudioSpool
+
+REACTION_ID = "20260101_120000_000"
+
+
+def readManifest(audio_dir) -> dict:
+    with open(os.path.join(audio_dir, MANIFEST_FILE), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def audioFiles(audio_dir) -> list[str]:
+    return sorted(name for name in os.listdir(audio_dir) if name.startswith("tts_"))
+
+
+def testFilesGetIncreasingSequenceNumbers(tmp_path):
+    spool = AudioSpool(str(tmp_path))
+    paths = [spool.write(b"audio", "mp3", REACTION_ID, segment) for segment in range(3)]
+
+    assert [os.path.basename(path) for path in paths] == [
+        f"tts_{sequence:08d}_{REACTION_ID}_{sequence - 1:02d}.mp3" for sequence in (1, 2, 3)
+    ]
+    manifest = readManifest(tmp_path)
+    assert manifest["last_sequence"] == 3
+    assert [entry["sequence"] for entry in manifest["entries"]] == [1, 2, 3]
+    assert os.listdir(tmp_path / TEMP_SUBDIR) == []
+
+
+def testOldestFilesAreEvictedByCount(tmp_path):
+    spool = AudioSpool(str(tmp_path), max_files=3)
+    for segment in range(5):
+        spool.write(b"audio", "mp3", REACTION_ID, segment)
+
+    assert spool.evicted == 2
+    assert [name.split("_")[1] for name in audioFiles(tmp_path)] == ["00000003", "00000004", "00000005"]
+    assert [entry["sequence"] for entry in readManifest(tmp_path)["entries"]] == [3, 4, 5]
+
+
+def testOldestFilesAreEvictedBySize(tmp_path):
+    spool = AudioSpool(str(tmp_path), max_files=100, max_bytes=250)
+    for segment in range(4):
+        spool.write(b"x" * 100, "mp3", REACTION_ID, segment)
+
+    assert [entry["sequence"] for entry in readManifest(tmp_path)["entries"]] == [3, 4]
+    assert sum(os.path.getsize(tmp_path / name) for name in audioFiles(tmp_path)) == 200
+
+
+def testNewestFileIsKeptEvenIfOverTheSizeLimit(tmp_path):
+    spool = AudioSpool(str(tmp_path), max_bytes=50)
+    spool.write(b"x" * 10, "mp3", REACTION_ID, 0)
+    path = spool.write(b"x" * 100, "mp3", REACTION_ID, 1)
+
+    assert audioFiles(tmp_path) == [os.path.basename(path)]
+
+
+def testSequenceContinuesAfterRestart(tmp_path):
+    spool = AudioSpool(str(tmp_path), max_files=2)
+    for segment in range(3):
+        spool.write(b"audio", "mp3", REACTION_ID, segment)
+    # un crash a mitad de escritura deja un temporal que el reproductor nunca vio
+    (tmp_path / TEMP_SUBDIR / f"tts_00000004_{REACTION_ID}_00.mp3").write_bytes(b"a medias")
+
+    restarted = AudioSpool(str(tmp_path), max_files=2)
+    path = restarted.write(b"audio", "mp3", REACTION_ID, 0)
+
+    assert os.path.basename(path).startswith("tts_00000004_")
+    assert os.listdir(tmp_path / TEMP_SUBDIR) == []
+    assert [entry["sequence"] for entry in readManifest(tmp_path)["entries"]] == [3, 4]
+
+
+def testFilesOutsideTheManifestAreEvictedFirst(tmp_path):
+    # audios de una versión anterior (nombre por fecha) o que quedaron fuera del manifest
+    (tmp_path / "tts_20250101_101010_000.mp3").write_bytes(b"viejo")
+    spool = AudioSpool(str(tmp_path), max_files=2)
+    spool.write(b"audio", "mp3", REACTION_ID, 0)
+    spool.write(b"audio", "mp3", REACTION_ID, 1)
+
+    assert "tts_20250101_101010_000.mp3" not in audioFiles(tmp_path)
+    assert len(audioFiles(tmp_path)) == 2
+
+
+def testDamagedManifestIsRebuiltFromTheFiles(tmp_path):
+    spool = AudioSpool(str(tmp_path))
+    for segment in range(2):
+        spool.write(b"audio", "mp3", REACTION_ID, segment)
+    (tmp_path / MANIFEST_FILE).write_text("{no es json", encoding="utf-8")
+
+    restarted = AudioSpool(str(tmp_path))
+    path = restarted.write(b"audio", "mp3", REACTION_ID, 2)
+
+    # la secuencia se recupera de los nombres de archivo: no se reutiliza un número ya publicado
+    assert os.path.basename(path).startswith("tts_00000003_")
+    assert [entry["sequence"] for entry in readManifest(tmp_path)["entries"]] == [1, 2, 3]
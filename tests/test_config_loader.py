@@ -0,0 +1,31 @@
+import os
+
+import pytest
+import yaml
+
+from config_loader import buildAppSettings
+
+
+def loadAppSection() -> dict:
+    with open(os.environ["APP_CONFIG_PATH"], "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)["app"]
+
+
+def testLlmLogSettingsAreTyped():
+    app_config = dict(loadAppSection(), llm_log_max_mb="0.5", llm_log_rotate_hours=0, llm_log_backups="3")
+    settings = buildAppSettings(app_config)
+
+    assert settings.llm_log_max_mb == 0.5
+    assert settings.llm_log_rotate_hours == 0.0
+    assert settings.llm_log_backups == 3
+
+
+@pytest.mark.parametrize("key, value", [
+    ("llm_log_max_mb", -1),
+    ("llm_log_rotate_hours", -0.5),
+    ("llm_log_backups", -2),
+    ("llm_log_max_mb", "mucho"),
+])
+def testInvalidLlmLogSettingsRaise(key, value):
+    with pytest.raises(ValueError):
+        buildAppSettings(dict(loadAppSection(), **{key: value}))
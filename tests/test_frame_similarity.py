@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+from capture_obs_frame import CapturedFrame
+from frame_similarity import SceneChangeGate
+from keyframes import KeyframeSelector
+from pipeline import gateCapturedFrames, recordSpokenReaction
+
+
+def createFrame(seed: int, index: int = 0) -> CapturedFrame:
+    image = np.random.default_rng(seed).integers(0, 255, (72, 128, 3), dtype=np.uint8)
+    ok, buffer = cv2.imencode(".png", image)
+    assert ok
+    return CapturedFrame(buffer.tobytes(), "png", "Juego", 0.0, 128, 72, index)
+
+
+def createGate(max_consecutive_skips: int = 3) -> SceneChangeGate:
+    return SceneChangeGate(gate_enabled=True, change_threshold=10, max_consecutive_skips=max_consecutive_skips)
+
+
+def testCheckingAloneDoesNotRecordTheScene():
+    gate = createGate()
+    frames = [createFrame(1)]
+
+    # sin reacción dicha (LLM rechazado, vencido, repetido...) la misma escena se sigue intentando
+    assert gate.shouldReact(frames)
+    assert gate.shouldReact(frames)
+    assert gate.cycles_skipped == 0
+
+
+def testSpokenReactionSkipsTheSameScene():
+    gate = createGate()
+    frames = [createFrame(1)]
+    gate.recordReaction(frames)
+
+    assert not gate.shouldReact([createFrame(1)])
+    assert gate.shouldReact([createFrame(2)])
+
+
+def testMaxConsecutiveSkipsForcesAReaction():
+    gate = createGate(max_consecutive_skips=2)
+    gate.recordReaction([createFrame(1)])
+
+    results = [gate.shouldReact([createFrame(1)]) for _ in range(3)]
+    assert results == [False, False, True]
+
+
+def testDisabledGateNeverSkipsNorRecords():
+    gate = SceneChangeGate(gate_enabled=False)
+    frames = [createFrame(1)]
+    gate.recordReaction(frames)
+
+    assert gate.shouldReact(frames)
+    assert gate.sceneDistance(frames) is None
+
+
+def testKeyframeNoveltyOnlyCountsSpokenReactions():
+    gate = createGate()
+    selector = KeyframeSelector()
+    frames = [createFrame(1)]
+
+    assert gateCapturedFrames(gate, frames) == frames
+    assert selector._reaction_thumbnails == {}
+
+    recordSpokenReaction(gate, selector, frames)
+    assert len(selector._reaction_thumbnails["Juego"]) == 1
+    assert gateCapturedFrames(gate, [createFrame(1)]) is None
@@ -0,0 +1,99 @@
+import json
+import os
+
+from history_manager import HistoryEntry, HistoryStore, parseHistoryLine
+
+
+def createStore(history_file: str, max_entries: int = 5, compact_lines: int = 500) -> HistoryStore:
+    return HistoryStore(history_file, max_entries, persist=True, fsync_policy="never", compact_lines=compact_lines)
+
+
+def readLines(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+def testHistorySurvivesRestart(tmp_path):
+    history_file = str(tmp_path / "history" / "history.jsonl")
+    store = createStore(history_file, max_entries=3)
+    for index in range(5):
+        store.append(HistoryEntry(text=f"respuesta {index}", timestamp=float(index), scene="Juego"))
+    store.close()
+
+    restarted = createStore(history_file, max_entries=3)
+    assert restarted.load() == 3
+    # solo lo más reciente vuelve al prompt, en el mismo orden
+    assert restarted.messages() == ["respuesta 2", "respuesta 3", "respuesta 4"]
+
+
+def testLegacyPlainTextLinesAreRead(tmp_path):
+    history_file = tmp_path / "history.txt"
+    history_file.write_text(
+        "línea del history.txt antiguo\n\n"
+        + json.dumps({"text": "nueva", "timestamp": 12.5, "scene": "Menu", "frame_hashes": ["ab"]}) + "\n",
+        encoding="utf-8",
+    )
+
+    store = createStore(str(history_file))
+    assert store.load() == 2
+    assert store.messages() == ["línea del history.txt antiguo", "nueva"]
+
+    legacy = parseHistoryLine("hola")
+    assert legacy.timestamp == 0.0 and legacy.scene is None and legacy.frame_hashes == []
+
+
+def testTruncatedLastLineIsDroppedAndFileCompacted(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    complete = json.dumps({"text": "completa", "timestamp": 1.0})
+    # un crash a mitad de escritura deja la última línea cortada
+    history_file.write_text(complete + "\n" + '{"text": "cort', encoding="utf-8")
+
+    store = createStore(str(history_file))
+    assert store.load() == 1
+    assert store.compactions == 1
+    assert readLines(str(history_file)) == [json.dumps({"text": "completa", "timestamp": 1.0, "scene": None,
+                                                        "frame_hashes": []}, ensure_ascii=False)]
+    assert not os.path.exists(f"{history_file}.tmp")
+
+    # se sigue añadiendo sobre el archivo ya limpio
+    store.append(HistoryEntry(text="después", timestamp=2.0))
+    store.close()
+    assert [json.loads(line)["text"] for line in readLines(str(history_file))] == ["completa", "después"]
+
+
+def testFileIsCompactedOnceItReachesCompactLines(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    store = createStore(history_file, max_entries=2, compact_lines=4)
+    for index in range(6):
+        store.append(HistoryEntry(text=f"r{index}", timestamp=float(index)))
+    store.close()
+
+    lines = readLines(history_file)
+    assert store.compactions == 1
+    # al llegar a 4 líneas se reescribió con las 2 en memoria (r3, r4) y r5 se añadió después
+    assert [json.loads(line)["text"] for line in lines] == ["r3", "r4", "r5"]
+    assert not os.path.exists(f"{history_file}.tmp")
+
+    restarted = createStore(history_file, max_entries=2)
+    restarted.load()
+    assert restarted.messages() == ["r4", "r5"]
+
+
+def testNothingIsWrittenWithoutPersist(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    store = HistoryStore(str(history_file), max_entries=3, persist=False)
+    store.append(HistoryEntry(text="solo en memoria", timestamp=1.0))
+    store.close()
+
+    assert store.messages() == ["solo en memoria"]
+    assert not history_file.exists()
+    assert store.load() == 0
+
+
+def testZeroMaxEntriesDisablesHistory(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    store = createStore(str(history_file), max_entries=0)
+    store.append(HistoryEntry(text="ignorada", timestamp=1.0))
+
+    assert store.messages() == []
+    assert not history_file.exists()
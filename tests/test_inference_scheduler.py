@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+
+from inference_scheduler import InferenceRejected, InferenceScheduler, ReactionExpired, ReactionRequest
+
+
+def waitUntil(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("la condición no se cumplió a tiempo")
+        time.sleep(0.01)
+
+
+def startWaiter(scheduler: InferenceScheduler, stream_label: str, order: list[str]) -> threading.Thread:
+    # Pide turno en otro hilo y, al obtenerlo, lo anota y lo libera.
+    def run():
+        scheduler.acquire(stream_label)
+        order.append(stream_label)
+        scheduler.release(stream_label, 0.0)
+
+    waiting = len(scheduler._waiting)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    waitUntil(lambda: len(scheduler._waiting) == waiting + 1)
+    return thread
+
+
+def testTurnGoesToTheStreamWithLessWeightedGpuTime():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    scheduler.acquire("heavy")
+    scheduler.release("heavy", 10.0)
+
+    order: list[str] = []
+    scheduler.acquire("holder")
+    waiters = [startWaiter(scheduler, "heavy", order), startWaiter(scheduler, "light", order)]
+    scheduler.release("holder", 0.0)
+    for thread in waiters:
+        thread.join(timeout=2)
+
+    # "light" llegó después pero consumió menos GPU
+    assert order == ["light", "heavy"]
+
+
+def testWeightDividesTheChargedTime():
+    scheduler = InferenceScheduler()
+    for label, weight in (("normal", 1.0), ("double", 2.0)):
+        scheduler.acquire(label)
+        scheduler.release(label, 4.0, weight)
+
+    assert scheduler._shares["normal"].virtual_time == pytest.approx(4.0)
+    assert scheduler._shares["double"].virtual_time == pytest.approx(2.0)
+    assert scheduler._shares["double"].busy_seconds == pytest.approx(4.0)
+
+
+def testIdleStreamDoesNotBankCredit():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    scheduler.acquire("busy")
+    scheduler.release("busy", 30.0)
+
+    order: list[str] = []
+    scheduler.acquire("busy")
+    first = startWaiter(scheduler, "busy", order)
+    # "idle" nunca usó la GPU: entra al nivel de los que compiten en vez de con 30 s de ventaja
+    second = startWaiter(scheduler, "idle", order)
+    assert scheduler._shares["idle"].virtual_time == pytest.approx(30.0)
+
+    scheduler.release("busy", 0.0)
+    first.join(timeout=2)
+    second.join(timeout=2)
+    assert order == ["busy", "idle"]
+
+
+def testMaxConcurrentLetsSeveralCallsRun():
+    scheduler = InferenceScheduler(max_concurrent=2)
+    scheduler.acquire("a")
+    scheduler.acquire("b")
+
+    with pytest.raises(InferenceRejected) as rejected:
+        scheduler.acquire("c", max_wait_seconds=0.05)
+    assert rejected.value.reason == "timeout"
+
+
+def testRejectedWaiterLeavesTheQueue():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    scheduler.acquire("holder")
+
+    with pytest.raises(InferenceRejected):
+        scheduler.acquire("late", max_wait_seconds=0.05)
+
+    assert scheduler._waiting == []
+    assert scheduler._shares["late"].active == 0
+    scheduler.release("holder", 0.0)
+    assert scheduler.acquire("late", max_wait_seconds=0.05) < 0.05
+
+
+def testRateLimitRejectsOverTheQuota():
+    scheduler = InferenceScheduler()
+    for _ in range(2):
+        scheduler.acquire("chatty", max_calls_per_minute=2)
+        scheduler.release("chatty", 0.0)
+
+    with pytest.raises(InferenceRejected) as rejected:
+        scheduler.acquire("chatty", max_calls_per_minute=2)
+    assert rejected.value.reason == "rate"
+
+
+def testDeadlineCountsFromTheFrameTimestamp():
+    request = ReactionRequest(time.time() - 3.0, deadline_seconds=2.0)
+
+    with pytest.raises(ReactionExpired) as expired:
+        request.check()
+    assert expired.value.reason == "deadline"
+    assert expired.value.age_seconds >= 3.0
+
+
+def testRequestWithoutDeadlineNeverExpires():
+    request = ReactionRequest(time.time() - 3600, deadline_seconds=0)
+
+    request.check()
+    assert request.remaining() is None
+    assert request.boundTimeout(30.0) == 30.0
+
+
+def testBoundTimeoutNeverWaitsPastTheDeadline():
+    request = ReactionRequest(time.time(), deadline_seconds=2.0)
+
+    assert request.boundTimeout(30.0) <= 2.0
+    assert request.boundTimeout(0.5) == 0.5
+    # ya vencida: un mínimo para que la llamada falle por plazo y no por un timeout de 0
+    assert ReactionRequest(time.time() - 5, 1.0).boundTimeout(30.0) == pytest.approx(0.1)
+
+
+def testCancelledRequestIsSuperseded():
+    request = ReactionRequest(None, deadline_seconds=10.0)
+    request.cancel()
+
+    with pytest.raises(ReactionExpired) as expired:
+        request.check()
+    assert expired.value.reason == "superseded"
+
+
+def testSlotRejectsExpiredRequestWithoutTakingATurn():
+    scheduler = InferenceScheduler()
+    request = ReactionRequest(time.time() - 5, deadline_seconds=1.0)
+
+    with pytest.raises(ReactionExpired):
+        with scheduler.slot(request):
+            pytest.fail("una reacción vencida no debe llegar al LLM")
+
+    assert scheduler._running == 0
+    assert "default" not in scheduler._shares
+
+
+def testSlotWaitIsBoundedByTheDeadline():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    scheduler.acquire("other")
+    request = ReactionRequest(time.time(), deadline_seconds=0.2)
+
+    started = time.monotonic()
+    with pytest.raises(ReactionExpired) as expired:
+        with scheduler.slot(request):
+            pytest.fail("no había turno antes del plazo")
+
+    assert expired.value.reason == "deadline"
+    assert time.monotonic() - started < 1.0
+    assert scheduler._waiting == []
+
+
+def testRequestCancelledWhileWaitingReleasesItsTurn():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    scheduler.acquire("other")
+    request = ReactionRequest(time.time(), deadline_seconds=10.0)
+    outcome = []
+
+    def callLlm():
+        try:
+            with scheduler.slot(request):
+                outcome.append("called")
+        except ReactionExpired as expired:
+            outcome.append(expired.reason)
+
+    thread = threading.Thread(target=callLlm, daemon=True)
+    thread.start()
+    waitUntil(lambda: len(scheduler._waiting) == 1)
+
+    # un ciclo más nuevo la reemplaza mientras espera turno
+    request.cancel()
+    scheduler.release("other", 0.0)
+    thread.join(timeout=2)
+
+    assert outcome == ["superseded"]
+    assert scheduler._running == 0
+    assert scheduler._shares["default"].active == 0
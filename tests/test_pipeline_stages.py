@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from pipeline_stages import StageItem, StageQueue
+
+
+def drain(queue: StageQueue) -> list[int]:
+    cycles = []
+    while (item := queue.get(timeout=0.01)) is not None:
+        cycles.append(item.cycle_id)
+    return cycles
+
+
+def testDropOldestKeepsTheNewestItems():
+    queue = StageQueue("llm", maxsize=2, drop_policy="drop_oldest")
+
+    assert all(queue.put(StageItem(None, cycle_id)) for cycle_id in (1, 2, 3, 4))
+
+    assert drain(queue) == [3, 4]
+    assert queue.dropped_full == 2
+
+
+def testDropNewestRejectsIncomingItems():
+    queue = StageQueue("tts", maxsize=2, drop_policy="drop_newest")
+
+    results = [queue.put(StageItem(None, cycle_id)) for cycle_id in (1, 2, 3)]
+
+    assert results == [True, True, False]
+    assert drain(queue) == [1, 2]
+    assert queue.dropped_full == 1
+
+
+def testBlockWaitsForRoomInsteadOfDropping():
+    queue = StageQueue("tts", maxsize=1, drop_policy="block")
+    queue.put(StageItem(None, 1))
+    results = []
+
+    producer = threading.Thread(target=lambda: results.append(queue.put(StageItem(None, 2))))
+    producer.start()
+    time.sleep(0.1)
+    assert producer.is_alive()  # sin lugar, el productor queda bloqueado
+
+    assert queue.get(timeout=0.1).cycle_id == 1
+    producer.join(timeout=2)
+
+    assert results == [True]
+    assert drain(queue) == [2]
+    assert queue.dropped_full == 0
+
+
+def testBlockGivesUpWhenStopping():
+    queue = StageQueue("tts", maxsize=1, drop_policy="block")
+    queue.put(StageItem(None, 1))
+    stop_event = threading.Event()
+    stop_event.set()
+
+    assert queue.put(StageItem(None, 2), stop_event) is False
+    assert drain(queue) == [1]
+
+
+def testMaxAgeDiscardsStaleItemsOnGet():
+    queue = StageQueue("llm", maxsize=3, drop_policy="drop_oldest", max_age_seconds=5)
+
+    queue.put(StageItem(None, 1, created_at=time.time() - 10))
+    queue.put(StageItem(None, 2, created_at=time.time() - 6))
+    queue.put(StageItem(None, 3))
+
+    assert drain(queue) == [3]
+    assert queue.dropped_stale == 2
+
+
+def testMaxAgeZeroDisablesTheLimit():
+    queue = StageQueue("llm", maxsize=1, max_age_seconds=0)
+    queue.put(StageItem(None, 1, created_at=time.time() - 3600))
+
+    assert drain(queue) == [1]
+
+
+def testClosedQueueRejectsPutsAndReturnsNone():
+    queue = StageQueue("llm", maxsize=1)
+    queue.close()
+
+    assert queue.put(StageItem(None, 1)) is False
+    assert queue.get(timeout=1) is None
+
+
+@pytest.mark.parametrize("maxsize, drop_policy", [(0, "block"), (1, "drop_random")])
+def testInvalidSettingsRaise(maxsize, drop_policy):
+    with pytest.raises(ValueError):
+        StageQueue("llm", maxsize=maxsize, drop_policy=drop_policy)
@@ -1,60 +1,274 @@
-import os
+import queue
+import random
+import threading
 from datetime import datetime
 
-from fishaudio import FishAudio
-from fishaudio.utils import save
-
-from config_loader import getConfigManager
+from app_server import isAppServerRunning
+from audio_cache import AudioCache
+from audio_spool import getAudioSpool
+from audio_stream import AudioClip, getAudioBroadcaster
+from config_loader import bindCurrentStream, getConfig, getConfigManager
 from capture_obs_frame import isDebugEnabled
+from metrics import ERRORS_TOTAL, TTS_SYNTHESIS_SECONDS
+from paths_manager import getAppPaths
 
 _fish_client = None  # instancia global única del cliente de Fish Audio
+_fish_client_lock = threading.Lock()
+_audio_cache = None  # instancia global única de la caché de audio (False si está deshabilitada)
 
 
-def getFishClient() -> FishAudio:
+def getFishClient():
     # Devuelve el cliente de Fish Audio inicializado con la API key del entorno.
     global _fish_client
     if _fish_client is not None:
         return _fish_client
 
-    config_manager = getConfigManager()
-    api_key = config_manager.requireEnv("FISH_API_KEY")
+    with _fish_client_lock:
+        if _fish_client is not None:
+            return _fish_client
 
-    _fish_client = FishAudio(api_key=api_key)
+        config_manager = getConfigManager()
+        api_key = config_manager.requireEnv("FISH_API_KEY")
 
-    if isDebugEnabled():
-        print("[i] Cliente de Fish Audio inicializado correctamente")
+        # importar el SDK tarda medio segundo: se hace aquí (en el paso de arranque "tts") y no al cargar el módulo
+        from fishaudio import FishAudio
+
+        _fish_client = FishAudio(api_key=api_key)
+
+        if isDebugEnabled():
+            print("[i] Cliente de Fish Audio inicializado correctamente")
 
     return _fish_client
 
 
-def synthesizeAndPlay(text: str, audio_dir: str):
-    # Genera audio con Fish Audio y lo guarda en disco; la reproducción se hace en Windows.
-    config_manager = getConfigManager()
-    tts_config = config_manager.getSection("tts")
+def newReactionId() -> str:
+    # Identificador ordenable por nombre para agrupar los segmentos de audio de una misma reacción.
+    return datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+
+
+def getAudioCache() -> AudioCache | None:
+    # Devuelve la caché de audio TTS configurada en config.tts, o None si está deshabilitada.
+    global _audio_cache
+    if _audio_cache is not None:
+        return _audio_cache or None
+
+    tts_config = getConfig().tts
+    if not tts_config.cache_enabled:
+        _audio_cache = False
+        return None
+
+    cache_dir = getAppPaths()["tts_cache_dir"]
+    max_bytes = int(tts_config.cache_max_mb * 1024 * 1024)
+    max_age_seconds = tts_config.cache_max_age_hours * 3600
+
+    _audio_cache = AudioCache(cache_dir, max_bytes, max_age_seconds)
+
+    if isDebugEnabled():
+        print(f"[i] Caché de audio TTS en {cache_dir} (máx {max_bytes // (1024 * 1024)} MB)")
+
+    return _audio_cache
+
+
+def synthesizeAudio(text: str) -> tuple[bytes, str]:
+    # Devuelve (audio, formato) para el texto: desde la caché si existe, si no llamando a Fish Audio.
+    tts_config = getConfig().tts
+    voice_id = tts_config.voice_id
+    audio_format = tts_config.format
 
-    voice_id = tts_config["voice_id"]
-    audio_format = tts_config["format"]
-    # save_audio se puede usar más adelante para limpieza, pero aquí siempre guardamos
-    _ = bool(tts_config["save_audio"])
+    cache = getAudioCache()
+    if cache is not None:
+        cached = cache.get(text, voice_id, audio_format)
+        if cached is not None:
+            return cached, audio_format
 
     client = getFishClient()
 
     if isDebugEnabled():
         print(f"[i] Generando audio TTS con voz {voice_id} y formato {audio_format}")
 
-    audio = client.tts.convert(
-        text=text,
-        reference_id=voice_id,
-        format=audio_format,
-    )
+    with TTS_SYNTHESIS_SECONDS.time():
+        audio = client.tts.convert(
+            text=text,
+            reference_id=voice_id,
+            format=audio_format,
+        )
+
+    if cache is not None:
+        try:
+            cache.put(text, voice_id, audio_format, audio)
+        except Exception as error:
+            print(f"[!] No se pudo guardar el audio en la caché: {error}")
+
+    return audio, audio_format
+
+
+def streamAudio(text: str):
+    # Como synthesizeAudio pero por fragmentos: de la caché en uno solo, o de Fish Audio a medida que llegan.
+    tts_config = getConfig().tts
+    voice_id = tts_config.voice_id
+    audio_format = tts_config.format
+
+    cache = getAudioCache()
+    if cache is not None:
+        cached = cache.get(text, voice_id, audio_format)
+        if cached is not None:
+            yield cached
+            return
+
+    client = getFishClient()
+
+    if isDebugEnabled():
+        print(f"[i] Generando audio TTS en streaming con voz {voice_id} y formato {audio_format}")
+
+    parts: list[bytes] = []
+    with TTS_SYNTHESIS_SECONDS.time():
+        for chunk in client.tts.stream(text=text, reference_id=voice_id, format=audio_format):
+            parts.append(chunk)
+            yield chunk
+
+    if cache is not None:
+        try:
+            cache.put(text, voice_id, audio_format, b"".join(parts))
+        except Exception as error:
+            print(f"[!] No se pudo guardar el audio en la caché: {error}")
+
+
+def usesHttpDelivery() -> bool:
+    # El audio se publica por HTTP si tts.delivery es "http" y el servidor de la app está activo;
+    # si no (APP_PORT vacío o delivery "file") se escribe el archivo para el watcher.
+    return getConfig().tts.delivery == "http" and isAppServerRunning()
+
 
-    os.makedirs(audio_dir, exist_ok=True)
+def publishAudio(text: str, reaction_id: str, segment_index: int) -> AudioClip:
+    # Publica el audio en la cola HTTP del stream apenas empieza y le va agregando los fragmentos.
+    clip = getAudioBroadcaster().openClip(reaction_id, segment_index, getConfig().tts.format, text)
+    try:
+        for chunk in streamAudio(text):
+            clip.write(chunk)
+    except Exception:
+        clip.finish(failed=True)
+        raise
+    clip.finish()
+    return clip
 
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"tts_{timestamp}.{audio_format}"
-    output_path = os.path.join(audio_dir, filename)
 
-    save(audio, output_path)
+def synthesizeToFile(text: str, audio_dir: str, reaction_id: str, segment_index: int = 0) -> str:
+    # Genera audio (o lo toma de la caché) y lo publica en el spool de audio_dir; devuelve la ruta final.
+    audio, audio_format = synthesizeAudio(text)
+    return getAudioSpool(audio_dir).write(audio, audio_format, reaction_id, segment_index)
+
+
+def archiveClip(clip: AudioClip, audio_dir: str):
+    # Con tts.save_audio, el audio servido por HTTP también se guarda en el spool (con sus mismos límites).
+    if not getConfig().tts.save_audio or clip.failed:
+        return
+    try:
+        getAudioSpool(audio_dir).write(clip.data(), clip.audio_format, clip.reaction_id, clip.segment_index)
+    except OSError as error:
+        print(f"[!] No se pudo guardar en disco el audio {clip.sequence}: {error}")
+
+
+def getFillerPhrases() -> list[str]:
+    # Frases cortas de relleno configuradas en config.tts.filler_phrases.
+    return list(getConfig().tts.filler_phrases)
+
+
+def prerenderFillers():
+    # Sintetiza de antemano las frases de relleno que aún no están en la caché.
+    cache = getAudioCache()
+    phrases = getFillerPhrases()
+    if cache is None or not phrases:
+        return
+
+    tts_config = getConfig().tts
+    voice_id = tts_config.voice_id
+    audio_format = tts_config.format
+
+    pending = [phrase for phrase in phrases if not cache.contains(phrase, voice_id, audio_format)]
+    for phrase in pending:
+        try:
+            synthesizeAudio(phrase)
+        except Exception as error:
+            ERRORS_TOTAL.inc(stage="tts")
+            print(f"[!] No se pudo pre-renderizar la frase de relleno '{phrase}': {error}")
+
+    print(f"[i] Frases de relleno listas: {len(phrases)} ({len(pending)} generadas ahora)")
+
+
+def prepareTts(audio_dir: str):
+    # Paso de arranque "tts": cliente de Fish Audio, caché, spool de archivos y frases de relleno listos
+    # antes de la primera reacción.
+    getFishClient()
+    getAudioCache()
+    if not usesHttpDelivery() or getConfig().tts.save_audio:
+        getAudioSpool(audio_dir)
+    prerenderFillers()
+
+
+def pickFillerPhrase() -> str | None:
+    # Elige al azar una frase de relleno (si hay caché, su audio sale sin llamar a la API).
+    phrases = getFillerPhrases()
+    return random.choice(phrases) if phrases else None
+
+
+def synthesizeAndPlay(text: str, audio_dir: str):
+    # Genera audio con Fish Audio y lo entrega al reproductor de Windows: por HTTP o como archivo en disco.
+    if usesHttpDelivery():
+        clip = publishAudio(text, newReactionId(), 0)
+        print(f"[i] Audio TTS {clip.sequence} publicado por HTTP (/audio/clip?seq={clip.sequence})")
+        archiveClip(clip, audio_dir)
+        return
+
+    output_path = synthesizeToFile(text, audio_dir, newReactionId())
 
     print(f"[i] Audio TTS generado en: {output_path}")
     print("[i] La reproducción la hará el watcher de Windows al detectar el nuevo archivo.")
+
+
+def synthesizeSegment(text: str, audio_dir: str, reaction_id: str, segment_index: int) -> str:
+    # Genera un segmento de audio de una reacción en streaming; el nombre conserva el orden de reproducción.
+    if usesHttpDelivery():
+        clip = publishAudio(text, reaction_id, segment_index)
+        print(f"[i] Segmento TTS {segment_index} publicado por HTTP con secuencia {clip.sequence}")
+        archiveClip(clip, audio_dir)
+        return f"/audio/clip?seq={clip.sequence}"
+
+    output_path = synthesizeToFile(text, audio_dir, reaction_id, segment_index)
+
+    print(f"[i] Segmento TTS {segment_index} generado en: {output_path}")
+    return output_path
+
+
+class SentenceSpeaker:
+    # Sintetiza en un hilo propio las frases de una reacción en el orden en que llegan.
+
+    def __init__(self, audio_dir: str):
+        self.audio_dir = audio_dir
+        self.reaction_id = newReactionId()
+        self._queue: queue.Queue = queue.Queue()
+        self._next_index = 0
+        self._thread = threading.Thread(target=bindCurrentStream(self._run), name="tts-sentences", daemon=True)
+        self._thread.start()
+
+    def speak(self, sentence: str):
+        # Encola una frase para sintetizarla apenas el hilo quede libre.
+        self._queue.put((self._next_index, sentence))
+        self._next_index += 1
+
+    def finish(self, timeout: float | None = None):
+        # Espera a que todas las frases encoladas tengan su audio escrito.
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            segment_index, sentence = item
+            try:
+                synthesizeSegment(sentence, self.audio_dir, self.reaction_id, segment_index)
+            except Exception as error:
+                ERRORS_TOTAL.inc(stage="tts")
+                print(f"[!] Error al usar TTS en el segmento {segment_index}: {error}")